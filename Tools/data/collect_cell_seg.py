@@ -59,6 +59,10 @@ for seg_dirname in seg_dirname_cnt.keys():
     create_new_dir(dst_dir)
     
     paths = list(src_dir.glob(f"*/{seg_desc}/{seg_dirname}/*.seg2ol.png"))
+    if len(paths) < seg_dirname_cnt[seg_dirname]:
+        # `[batch] render = false`, PNG renders are not created by '1.get_cell_feature.py'
+        print(f"Warning: '{seg_dirname}', {len(paths)} / {seg_dirname_cnt[seg_dirname]} "
+              f"images have '*.seg2ol.png', run 'script_ml/1.c.render_seg_results.py' first")
     for path in paths:
         
         dname = path.relative_to(src_dir).parts[0]
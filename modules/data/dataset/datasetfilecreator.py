@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
 import cv2
+import numpy as np
 import pandas as pd
 from colorama import Back, Fore, Style
 from rich.progress import track
@@ -16,7 +17,8 @@ from ...shared.utils import (create_new_dir, exclude_tmp_paths,
 from .. import dname
 from ..processeddatainstance import ProcessedDataInstance
 from . import dsname
-from .utils import drop_too_dark, gen_crop_img_v2, gen_dataset_file_name_dict
+from .utils import (calc_dark_ratios, gen_crop_img_v2,
+                    gen_dataset_file_name_dict)
 # -----------------------------------------------------------------------------/
 
 
@@ -167,6 +169,7 @@ class DatasetFileCreator(BaseObject):
         
         """ Main Task """
         dataset_df: Union[None, pd.DataFrame] = None
+        self._dark_ratios_cache: Tuple[str, np.ndarray] = ("", None)
         
         self._cli_out.divide()
         self._reset_pbar()
@@ -204,18 +207,12 @@ class DatasetFileCreator(BaseObject):
                 state = "preserve"
                 if img_size == "crop":
                     
-                    img = cv2.imread(str(path))
-                    select, drop = drop_too_dark([img], self.config)
-                    
-                    if len(select) > 0:
-                        assert len(drop) == 0, "Either `select` or `drop` needs to be empty"
-                        dark_ratio = select[0][2]
-                        state = "preserve"
-                    
-                    if len(drop) > 0:
-                        assert len(select) == 0, "Either `select` or `drop` needs to be empty"
-                        dark_ratio = drop[0][2]
+                    # look up the batched result of parent image, crop index = img_name_info[-1]
+                    dark_ratio = self._get_dark_ratios(fish_dataset, parent_dsname)[img_name_info[-1]]
+                    if dark_ratio >= self.config["param"]["drop_ratio"]:
                         state = "discard"
+                    else:
+                        state = "preserve"
                 
                 """ Create `temp_dict` """
                 temp_dict = {}
@@ -254,6 +251,24 @@ class DatasetFileCreator(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _get_dark_ratios(self, fish_dataset:str, parent_dsname:str) -> np.ndarray:
+        """ Calculate `dark_ratio` of all crops from the parent (base size) image
+            in one pass, instead of reading every crop image again.
+            
+            - The sorted `img_paths` keep crops of the same parent together,
+              so only the latest parent is cached.
+        """
+        key = f"{fish_dataset}/{parent_dsname}"
+        
+        if self._dark_ratios_cache[0] != key:
+            path = self.src_root.joinpath(fish_dataset, parent_dsname, f"{parent_dsname}.tiff")
+            img = cv2.imread(str(path))
+            self._dark_ratios_cache = (key, calc_dark_ratios(img, self.config))
+        
+        return self._dark_ratios_cache[1]
+        # ---------------------------------------------------------------------/
+
+
     def _check_if_target_dirs_exist(self):
         """
         """
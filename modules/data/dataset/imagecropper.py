@@ -16,6 +16,7 @@ from ...dl.dataset.augmentation import crop_base_size
 from ...shared.baseobject import BaseObject
 from ...shared.utils import create_new_dir, formatter_padr0
 from ..processeddatainstance import ProcessedDataInstance
+from .packedcropstore import PackedCropWriter, get_packed_paths
 from .utils import gen_crop_img_v2, gen_dataset_file_name_dict
 # -----------------------------------------------------------------------------/
 
@@ -45,6 +46,7 @@ class ImageCropper(BaseObject):
         self.crop_dir_name: str # self._set_crop_dir_name()
         self.clustered_df: pd.DataFrame # self._set_clustered_df()
         self.id2dataset_dict: Dict[int, str] # self._set_id2dataset_dict()
+        self.packed_writers: Dict[str, PackedCropWriter] # self._set_packed_writers()
         
         # ---------------------------------------------------------------------
         # """ actions """
@@ -71,6 +73,7 @@ class ImageCropper(BaseObject):
             >>> self.palmskin_result_name: str
             >>> self.cluster_desc: str
             >>> self.base_size: tuple[int, int]
+            >>> self.packed_store: bool
         """
         """ [data_processed] """
         self.palmskin_result_name: str = self.config["data_processed"]["palmskin_result_name"]
@@ -78,6 +81,9 @@ class ImageCropper(BaseObject):
         
         """ [param] """
         self.base_size: tuple[int, int] = self.config["param"]["base_size"]
+        
+        """ [cropper] """
+        self.packed_store: bool = self.config["cropper"]["packed_store"]
         # ---------------------------------------------------------------------/
 
 
@@ -132,6 +138,8 @@ class ImageCropper(BaseObject):
                                      self._processed_di.instance_name,
                                      os.path.splitext(self.palmskin_result_name)[0],
                                      f"W{self.base_size[0]}_H{self.base_size[1]}")
+        
+        self.pack_root: Path = self.dst_root.joinpath("packed")
         # ---------------------------------------------------------------------/
 
 
@@ -151,6 +159,7 @@ class ImageCropper(BaseObject):
         create_new_dir(self.dst_root.joinpath("test"))
         create_new_dir(self.dst_root.joinpath("train"))
         create_new_dir(self.dst_root.joinpath("valid"))
+        self._set_packed_writers()
         
         # get dict
         _, sorted_results_dict = \
@@ -176,6 +185,8 @@ class ImageCropper(BaseObject):
                 self._pbar.update(main_task, advance=1)
                 self._pbar.refresh()
         
+        for writer in self.packed_writers.values(): writer.close()
+        
         # count dir
         self._cli_out.divide()
         for dir in ["test", "train", "valid"]:
@@ -184,6 +195,8 @@ class ImageCropper(BaseObject):
             self._cli_out.write(f"{dir:5}, "
                                 f"# of dsnames: {dsname_cnt:{len(str(len(palmskin_dnames)))}}, "
                                 f"# of cropped images: {img_cnt}")
+        if self.packed_writers:
+            self._cli_out.write(f"Packed Store: '{self.pack_root}'")
         self._cli_out.new_line()
         # ---------------------------------------------------------------------/
 
@@ -213,6 +226,31 @@ class ImageCropper(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_packed_writers(self):
+        """ Set below attributes
+            >>> self.packed_writers: Dict[str, PackedCropWriter]
+            
+            key format: `{split}_{pack_name}`, e.g. 'train_base', 'test_CRPS256_SF14'
+        """
+        self.packed_writers: Dict[str, PackedCropWriter] = {}
+        if not self.packed_store:
+            return
+        
+        for dir in ["test", "train", "valid"]:
+            # `base_size` images are shared between different crop settings,
+            # pack them only once (same as `_create_single_basesize_imgset`)
+            if not get_packed_paths(self.pack_root, dir, "base")[0].exists():
+                self.packed_writers[f"{dir}_base"] = \
+                    PackedCropWriter(self.pack_root, dir, "base")
+            
+            self.packed_writers[f"{dir}_{self.crop_dir_name}"] = \
+                PackedCropWriter(self.pack_root, dir, self.crop_dir_name)
+        
+        self._cli_out.write(f"※　: writing packed store, "
+                            f"{len(self.packed_writers)} packs")
+        # ---------------------------------------------------------------------/
+
+
     def _create_single_hhc_imgset(self, img_path:Path):
         """ [deprecate] Actions:
             1. divide one `Anterior / Posterior` image into `UP(U) / Donw(D)` part
@@ -272,6 +310,10 @@ class ImageCropper(BaseObject):
             create_new_dir(dsname_dir)
             cv2.imwrite(str(save_path), base_size_img)
         
+        writer = self.packed_writers.get(f"{fish_dataset}_base")
+        if writer is not None:
+            writer.append(fish_dsname, base_size_img, parent=fish_dsname)
+        
         # >>> Crop Task <<<
         self._crop_single_image(base_size_img, dsname_dir, fish_dsname)
         # ---------------------------------------------------------------------/
@@ -289,6 +331,9 @@ class ImageCropper(BaseObject):
         crop_dir = dsname_dir.joinpath(self.crop_dir_name)
         create_new_dir(crop_dir)
         
+        # get packed writer, `dsname_dir` = '.../{fish_dataset}/{fish_dsname}'
+        writer = self.packed_writers.get(f"{dsname_dir.parts[-2]}_{self.crop_dir_name}")
+        
         for i, cropped_img in enumerate(crop_img_list):
             
             cropped_name = f"{fish_dsname}_crop_{i:{formatter_padr0(crop_img_list)}}"
@@ -298,6 +343,8 @@ class ImageCropper(BaseObject):
             # save cropped images
             save_path = crop_dir.joinpath(f"{cropped_name}.tiff")
             cv2.imwrite(str(save_path), cropped_img)
+            if writer is not None:
+                writer.append(cropped_name, cropped_img, parent=fish_dsname)
             
             self._pbar.update(crop_task, advance=1)
             self._pbar.refresh()
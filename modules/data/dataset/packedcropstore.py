@@ -0,0 +1,216 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import toml
+from colorama import Back, Fore, Style
+
+from ...shared.utils import create_new_dir
+# -----------------------------------------------------------------------------/
+
+
+class PackedCropWriter():
+
+    def __init__(self, pack_root:Path, split:str, pack_name:str) -> None:
+        """ Append images of the same shape into one contiguous `uint8` file.
+            
+            Layout ( under `pack_root` ):
+            >>> {split}_{pack_name}.bin   # raw bytes, shape = (N, H, W, C)
+            >>> {split}_{pack_name}.csv   # index: `image_name` -> `row`
+            >>> {split}_{pack_name}.toml  # meta: shape, dtype
+        
+        Args:
+            pack_root (Path): directory to store packed files
+            split (str): 'train', 'valid' or 'test'
+            pack_name (str): e.g. 'base' or 'CRPS256_SF14'
+        """
+        self.pack_root: Path = pack_root
+        self.split: str = split
+        self.pack_name: str = pack_name
+        
+        self.bin_path, self.index_path, self.meta_path = \
+            get_packed_paths(pack_root, split, pack_name)
+        
+        if self.bin_path.exists():
+            raise FileExistsError(f"{Fore.RED}{Back.BLACK} Packed file already exists: "
+                                  f"'{self.bin_path}' {Style.RESET_ALL}\n")
+        
+        self._names: List[str] = []
+        self._parents: List[str] = []
+        self._img_shape: Union[None, Tuple[int, ...]] = None
+        
+        create_new_dir(pack_root)
+        self._f_writer = open(self.bin_path, mode="wb")
+        # ---------------------------------------------------------------------/
+
+
+    def append(self, image_name:str, img:np.ndarray, parent:str=""):
+        """
+        """
+        if img.dtype != np.uint8:
+            raise TypeError(f"Only `uint8` images can be packed, got '{img.dtype}'")
+        
+        if self._img_shape is None:
+            self._img_shape = tuple(img.shape)
+        elif tuple(img.shape) != self._img_shape:
+            raise ValueError(f"Shape of '{image_name}' is {img.shape}, "
+                             f"expect {self._img_shape} in the same pack")
+        
+        self._f_writer.write(np.ascontiguousarray(img).tobytes())
+        self._names.append(image_name)
+        self._parents.append(parent)
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """ Flush the binary file, then write `index` and `meta` files
+        """
+        self._f_writer.close()
+        
+        index_df = pd.DataFrame({"image_name": self._names,
+                                 "parent (dsname)": self._parents,
+                                 "row": range(len(self._names))})
+        index_df.to_csv(self.index_path, encoding='utf_8_sig', index=False)
+        
+        meta = {"count": len(self._names),
+                "shape": list(self._img_shape) if self._img_shape else [],
+                "dtype": "uint8"}
+        with open(self.meta_path, mode="w") as f_writer:
+            toml.dump(meta, f_writer)
+        # ---------------------------------------------------------------------/
+
+
+
+class PackedCropStore():
+
+    def __init__(self, pack_root:Path,
+                 pack_keys:Union[None, List[str]]=None) -> None:
+        """ Read-only view of the packs under `pack_root`.
+            
+            The memory maps are opened lazily (per process), so the object can
+            be created before `DataLoader` forks its workers.
+        
+        Args:
+            pack_root (Path): directory contains packed files
+            pack_keys (Union[None, List[str]], optional): packs to open,
+                e.g. ['valid_base', 'valid_CRPS256_SF14'], packs not exist are skipped.
+                Crops of different crop settings share the same names,
+                open only one crop setting at a time. Defaults to None (all packs).
+        
+        Raises:
+            ValueError: an image name is found in more than one pack
+        """
+        self.pack_root: Path = pack_root
+        self.name2loc: Dict[str, Tuple[str, int]] = {}
+        self._metas: Dict[str, dict] = {}
+        self._arrays: Dict[str, np.memmap] = {}
+        self._pid: int = os.getpid()
+        
+        for meta_path in get_pack_meta_paths(pack_root, pack_keys):
+            pack_key = meta_path.stem
+            with open(meta_path, mode="r") as f_reader:
+                self._metas[pack_key] = toml.load(f_reader)
+            
+            index_df = pd.read_csv(pack_root.joinpath(f"{pack_key}.csv"),
+                                   encoding='utf_8_sig')
+            for name, row in zip(index_df["image_name"], index_df["row"]):
+                if name in self.name2loc:
+                    raise ValueError(f"{Fore.RED}{Back.BLACK} Duplicated image name '{name}' "
+                                     f"in packs '{self.name2loc[name][0]}' and '{pack_key}' "
+                                     f"{Style.RESET_ALL}\n")
+                self.name2loc[name] = (pack_key, int(row))
+        # ---------------------------------------------------------------------/
+
+
+    @staticmethod
+    def exists(pack_root:Path, pack_keys:Union[None, List[str]]=None) -> bool:
+        """
+        """
+        return len(get_pack_meta_paths(pack_root, pack_keys)) > 0
+        # ---------------------------------------------------------------------/
+
+
+    def __contains__(self, image_name:str) -> bool:
+        """
+        """
+        return image_name in self.name2loc
+        # ---------------------------------------------------------------------/
+
+
+    def __len__(self) -> int:
+        """
+        """
+        return len(self.name2loc)
+        # ---------------------------------------------------------------------/
+
+
+    def _get_array(self, pack_key:str) -> np.memmap:
+        """
+        """
+        # re-open after `fork()`, each worker holds its own file handle
+        if self._pid != os.getpid():
+            self._arrays = {}
+            self._pid = os.getpid()
+        
+        if pack_key not in self._arrays:
+            meta = self._metas[pack_key]
+            self._arrays[pack_key] = \
+                np.memmap(self.pack_root.joinpath(f"{pack_key}.bin"),
+                          dtype=meta["dtype"], mode="r",
+                          shape=(meta["count"], *meta["shape"]))
+        
+        return self._arrays[pack_key]
+        # ---------------------------------------------------------------------/
+
+
+    def get(self, image_name:str) -> Union[None, np.ndarray]:
+        """ Get a zero-copy (read-only) view of an image,
+            return `None` if `image_name` is not packed.
+        """
+        try:
+            pack_key, row = self.name2loc[image_name]
+        except KeyError:
+            return None
+        
+        return self._get_array(pack_key)[row]
+        # ---------------------------------------------------------------------/
+
+
+    def __getstate__(self):
+        """ Do not pickle the memory maps ( `spawn` start method )
+        """
+        state = self.__dict__.copy()
+        state["_arrays"] = {}
+        
+        return state
+        # ---------------------------------------------------------------------/
+
+
+
+def get_packed_paths(pack_root:Path, split:str, pack_name:str) -> Tuple[Path, Path, Path]:
+    """ Return paths of ( `bin`, `index`, `meta` ) files of a pack
+    """
+    pack_key = f"{split}_{pack_name}"
+    
+    return (pack_root.joinpath(f"{pack_key}.bin"),
+            pack_root.joinpath(f"{pack_key}.csv"),
+            pack_root.joinpath(f"{pack_key}.toml"))
+    # -------------------------------------------------------------------------/
+
+
+
+def get_pack_meta_paths(pack_root:Path,
+                        pack_keys:Union[None, List[str]]=None) -> List[Path]:
+    """ Return existing `meta` files of `pack_keys` ( all packs if `None` )
+    """
+    if not pack_root.exists():
+        return []
+    
+    if pack_keys is None:
+        return sorted(pack_root.glob("*.toml"))
+    else:
+        meta_paths = [pack_root.joinpath(f"{pack_key}.toml") for pack_key in pack_keys]
+        return [path for path in meta_paths if path.exists()]
+    # -------------------------------------------------------------------------/
\ No newline at end of file
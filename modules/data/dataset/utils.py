@@ -6,6 +6,7 @@ from typing import Dict, List, Tuple, Union
 
 import cv2
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from tomlkit.toml_document import TOMLDocument
 # -----------------------------------------------------------------------------/
 
@@ -158,11 +159,11 @@ def gen_crop_img(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np.nd
 
 
 
-def gen_crop_img_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np.ndarray]:
-    """ Generate the crop images using `crop_size` and `shift_region`
+def get_crop_idxs_v2(img_size:Tuple[int, ...], config:Union[dict, TOMLDocument]) -> Tuple[List[int], List[int]]:
+    """ Calculate the top-left indices of each crop image (used by `gen_crop_img_v2`)
 
     Args:
-        img (np.ndarray): The source image to generate its crop images
+        img_size (Tuple[int, ...]): shape of the source image, i.e. `img.shape`
     
     config:
         crop_size (int): Size/shape of cropped image
@@ -170,12 +171,9 @@ def gen_crop_img_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np
                             e.g. if `shift_region` = '1/3', the overlap region of each cropped image is '2/3'
 
     Returns:
-        List[np.ndarray]
+        Tuple[List[int], List[int]]: (`h_crop_idxs`, `w_crop_idxs`)
     """
-    # NOTE: 改善 v1 只能應對 crop_size 整數倍的問題 (20240131, 測試OK, 上方舊版 v1 穩定後可刪除)
-    
-    img_size = img.shape
-    # print(img.shape, "\n")
+    # print(img_size, "\n")
     
     """ Get config variables """
     crop_size: int = config["param"]["crop_size"]
@@ -217,6 +215,30 @@ def gen_crop_img_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np
             w_crop_idxs.append(st)
     # print(f"w_crop_idxs = {w_crop_idxs}", f"len = {len(w_crop_idxs)}", "\n")
     
+    return h_crop_idxs, w_crop_idxs
+    # -------------------------------------------------------------------------/
+
+
+
+def gen_crop_img_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np.ndarray]:
+    """ Generate the crop images using `crop_size` and `shift_region`
+    
+    Args:
+        img (np.ndarray): The source image to generate its crop images
+    
+    config:
+        crop_size (int): Size/shape of cropped image
+        shift_region (str): Offset distance between cropped images, \
+                            e.g. if `shift_region` = '1/3', the overlap region of each cropped image is '2/3'
+    
+    Returns:
+        List[np.ndarray]
+    """
+    # NOTE: 改善 v1 只能應對 crop_size 整數倍的問題 (20240131, 測試OK, 上方舊版 v1 穩定後可刪除)
+    
+    crop_size: int = config["param"]["crop_size"]
+    h_crop_idxs, w_crop_idxs = get_crop_idxs_v2(img.shape, config)
+    
     # >>> Crop images <<<
     crop_img_list = []
     for i in h_crop_idxs:
@@ -229,6 +251,112 @@ def gen_crop_img_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> List[np
 
 
 
+def gen_crop_img_v3(img:np.ndarray, config:Union[dict, TOMLDocument]) -> np.ndarray:
+    """ Same crop grid as `gen_crop_img_v2`, but return a strided view (no copy)
+        of all crop images with shape `(n_h, n_w, crop_size, crop_size, C)`.
+        
+        - crop image `i` of `gen_crop_img_v2` == `view[i // n_w, i % n_w]`
+    
+    Args:
+        img (np.ndarray): The source image to generate its crop images
+    
+    Returns:
+        np.ndarray: a read-only view of `img`
+    """
+    crop_size: int = config["param"]["crop_size"]
+    h_crop_idxs, w_crop_idxs = get_crop_idxs_v2(img.shape, config)
+    
+    # image is smaller than `crop_size`, no crop image ( same as `gen_crop_img_v2` )
+    if (len(h_crop_idxs) == 0) or (len(w_crop_idxs) == 0):
+        return np.empty((len(h_crop_idxs), len(w_crop_idxs), crop_size, crop_size,
+                         *img.shape[2:]), dtype=img.dtype)
+    
+    # all windows start at (h_crop_idxs[0], w_crop_idxs[0]) with a fixed `interval`
+    interval = int(crop_size/int(config["param"]["shift_region"].split("/")[1]))
+    windows = sliding_window_view(img[h_crop_idxs[0]:, w_crop_idxs[0]:],
+                                  (crop_size, crop_size), axis=(0, 1))
+    windows = windows[::interval, ::interval][:len(h_crop_idxs), :len(w_crop_idxs)]
+    
+    return np.moveaxis(windows, 2, -1) # (n_h, n_w, C, H, W) -> (n_h, n_w, H, W, C)
+    # -------------------------------------------------------------------------/
+
+
+
+def calc_dark_ratios(img:np.ndarray, config:Union[dict, TOMLDocument]) -> np.ndarray:
+    """ Calculate `dark_ratio` of all crop images (same grid as `gen_crop_img_v2`)
+        in one pass. The brightness (V) channel and its integral image are computed
+        once for the full source image, the result is identical to `drop_too_dark`.
+        
+        - V channel of HSV/HSB ( `cv2.COLOR_BGR2HSV_FULL` ) is `max(B, G, R)`
+    
+    Args:
+        img (np.ndarray): The `BGR` source image
+    
+    config:
+        crop_size (int): Size/shape of cropped image
+        shift_region (str): Offset distance between cropped images
+        intensity (int): a threshold (grayscale image) to define too dark or not 
+    
+    Returns:
+        np.ndarray: `dark_ratio` of each crop image, shape = `(n_crops, )`
+    """
+    crop_size: int = config["param"]["crop_size"]
+    intensity: int = config["param"]["intensity"]
+    h_crop_idxs, w_crop_idxs = get_crop_idxs_v2(img.shape, config)
+    
+    # image is smaller than `crop_size`, no crop image ( same as `gen_crop_img_v2` )
+    if (len(h_crop_idxs) == 0) or (len(w_crop_idxs) == 0):
+        return np.empty((0, ), dtype=np.float64)
+    
+    """ Too dark mask and its integral image (zero padding at top/left) """
+    too_dark = (img.max(axis=2) <= intensity)
+    integral = np.zeros((too_dark.shape[0]+1, too_dark.shape[1]+1), dtype=np.int64)
+    np.cumsum(np.cumsum(too_dark, axis=0), axis=1, out=integral[1:, 1:])
+    
+    """ Sum of each window """
+    h_st = np.array(h_crop_idxs)[:, None]
+    w_st = np.array(w_crop_idxs)[None, :]
+    h_ed = h_st + crop_size
+    w_ed = w_st + crop_size
+    pixel_too_dark = (integral[h_ed, w_ed] - integral[h_st, w_ed]
+                      - integral[h_ed, w_st] + integral[h_st, w_st])
+    
+    return (pixel_too_dark/(crop_size*crop_size)).ravel()
+    # -------------------------------------------------------------------------/
+
+
+
+def drop_too_dark_v2(img:np.ndarray, config:Union[dict, TOMLDocument]) -> Tuple[list, list]:
+    """ Batched version of `gen_crop_img_v2` + `drop_too_dark`
+    
+    Args:
+        img (np.ndarray): The `BGR` source image (not cropped)
+    
+    Returns:
+        Tuple[list, list]: ('select_crop_img_list', 'drop_crop_img_list'),
+        same format as `drop_too_dark`, the crop images are views of `img`
+    """
+    drop_ratio: float = config["param"]["drop_ratio"]
+    
+    crop_views = gen_crop_img_v3(img, config)
+    n_w = crop_views.shape[1]
+    dark_ratios = calc_dark_ratios(img, config)
+    
+    select_crop_img_list: list = []
+    drop_crop_img_list: list = []
+    
+    for i, dark_ratio in enumerate(dark_ratios):
+        crop_img = crop_views[i // n_w, i % n_w]
+        if dark_ratio >= drop_ratio:
+            drop_crop_img_list.append((i, crop_img, dark_ratio))
+        else:
+            select_crop_img_list.append((i, crop_img, dark_ratio))
+    
+    return select_crop_img_list, drop_crop_img_list
+    # -------------------------------------------------------------------------/
+
+
+
 def drop_too_dark(crop_img_list:List[np.ndarray], config:Union[dict, TOMLDocument]) -> Tuple[List[np.ndarray], List[np.ndarray]]:
     """ Drop the image which too many dark pixels
 
@@ -1,9 +1,10 @@
 import os
 import re
 import sys
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Set, Tuple, Union
 
 import pandas as pd
 from colorama import Back, Fore, Style
@@ -12,6 +13,7 @@ from rich import print
 from ..shared.baseobject import BaseObject
 from ..shared.config import load_config
 from ..shared.utils import exclude_paths, exclude_tmp_paths
+from .predictionindex import PredictionIndex, get_dir_signature
 from .singlepredictionparser import SinglePredictionParser
 from .utils import resolve_path_hyperlink
 # -----------------------------------------------------------------------------/
@@ -34,6 +36,7 @@ class DBFileUpdater(BaseObject):
         
         self._config = load_config("7.update_db_file.toml")
         self._col_version = self._config["column_version"]
+        self._parse_threads: int = self._config["parse_threads"]
         self._state_mark: dict[str, str] = self._config["state_mark"]
         self._possible_item_dict: dict[str, str] = \
                                         self._config["possible_item"]
@@ -48,9 +51,11 @@ class DBFileUpdater(BaseObject):
         """ Reset below attributes
             >>> self.dirs_state: dict[str, list[Union[Path, tuple[str, pd.DataFrame], str]]]
             >>> self.model_prediction: Path
-            >>> self._current_db: pd.DataFrame
             >>> self._csv_path: Path
             >>> self._excel_path: Path
+            >>> self._index: PredictionIndex
+            >>> self._reparsed_ids: Set[str]
+            >>> self._current_db: pd.DataFrame
         """
         self.dirs_state: dict[str, list[Union[Path, tuple[str, pd.DataFrame], str]]] = {}
         self.dirs_state["Unpredicted History Dir"] = [] # list[path]
@@ -62,18 +67,25 @@ class DBFileUpdater(BaseObject):
         self.model_prediction: Path = \
             self._path_navigator.dbpp.get_one_of_dbpp_roots("model_prediction")
         
+        # db_root: Path = Path(self._path_navigator.dbpp.dbpp_config["root"])
+        self._csv_path: Path = self.model_prediction.joinpath(r"{Results}_DL.csv")
+        self._excel_path: Path = self.model_prediction.joinpath(r"{Results}_DL.xlsx")
+        
+        # parsed prediction dirs, only changed dirs are parsed again
+        parser_config = {k: v for k, v in self._config.items() if k != "parse_threads"}
+        self._index = PredictionIndex(self.model_prediction.joinpath(r"{Results}_DL_index.sqlite3"),
+                                      parser_config)
+        self._reparsed_ids: Set[str] = set()
+        
         # self._current_db
         ver_test_dir = \
             list(self.model_prediction.glob(f"{self._col_version}/.ver_test/*"))[-1]
         print(f"Latest Version Test Dir: '{ver_test_dir}'")
         # ↑ always build column with latest (final) version test directory
+        self._ver_test_dir: Path = ver_test_dir
         self._current_db: pd.DataFrame = \
-            self._single_pred_parser.parse(ver_test_dir).set_index("Model_ID")
+            self._parse_prediction_dirs([ver_test_dir])[0].copy()
         self._current_db.index.values[0] = 'std_col' # reset index for easily delete later
-        
-        # db_root: Path = Path(self._path_navigator.dbpp.dbpp_config["root"])
-        self._csv_path: Path = self.model_prediction.joinpath(r"{Results}_DL.csv")
-        self._excel_path: Path = self.model_prediction.joinpath(r"{Results}_DL.xlsx")
         # ---------------------------------------------------------------------/
 
 
@@ -92,9 +104,12 @@ class DBFileUpdater(BaseObject):
         
         self._display_changed_on_CLI()
         
-        # save file
-        self._current_db.to_csv(self._csv_path, encoding='utf_8_sig')
-        self._current_db.to_excel(self._excel_path, engine="openpyxl")
+        # save file ( export from index )
+        if self._is_db_changed():
+            self._current_db.to_csv(self._csv_path, encoding='utf_8_sig')
+            self._current_db.to_excel(self._excel_path, engine="openpyxl")
+            self._index.set_meta("csv_mtime_ns", str(os.stat(self._csv_path).st_mtime_ns))
+        self._index.close()
         
         self._cli_out.new_line()
         # ---------------------------------------------------------------------/
@@ -105,17 +120,13 @@ class DBFileUpdater(BaseObject):
         """
         # scan dir
         found_list: list[Path] = \
-            sorted(self.model_prediction.glob("**/{ training time }_{ * sec }"),
-                   key=lambda x: x.parts[-2])
+            sorted(self._scan_prediction_dirs(), key=lambda x: x.parts[-1])
         found_list = exclude_tmp_paths(found_list)
         found_list = exclude_paths(found_list, [".ver_test"])
         
         # create dict
         prediction_dirs_dict: dict[str, Path] = {}
-        for file in found_list:
-            
-            # >>> prediction dir <<<
-            prediction_dir = file.parent
+        for prediction_dir in found_list:
             
             # >>> key: Model_ID <<<
             name_split = re.split("{|}", prediction_dir.parts[-1])
@@ -147,23 +158,58 @@ class DBFileUpdater(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _scan_prediction_dirs(self) -> List[Path]:
+        """ Directories contain '(INFO) Time' file ( same as `glob("**/{ training time }_{ * sec }")` ),
+            but never walk into a prediction dir ( e.g. thousands of files in 'cam_result' )
+        """
+        time_pattern: str = self._possible_item_dict["(INFO) Time"]
+        skip_names: List[str] = ["tmp", "temp", "Tmp", "Temp", ".ver_test"]
+        
+        found_list: List[Path] = []
+        for root, dirnames, filenames in os.walk(self.model_prediction):
+            if any(fnmatch(name, time_pattern) for name in filenames):
+                found_list.append(Path(root))
+                dirnames.clear() # stop walking into this prediction dir
+            else:
+                dirnames[:] = [name for name in dirnames if name not in skip_names]
+        
+        return found_list
+        # ---------------------------------------------------------------------/
+
+
+    def _parse_prediction_dirs(self, prediction_dirs:List[Path]) -> List[pd.DataFrame]:
+        """ Get the rows of `prediction_dirs` from index,
+            changed directories are parsed again ( on a thread pool )
+        """
+        with ThreadPoolExecutor(max_workers=self._parse_threads) as executor:
+            signatures: List[str] = list(executor.map(get_dir_signature, prediction_dirs))
+        
+        new_rows: List[Union[pd.DataFrame, None]] = \
+            [self._index.get(path, signature) for path, signature in zip(prediction_dirs, signatures)]
+        
+        changed_idxs: List[int] = [i for i, new_row in enumerate(new_rows) if new_row is None]
+        parsed_rows = self._single_pred_parser.parse_many([prediction_dirs[i] for i in changed_idxs],
+                                                          self._parse_threads)
+        for i, parsed_row in zip(changed_idxs, parsed_rows):
+            new_row = parsed_row.set_index("Model_ID")
+            self._index.put(prediction_dirs[i], signatures[i], new_row)
+            self._reparsed_ids.update(new_row.index)
+            new_rows[i] = new_row
+        
+        return new_rows
+        # ---------------------------------------------------------------------/
+
+
     def _bulid_current_db(self):
         """
         """
-        for k, v in self._prediction_dirs_dict.items():
-            """ parse
-            """
-            new_row = \
-                self._single_pred_parser.parse(v).set_index("Model_ID")
-            
-            if self._current_db is None:
-                """ init
-                """
-                self._current_db = deepcopy(new_row)
-            else:
-                """ concat
-                """
-                self._current_db = pd.concat([self._current_db, new_row])
+        rows: List[pd.DataFrame] = [self._current_db]
+        rows.extend(self._parse_prediction_dirs(list(self._prediction_dirs_dict.values())))
+        
+        # 只在最後 concat 一次
+        self._current_db = pd.concat(rows)
+        self._index.prune([self._ver_test_dir, *self._prediction_dirs_dict.values()])
+        self._index.commit()
         
         self._current_db.drop("std_col", inplace=True) # 刪除為了指定 column 順序而引入的 row
         self._current_db.sort_index(inplace=True)
@@ -180,39 +226,62 @@ class DBFileUpdater(BaseObject):
                             index_col="Model_ID")
         else:
             self._previous_db = None
+        
+        # CSV is exported from index in last update ( not edited / replaced ),
+        # the rows are not parsed again can skip comparing
+        self._is_csv_from_index: bool = (self._previous_db is not None) and \
+            (self._index.get_meta("csv_mtime_ns") == str(os.stat(self._csv_path).st_mtime_ns))
         # ---------------------------------------------------------------------/
 
 
     def _detect_changed(self):
         """
         """
-        current_db = self._current_db.copy().fillna(self._state_mark["empty_cell"])
+        current_ids: Set[str] = set(self._current_db.index)
+        previous_ids: Set[str] = set(self._previous_db.index)
+        
+        # rows are not parsed again are the same as the exported CSV, skip comparing
+        compare_ids: List[str] = \
+            [index for index in self._current_db.index if (index in previous_ids) and
+                ((not self._is_csv_from_index) or (index in self._reparsed_ids))]
+        
+        current_db = self._current_db.loc[compare_ids].fillna(self._state_mark["empty_cell"])
         current_db = current_db.astype(str) # 轉成 str 減少 float 容易不相等的問題
-        previous_db = self._previous_db.copy().fillna(self._state_mark["empty_cell"])
+        previous_db = self._previous_db.loc[compare_ids].fillna(self._state_mark["empty_cell"])
         previous_db = previous_db.astype(str) # 轉成 str 減少 float 容易不相等的問題
         
-        for index in current_db.index:
+        for index in compare_ids:
+            # unchanged / updated
+            row: pd.Series = current_db.loc[index]
+            previous_row: pd.Series = previous_db.loc[index]
+            diff_df = row.compare(previous_row)
             
-            if index in previous_db.index:
-                # unchanged / updated
-                row: pd.Series = current_db.loc[index]
-                previous_row: pd.Series = previous_db.loc[index]
-                diff_df = row.compare(previous_row)
-                
-                if diff_df.empty:
-                    """ unchanged """
-                    pass
-                else:
-                    """ updated """
-                    self.dirs_state["Updated Prediction Dir"].append((index, diff_df))
-                
-                previous_db.drop(index, inplace=True)
+            if diff_df.empty:
+                """ unchanged """
+                pass
             else:
-                # new row
-                self.dirs_state["New Prediction Dir"].append(index)
+                """ updated """
+                self.dirs_state["Updated Prediction Dir"].append((index, diff_df))
+        
+        # new row
+        self.dirs_state["New Prediction Dir"].extend(
+            [index for index in self._current_db.index if index not in previous_ids])
         
         # remain in `previous_db`
-        self.dirs_state["Deleted Prediction Dir"].extend(list(previous_db.index))
+        self.dirs_state["Deleted Prediction Dir"].extend(
+            [index for index in self._previous_db.index if index not in current_ids])
+        # ---------------------------------------------------------------------/
+
+
+    def _is_db_changed(self) -> bool:
+        """
+        """
+        if (self._previous_db is None) or (not self._excel_path.exists()):
+            return True
+        
+        return (len(self.dirs_state["Updated Prediction Dir"]) > 0) or \
+                (len(self.dirs_state["New Prediction Dir"]) > 0) or \
+                (len(self.dirs_state["Deleted Prediction Dir"]) > 0)
         # ---------------------------------------------------------------------/
 
 
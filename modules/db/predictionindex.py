@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+import pandas as pd
+# -----------------------------------------------------------------------------/
+
+
+_INDEX_VERSION = 1 # increase it if the table or the parsed row is changed
+# -----------------------------------------------------------------------------/
+
+
+def get_dir_signature(prediction_dir:Path) -> str:
+    """ A content hash of `prediction_dir` without reading any file,
+        built from ( name, size, mtime ) of its direct entries.
+        
+        - sub-directories ( e.g. 'cam_result' ) only count by name,
+            `SinglePredictionParser` never reads inside them.
+    """
+    entries: List[tuple] = []
+    with os.scandir(prediction_dir) as it:
+        for entry in it:
+            if entry.is_dir():
+                entries.append((entry.name, "dir"))
+            else:
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    
+    return hashlib.sha1(repr(sorted(entries)).encode("utf-8")).hexdigest()
+    # -------------------------------------------------------------------------/
+
+
+
+class PredictionIndex():
+
+    def __init__(self, path:Path, parser_config:dict) -> None:
+        """ A local SQLite index of parsed prediction directories,
+            a directory is parsed again only if its signature is changed.
+        
+        Args:
+            path (Path): path of the SQLite file
+            parser_config (dict): config of `SinglePredictionParser`,
+                all rows are dropped if it is changed
+        """
+        self.path: Path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta "
+                           "(key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS prediction "
+                           "(dir TEXT PRIMARY KEY, dir_mtime_ns INTEGER, "
+                           "signature TEXT, row BLOB)")
+        
+        # rows are pickled `pd.DataFrame`, also depend on the version of pandas
+        parser_signature = json.dumps([_INDEX_VERSION, pd.__version__, parser_config],
+                                      sort_keys=True, default=str)
+        if self.get_meta("parser_signature") != parser_signature:
+            self._conn.execute("DELETE FROM prediction")
+            self.set_meta("parser_signature", parser_signature)
+            self.set_meta("csv_mtime_ns", None)
+        self._conn.commit()
+        
+        self._rows: Dict[str, Tuple[str, bytes]] = \
+            {dir: (signature, row) for dir, signature, row
+                in self._conn.execute("SELECT dir, signature, row FROM prediction")}
+        # ---------------------------------------------------------------------/
+
+
+    def get_meta(self, key:str) -> Union[str, None]:
+        """
+        """
+        found = self._conn.execute("SELECT value FROM meta WHERE key = ?",
+                                   (key,)).fetchone()
+        
+        return None if found is None else found[0]
+        # ---------------------------------------------------------------------/
+
+
+    def set_meta(self, key:str, value:Union[str, None]):
+        """
+        """
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                           (key, value))
+        # ---------------------------------------------------------------------/
+
+
+    def get(self, prediction_dir:Path, signature:str) -> Union[pd.DataFrame, None]:
+        """ Return the stored row if `signature` is unchanged, otherwise `None`
+        """
+        found = self._rows.get(str(prediction_dir))
+        if (found is None) or (found[0] != signature):
+            return None
+        
+        try:
+            return pickle.loads(found[1])
+        except Exception:
+            return None # broken row, parse again
+        # ---------------------------------------------------------------------/
+
+
+    def put(self, prediction_dir:Path, signature:str, row:pd.DataFrame):
+        """
+        """
+        blob = pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL)
+        self._conn.execute("INSERT OR REPLACE INTO prediction "
+                           "(dir, dir_mtime_ns, signature, row) VALUES (?, ?, ?, ?)",
+                           (str(prediction_dir), os.stat(prediction_dir).st_mtime_ns,
+                            signature, blob))
+        self._rows[str(prediction_dir)] = (signature, blob)
+        # ---------------------------------------------------------------------/
+
+
+    def prune(self, prediction_dirs:Iterable[Path]):
+        """ Delete rows of the directories not in `prediction_dirs`
+        """
+        keep = {str(path) for path in prediction_dirs}
+        removed = [dir for dir in self._rows if dir not in keep]
+        
+        self._conn.executemany("DELETE FROM prediction WHERE dir = ?",
+                               [(dir,) for dir in removed])
+        for dir in removed: self._rows.pop(dir)
+        # ---------------------------------------------------------------------/
+
+
+    def commit(self):
+        """
+        """
+        self._conn.commit()
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """
+        """
+        self._conn.commit()
+        self._conn.close()
+        # ---------------------------------------------------------------------/
\ No newline at end of file
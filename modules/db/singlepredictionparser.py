@@ -1,7 +1,10 @@
 import os
 import re
 import sys
-from copy import deepcopy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
+from fnmatch import fnmatch
 from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
@@ -81,8 +84,10 @@ class SinglePredictionParser(BaseObject):
             >>> self._found_files_cnt
             >>> self._parsed_dict
             >>> self._alt_name_dict
+            >>> self._entry_names
         """
         self._found_files_cnt: int = 0
+        self._entry_names: list[str] = [] # names in `self._prediction_dir`, see `_scan_items()`
         self._parsed_dict: dict = {}
         self._alt_name_dict: dict[str, list[str]] = \
                                         deepcopy(self._config["alt_name"])
@@ -115,6 +120,35 @@ class SinglePredictionParser(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def parse_many(self, prediction_dirs:list[Path],
+                   max_workers:int=8) -> list[Union[pd.DataFrame, None]]:
+        """ Parse directories on a thread pool, each thread uses a copy of this parser.
+        
+        Args:
+            prediction_dirs (list[Path]): prediction directories
+            max_workers (int, optional): number of threads. Defaults to 8.
+        
+        Returns:
+            list[Union[pd.DataFrame, None]]: results of `parse()`, same order as `prediction_dirs`
+        """
+        if (max_workers <= 1) or (len(prediction_dirs) <= 1):
+            return [self.parse(path) for path in prediction_dirs]
+        
+        thread_local = threading.local()
+        
+        def parse_fn(prediction_dir:Path):
+            """
+            """
+            if not hasattr(thread_local, "parser"):
+                thread_local.parser = copy(self) # `_reset_attrs()` creates its own states
+            return thread_local.parser.parse(prediction_dir)
+            # -----------------------------------------------------------------
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(parse_fn, prediction_dirs))
+        # ---------------------------------------------------------------------/
+
+
     def _handle_prediction_dir(self, prediction_dir:Path):
         """
         """
@@ -174,7 +208,8 @@ class SinglePredictionParser(BaseObject):
             Path: _description_
         """
         key, name = item
-        found_list = list(self._prediction_dir.glob(name))
+        found_list = [self._prediction_dir.joinpath(entry_name)
+                        for entry_name in self._entry_names if fnmatch(entry_name, name)]
         
         if len(found_list) > 1:
             raise ValueError(f"'{name}' should be a unique item in each prediction folder, "
@@ -195,6 +230,11 @@ class SinglePredictionParser(BaseObject):
         """
         path_dict: dict[str, Union[Path, None]] = deepcopy(self._possible_item_dict)
         
+        # list the directory once ( each `glob()` is a round trip on a network share ),
+        # all items are matched against the names in memory
+        with os.scandir(self._prediction_dir) as it:
+            self._entry_names = [entry.name for entry in it]
+        
         for k, v in self._possible_item_dict.items():
             path = self._get_item_path((k, v))
             if path is None:
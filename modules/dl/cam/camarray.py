@@ -0,0 +1,121 @@
+import threading
+import zipfile
+from pathlib import Path
+from typing import List, Union
+
+import cv2
+import numpy as np
+# -----------------------------------------------------------------------------/
+
+
+CAM_ARRAY_FILE = "cam_array.npz"
+_COLORMAP_KEY = "__colormap__"
+# -----------------------------------------------------------------------------/
+
+
+class CamArrayWriter():
+
+    def __init__(self, path:Path, colormap:str) -> None:
+        """ Store grayscale CAMs ( `uint8` ) of a fish in one compressed `.npz` file,
+            each CAM is a separate ( deflated ) member named by its grayscale map,
+            e.g. 'fish_1_A_U_graymap_0', the member list is the crop-name index.
+        
+        Args:
+            path (Path): path of the `.npz` file
+            colormap (str): name of an OpenCV colormap, applied on demand by `CamArrayReader`
+        """
+        self.path: Path = path
+        self._zip = zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+        
+        self.write(_COLORMAP_KEY, np.array(colormap))
+        # ---------------------------------------------------------------------/
+
+
+    def write(self, name:str, array:np.ndarray):
+        """ Append an array ( same format as `np.savez_compressed()` ), thread-safe
+        """
+        with self._lock:
+            with self._zip.open(f"{name}.npy", mode="w", force_zip64=True) as f_writer:
+                np.lib.format.write_array(f_writer, np.asanyarray(array),
+                                          allow_pickle=False)
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """
+        """
+        with self._lock:
+            self._zip.close()
+        # ---------------------------------------------------------------------/
+
+
+
+class CamArrayReader():
+
+    def __init__(self, path:Path) -> None:
+        """ Read a file written by `CamArrayWriter`,
+            a CAM is decompressed only when it is read.
+        
+        Args:
+            path (Path): path of the `.npz` file
+        """
+        self.path: Path = path
+        self._npz = np.load(path, allow_pickle=False)
+        
+        self.colormap: str = str(self._npz[_COLORMAP_KEY])
+        self.names: List[str] = \
+            [name for name in self._npz.files if name != _COLORMAP_KEY]
+        # ---------------------------------------------------------------------/
+
+
+    def __contains__(self, name:str) -> bool:
+        """
+        """
+        return name in self.names
+        # ---------------------------------------------------------------------/
+
+
+    def read_grayscale(self, name:str) -> np.ndarray:
+        """ Same as reading the grayscale map ( '.tiff' ), `uint8`, shape = (H, W)
+        """
+        return self._npz[name]
+        # ---------------------------------------------------------------------/
+
+
+    def read_colormap(self, name:str, colormap:Union[None, int]=None) -> np.ndarray:
+        """ Apply a colormap on the grayscale map, `uint8`, RGB
+        
+        Args:
+            name (str): name of the grayscale map
+            colormap (Union[None, int], optional): an OpenCV colormap, e.g. `cv2.COLORMAP_JET`.
+                Defaults to None ( the colormap used by the fish tester ).
+        """
+        if colormap is None:
+            colormap = getattr(cv2, self.colormap)
+        
+        cam_bgr_img = cv2.applyColorMap(self.read_grayscale(name), colormap) # BGR
+        
+        return cv2.cvtColor(cam_bgr_img, cv2.COLOR_BGR2RGB)
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """
+        """
+        self._npz.close()
+        # ---------------------------------------------------------------------/
+
+
+    def __enter__(self):
+        """
+        """
+        return self
+        # ---------------------------------------------------------------------/
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        """
+        self.close()
+        # ---------------------------------------------------------------------/
\ No newline at end of file
@@ -0,0 +1,241 @@
+import math
+from typing import Tuple
+
+import torch
+import torch.nn.functional as F
+from colorama import Back, Fore, Style
+# -----------------------------------------------------------------------------/
+
+
+class BatchAugmenter():
+
+    def __init__(self, crop_size:int, resize:Tuple[int, int], intensity:int,
+                 use_hsv:bool, seed:int, device:torch.device) -> None:
+        """ Tensor version of the 'train' mode of `ImgDataset_v3.__getitem__`,
+            applied on a whole ( collated ) batch on `device`:
+            
+            action: rotate ( `dynamic_crop` ) \\
+                    -> random crop ( `dynamic_crop` ) \\
+                        -> flips, contrast, blur / sharpen ( `composite_aug` ) \\
+                            -> 'too dark' detection ( `drop_too_dark` ) \\
+                                -> adjust dark pixel ( `_adjust_dark_pixel_pair` ) \\
+                                    -> convert format ( `_cvt_model_format` )
+            
+            All random parameters are drawn from a `torch.Generator` seeded by `seed`
+            ( the same `rand_seed` that `_seed_worker` derives from ),
+            so a run is reproducible on the same device.
+        
+        Args:
+            crop_size (int): size of random crop
+            resize (Tuple[int, int]): model input size
+            intensity (int): a threshold to define too dark or not
+            use_hsv (bool): 'HSV' is not supported, must be `False`
+            seed (int): random seed
+            device (torch.device): device to run augmentation
+        """
+        if use_hsv:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} Batch augmentation doesn't support "
+                             f"`train_opts.data.use_hsv` = {use_hsv} {Style.RESET_ALL}\n")
+        
+        self.crop_size: int = crop_size
+        self.resize: Tuple[int, int] = resize
+        self.intensity: int = intensity
+        self.device: torch.device = device
+        
+        self.generator = torch.Generator(device=device)
+        self.generator.manual_seed(seed)
+        # ---------------------------------------------------------------------/
+
+
+    def _rand(self, n:int) -> torch.Tensor:
+        """
+        """
+        return torch.rand(n, generator=self.generator, device=self.device)
+        # ---------------------------------------------------------------------/
+
+
+    def _uniform(self, n:int, low:float, high:float) -> torch.Tensor:
+        """
+        """
+        return low + (high - low) * self._rand(n)
+        # ---------------------------------------------------------------------/
+
+
+    def __call__(self, bgr_imgs:torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        
+        Args:
+            bgr_imgs (torch.Tensor): `uint8` images, shape = (N, H, W, C)
+        
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: (`imgs`, `imgs_for_mse`, `dark_ratios`),
+            `imgs` and `imgs_for_mse` are in model format, shape = (N, C, *resize)
+        """
+        imgs = bgr_imgs.to(self.device).permute(0, 3, 1, 2).float() # (N, H, W, C) -> (N, C, H, W)
+        
+        imgs = self._rotate_crop_flip(imgs)
+        imgs = self._adjust_contrast(imgs)
+        imgs = self._blur_or_sharpen(imgs)
+        imgs = imgs.round_().clamp_(0, 255) # as `uint8` images
+        
+        # 'too dark' detection, V channel of HSV is max(B, G, R)
+        dark_mask = (imgs.amax(dim=1, keepdim=True) <= self.intensity)
+        dark_ratios = dark_mask.flatten(1).float().mean(dim=1)
+        
+        # adjust pixel value
+        imgs_for_mse = imgs.masked_fill(dark_mask, 255.0)
+        imgs = imgs.masked_fill_(dark_mask, 0.0)
+        
+        return self._cvt_model_format(imgs), self._cvt_model_format(imgs_for_mse), dark_ratios
+        # ---------------------------------------------------------------------/
+
+
+    def _rotate_crop_flip(self, imgs:torch.Tensor) -> torch.Tensor:
+        """ Rotate ( p=0.5, -30 ~ 30 degrees, around image center, fill 0 ),
+            random crop to `crop_size`, then flip left-right / up-down ( p=0.5 ),
+            all in one `grid_sample()` ( bilinear, same as `iaa.Affine` default )
+        """
+        n, _, h, w = imgs.shape
+        cs = self.crop_size
+        
+        angle = self._uniform(n, -30, 30) * (self._rand(n) < 0.5)
+        off_y = torch.floor(self._rand(n) * (h - cs + 1))
+        off_x = torch.floor(self._rand(n) * (w - cs + 1))
+        flip_lr = (self._rand(n) < 0.5)[:, None, None]
+        flip_ud = (self._rand(n) < 0.5)[:, None, None]
+        
+        # pixel position in the output ( cropped ) image
+        ys, xs = torch.meshgrid(torch.arange(cs, device=self.device, dtype=torch.float32),
+                                torch.arange(cs, device=self.device, dtype=torch.float32),
+                                indexing="ij")
+        xs = torch.where(flip_lr, (cs - 1) - xs, xs)
+        ys = torch.where(flip_ud, (cs - 1) - ys, ys)
+        
+        # position in the rotated image, relative to the image center
+        xr = xs + off_x[:, None, None] - (w - 1) / 2
+        yr = ys + off_y[:, None, None] - (h - 1) / 2
+        
+        # inverse rotation -> position in the source image
+        rad = torch.deg2rad(angle)[:, None, None]
+        cos, sin = torch.cos(rad), torch.sin(rad)
+        x_src = cos * xr + sin * yr + (w - 1) / 2
+        y_src = -sin * xr + cos * yr + (h - 1) / 2
+        
+        # normalize to [-1, 1] ( `align_corners=False` )
+        grid = torch.stack([(2 * x_src + 1) / w - 1,
+                            (2 * y_src + 1) / h - 1], dim=-1)
+        
+        return F.grid_sample(imgs, grid, mode="bilinear",
+                             padding_mode="zeros", align_corners=False)
+        # ---------------------------------------------------------------------/
+
+
+    def _adjust_contrast(self, imgs:torch.Tensor) -> torch.Tensor:
+        """ p=0.3, one of
+            - `iaa.GammaContrast((0.5, 2.0))`
+            - `iaa.SigmoidContrast(gain=(3, 10), cutoff=(0.4, 0.6))`
+        """
+        n = imgs.shape[0]
+        apply = (self._rand(n) < 0.3)[:, None, None, None]
+        use_gamma = (self._rand(n) < 0.5)[:, None, None, None]
+        gamma = self._uniform(n, 0.5, 2.0)[:, None, None, None]
+        gain = self._uniform(n, 3, 10)[:, None, None, None]
+        cutoff = self._uniform(n, 0.4, 0.6)[:, None, None, None]
+        
+        x = imgs / 255.0
+        gamma_out = x.pow(gamma)
+        sigmoid_out = torch.sigmoid(gain * (x - cutoff))
+        
+        out = torch.where(use_gamma, gamma_out, sigmoid_out)
+        
+        return torch.where(apply, out * 255.0, imgs)
+        # ---------------------------------------------------------------------/
+
+
+    def _blur_or_sharpen(self, imgs:torch.Tensor) -> torch.Tensor:
+        """ p=0.3, one of
+            - `iaa.GaussianBlur()`, sigma = (0, 3)
+            - `iaa.Sharpen()`, alpha = (0, 0.2), lightness = (0.8, 1.2)
+        """
+        n = imgs.shape[0]
+        apply = (self._rand(n) < 0.3)
+        use_blur = (self._rand(n) < 0.5)
+        sigma = self._uniform(n, 0.0, 3.0)
+        alpha = self._uniform(n, 0.0, 0.2)
+        lightness = self._uniform(n, 0.8, 1.2)
+        
+        blur_idxs = torch.nonzero(apply & use_blur).squeeze(1)
+        if len(blur_idxs) > 0:
+            imgs[blur_idxs] = self._gaussian_blur(imgs[blur_idxs], sigma[blur_idxs])
+        
+        sharpen_idxs = torch.nonzero(apply & ~use_blur).squeeze(1)
+        if len(sharpen_idxs) > 0:
+            imgs[sharpen_idxs] = self._sharpen(imgs[sharpen_idxs], alpha[sharpen_idxs],
+                                               lightness[sharpen_idxs])
+        
+        return imgs
+        # ---------------------------------------------------------------------/
+
+
+    @staticmethod
+    def _depthwise_conv(imgs:torch.Tensor, kernels:torch.Tensor) -> torch.Tensor:
+        """ Apply a different kernel to each image ( grouped convolution ),
+            border mode is 'reflect' ( `cv2.BORDER_REFLECT_101` )
+        
+        Args:
+            imgs (torch.Tensor): shape = (N, C, H, W)
+            kernels (torch.Tensor): shape = (N, kH, kW)
+        """
+        n, c, h, w = imgs.shape
+        kh, kw = kernels.shape[1:]
+        
+        x = F.pad(imgs.reshape(1, n*c, h, w),
+                  (kw//2, kw//2, kh//2, kh//2), mode="reflect")
+        weight = kernels.repeat_interleave(c, dim=0)[:, None] # (N*C, 1, kH, kW)
+        
+        return F.conv2d(x, weight, groups=n*c).reshape(n, c, h, w)
+        # ---------------------------------------------------------------------/
+
+
+    def _gaussian_blur(self, imgs:torch.Tensor, sigma:torch.Tensor) -> torch.Tensor:
+        """ Separable gaussian blur, kernel size is fixed by the max sigma ( 3 )
+        """
+        radius = math.ceil(3 * 3.0)
+        pos = torch.arange(-radius, radius+1, device=self.device, dtype=torch.float32)
+        sigma = sigma.clamp(min=1e-3)[:, None] # sigma ~ 0: no blur
+        
+        kernel_1d = torch.exp(-pos[None, :]**2 / (2 * sigma**2))
+        kernel_1d = kernel_1d / kernel_1d.sum(dim=1, keepdim=True) # (N, K)
+        
+        imgs = self._depthwise_conv(imgs, kernel_1d[:, None, :]) # horizontal
+        imgs = self._depthwise_conv(imgs, kernel_1d[:, :, None]) # vertical
+        
+        return imgs
+        # ---------------------------------------------------------------------/
+
+
+    def _sharpen(self, imgs:torch.Tensor, alpha:torch.Tensor,
+                 lightness:torch.Tensor) -> torch.Tensor:
+        """ Same kernel as `iaa.Sharpen`
+        """
+        nochange = torch.zeros((3, 3), device=self.device)
+        nochange[1, 1] = 1
+        effect = -torch.ones((len(alpha), 3, 3), device=self.device)
+        effect[:, 1, 1] = 8 + lightness
+        
+        alpha = alpha[:, None, None]
+        kernels = (1 - alpha) * nochange + alpha * effect
+        
+        return self._depthwise_conv(imgs, kernels)
+        # ---------------------------------------------------------------------/
+
+
+    def _cvt_model_format(self, bgr_imgs:torch.Tensor) -> torch.Tensor:
+        """ Batch version of `ImgDataset_v3._cvt_model_format()`
+        """
+        imgs = bgr_imgs.flip(1) # BGR -> RGB
+        imgs = F.interpolate(imgs, size=self.resize, mode="bicubic", align_corners=False)
+        imgs = imgs.round_().clamp_(0, 255) # same as resizing a `uint8` image
+        
+        return imgs.div_(255.0) # normalize to 0~1
+        # ---------------------------------------------------------------------/
\ No newline at end of file
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from ...shared.utils import create_new_dir
+# -----------------------------------------------------------------------------/
+
+
+class DecodedCropCache():
+
+    def __init__(self, n_items:int, img_shape:Tuple[int, ...], max_mb:int,
+                 disk_root:Union[None, Path]=None,
+                 start_method:Union[None, str]=None) -> None:
+        """ Cache the final `float32` tensors of a deterministic dataset
+            ( 'valid', 'test' ), shared by all `DataLoader` workers.
+            
+            Memory layout ( allocated in shared memory before workers start ):
+            >>> buffer      # (capacity, C, H, W), one slot per cached image
+            >>> slot_of     # dataset index -> slot, `-1`: not cached
+            >>> index_of    # slot -> dataset index, `-1`: free slot
+            >>> last_used   # slot -> logical clock, evict the smallest (LRU)
+            
+            If `disk_root` is given, tensors can also be saved as `{key}.npy`,
+            `key` is content-addressed ( see `get_cache_key()` ),
+            so the next run ( or another model with the same settings ) can reuse them.
+        
+        Args:
+            n_items (int): number of images in the dataset
+            img_shape (Tuple[int, ...]): shape of a tensor, e.g. (3, 224, 224)
+            max_mb (int): size limit of the memory cache (MB)
+            disk_root (Union[None, Path], optional): directory to persist the tensors. Defaults to None.
+            start_method (Union[None, str], optional): start method of the `DataLoader` workers,
+                the lock must be created in the same context. Defaults to None (platform default).
+        """
+        self.img_shape: Tuple[int, ...] = tuple(img_shape)
+        item_nbytes = int(np.prod(self.img_shape)) * 4 # float32
+        self.capacity: int = max(1, min(n_items, (max_mb * 2**20) // item_nbytes))
+        self.disk_root: Union[None, Path] = disk_root
+        
+        self.buffer = torch.empty((self.capacity, *self.img_shape),
+                                  dtype=torch.float32).share_memory_()
+        self.slot_of = torch.full((n_items,), -1, dtype=torch.int64).share_memory_()
+        self.index_of = torch.full((self.capacity,), -1, dtype=torch.int64).share_memory_()
+        self.last_used = torch.zeros((self.capacity,), dtype=torch.int64).share_memory_()
+        self.clock = torch.zeros((1,), dtype=torch.int64).share_memory_()
+        self.lock = mp.get_context(start_method).Lock()
+        
+        if self.disk_root is not None:
+            create_new_dir(self.disk_root)
+        # ---------------------------------------------------------------------/
+
+
+    def _touch(self, slot:int):
+        """ Update `last_used` of `slot`, must be called with `self.lock`
+        """
+        self.clock += 1
+        self.last_used[slot] = self.clock[0]
+        # ---------------------------------------------------------------------/
+
+
+    def get(self, index:int) -> Union[None, torch.Tensor]:
+        """ Get a copy of the cached tensor, return `None` if it's not cached
+        """
+        with self.lock:
+            slot = int(self.slot_of[index])
+            if slot >= 0:
+                self._touch(slot)
+                return self.buffer[slot].clone()
+        
+        return None
+        # ---------------------------------------------------------------------/
+
+
+    def put(self, index:int, img:torch.Tensor):
+        """ Put a tensor into the memory cache, evict the LRU one if it's full
+        """
+        with self.lock:
+            if int(self.slot_of[index]) >= 0:
+                return
+            
+            slot = int(torch.argmin(self.last_used)) # `last_used` of free slots is 0
+            old_index = int(self.index_of[slot])
+            if old_index >= 0: self.slot_of[old_index] = -1 # evict
+            
+            self.buffer[slot] = img
+            self.index_of[slot] = index
+            self.slot_of[index] = slot
+            self._touch(slot)
+        # ---------------------------------------------------------------------/
+
+
+    def load(self, index:int, key:str) -> Union[None, torch.Tensor]:
+        """ Load a tensor from the disk cache ( and put it into the memory cache ),
+            return `None` if it's not found.
+        """
+        path = self.disk_root.joinpath(f"{key}.npy")
+        if not path.exists():
+            return None
+        
+        img = torch.from_numpy(np.load(path))
+        self.put(index, img)
+        
+        return img
+        # ---------------------------------------------------------------------/
+
+
+    def save(self, key:str, img:torch.Tensor):
+        """ Save a tensor to the disk cache
+        """
+        path = self.disk_root.joinpath(f"{key}.npy")
+        if path.exists():
+            return
+        
+        # write to a temp file first, other workers may read the same key
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, img.numpy())
+        os.replace(tmp_path, path)
+        # ---------------------------------------------------------------------/
+
+
+    def __len__(self) -> int:
+        """
+        """
+        return int((self.slot_of >= 0).sum())
+        # ---------------------------------------------------------------------/
+
+
+
+def get_cache_key(src_path:Path, image_name:str, resize:Tuple[int, int],
+                  use_hsv:bool, intensity:int) -> str:
+    """ Content-addressed key of a decoded image,
+        the file size and modified time are used to detect a changed source file.
+    
+    Args:
+        src_path (Path): '.tiff' file, or '.bin' file of the packed store
+        image_name (str): to distinguish images in the same packed store
+    """
+    stat = src_path.stat()
+    text = f"{src_path.resolve()}|{image_name}|{stat.st_size}|{stat.st_mtime_ns}|" \
+           f"{resize}|{use_hsv}|{intensity}"
+    
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+    # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -1,3 +1,4 @@
+import time
 import uuid
 from copy import deepcopy
 from pathlib import Path
@@ -7,23 +8,28 @@ import cv2
 import numpy as np
 import pandas as pd
 import torch
+from colorama import Back, Fore, Style
 from imgaug import augmenters as iaa
 from imgaug.augmentables.segmaps import SegmentationMapsOnImage
 from PIL import Image
 from tomlkit.toml_document import TOMLDocument
 from torch.utils.data import Dataset
 
+from ...data.dataset.packedcropstore import PackedCropStore
 from ...data.dataset.utils import drop_too_dark, parse_dataset_file_name
 from ...data.processeddatainstance import ProcessedDataInstance
 from ...plot.utils import draw_drop_info_on_image
 from ...shared.baseobject import BaseObject
 from ...shared.utils import create_new_dir
 from .augmentation import aug_rotate, dynamic_crop, fake_autofluorescence
+from .decodedcropcache import DecodedCropCache, get_cache_key
 # -----------------------------------------------------------------------------/
 
 
 class ImgDataset_v3(BaseObject, Dataset):
 
+    support_batch_aug: bool = True # raw `uint8` (H, W, C) images for `BatchAugmenter`
+    
     def __init__(self, mode:str, config:Union[dict, TOMLDocument],
                  df:pd.DataFrame, class2num_dict:Dict[str, int], resize:int,
                  transform:Union[None, iaa.Sequential], dst_root:Path,
@@ -56,6 +62,9 @@ class ImgDataset_v3(BaseObject, Dataset):
         self.use_hsv: bool = config["train_opts"]["data"]["use_hsv"]
         self.random_crop: bool = config["train_opts"]["data"]["random_crop"]
         self.add_bg_class: bool = config["train_opts"]["data"]["add_bg_class"]
+        self.decoded_cache: Union[None, DecodedCropCache] = None
+        self.batch_aug: bool = (mode == "train") and \
+                    (config["train_opts"]["data"]["aug_backend"] == "batch")
         
         # ---------------------------------------------------------------------
         # """ actions """
@@ -63,12 +72,25 @@ class ImgDataset_v3(BaseObject, Dataset):
         if self.use_hsv is True:
             self._cli_out.write("※　: using 'HSV' when getting images from the dataset")
         
-        if self.transform is not None:
+        if self.batch_aug:
+            self._cli_out.write("※　: return raw images, augmentation will apply on the whole batch")
+        elif self.transform is not None:
             self._cli_out.write("※　: applying augmentation on the fly")
         
         if self.debug_mode:
             self._cli_out.write("※　: debug mode, all runtime image will save")
             create_new_dir(self.dst_root)
+            if self.mode == "train": self._print_getitem_benchmark()
+        # ---------------------------------------------------------------------/
+    
+    def _print_getitem_benchmark(self) -> None:
+        """
+        """
+        result = self.benchmark_getitem_ops()
+        self._cli_out.write(f"※　: adjust pixel + convert format, "
+                            f"{result['before_us']} -> {result['after_us']} µs/sample "
+                            f"( x{result['speedup']}, identical = {result['identical']}, "
+                            f"{result['n_samples']} samples )")
         # ---------------------------------------------------------------------/
 
     def _set_src_root(self) -> None:
@@ -85,6 +107,33 @@ class ImgDataset_v3(BaseObject, Dataset):
         
         self.src_root = \
             dataset_cropped.joinpath(seed_dir, data, palmskin_result, base_size)
+        
+        self._set_packed_store()
+        # ---------------------------------------------------------------------/
+
+
+    def _set_packed_store(self) -> None:
+        """ Use the packed store ( created by `1.1.crop_images.py` ) if exists,
+            otherwise read '.tiff' files one by one.
+            
+            Only the packs of the splits in `self.df` and the crop setting of
+            `dataset.file_name` are opened, e.g. 'valid_base', 'valid_CRPS256_SF14'
+        """
+        pack_root = self.src_root.joinpath("packed")
+        
+        dataset_param = parse_dataset_file_name(self.config["dataset"]["file_name"])
+        crop_dir_name = f"CRPS{dataset_param['crop_size']}_" \
+                        f"SF{dataset_param['shift_region'].replace('/', '')}" # e.g. 'CRPS256_SF14'
+        splits = self.df["dataset"].unique() if "dataset" in self.df else [self.mode]
+        pack_keys = [f"{split}_{pack_name}" for split in splits
+                                            for pack_name in ["base", crop_dir_name]]
+        
+        if PackedCropStore.exists(pack_root, pack_keys):
+            self.packed_store = PackedCropStore(pack_root, pack_keys)
+            self._cli_out.write(f"※　: reading images from packed store, "
+                                f"{len(self.packed_store)} images: '{pack_root}'")
+        else:
+            self.packed_store = None
         # ---------------------------------------------------------------------/
 
     def _set_dataset_param(self) -> None:
@@ -94,23 +143,103 @@ class ImgDataset_v3(BaseObject, Dataset):
         self.dataset_param = parse_dataset_file_name(name)
         # ---------------------------------------------------------------------/
 
+    def set_decoded_cache(self, max_mb:int, persist:bool,
+                          start_method:Union[None, str]=None) -> None:
+        """ Cache the final tensors of 'valid' / 'test' mode ( deterministic ),
+            must be called before creating the `DataLoader`.
+            
+            The disk cache ( if `persist` ) is under `{src_root}/decoded_cache`.
+        
+        Args:
+            max_mb (int): size limit of the memory cache (MB)
+            persist (bool): also save the tensors to disk, reuse them in next run
+            start_method (Union[None, str], optional): `multiprocessing_context` of
+                the `DataLoader`. Defaults to None (platform default).
+        """
+        if self.mode == "train":
+            raise ValueError(f"{Fore.RED}{Back.BLACK} Decoded image cache is for "
+                             f"'valid' and 'test' mode only {Style.RESET_ALL}\n")
+        
+        if self.debug_mode:
+            self._cli_out.write("※　: debug mode, disable decoded image cache")
+            return
+        
+        disk_root = self.src_root.joinpath("decoded_cache") if persist else None
+        self.decoded_cache = DecodedCropCache(len(self), (3, *self.resize),
+                                              max_mb, disk_root, start_method)
+        
+        self._cli_out.write(f"※　: decoded image cache, capacity = "
+                            f"{self.decoded_cache.capacity} / {len(self)} images"
+                            + (f", persist to '{disk_root}'" if persist else ""))
+        # ---------------------------------------------------------------------/
+    
+    def _get_cache_key(self, index) -> str:
+        """ Key of the disk cache, see `get_cache_key()`
+        """
+        name: str = self.df.iloc[index]["image_name"]
+        
+        if (self.packed_store is not None) and (name in self.packed_store):
+            pack_key, _ = self.packed_store.name2loc[name]
+            src_path = self.packed_store.pack_root.joinpath(f"{pack_key}.bin")
+        else:
+            src_path = self.src_root.joinpath(self.df.iloc[index]["path"])
+        
+        return get_cache_key(src_path, name, self.resize,
+                             self.use_hsv, self.dataset_param["intensity"])
+        # ---------------------------------------------------------------------/
+    
     def __len__(self):
         """
         """
         return len(self.df)
         # ---------------------------------------------------------------------/
 
+    def _read_image(self, index) -> np.ndarray:
+        """ Read image from packed store (zero-copy), fallback to '.tiff'
+        """
+        img = None
+        if self.packed_store is not None:
+            img = self.packed_store.get(self.df.iloc[index]["image_name"])
+            # augmenters may modify the image in-place, memory map is read-only
+            if (img is not None) and (self.mode == "train"): img = img.copy()
+        
+        if img is None:
+            path: Path = self.src_root.joinpath(self.df.iloc[index]["path"])
+            img = cv2.imread(str(path))
+        
+        return img
+        # ---------------------------------------------------------------------/
+
+
     def __getitem__(self, index):
         """
         """
         """ Get name """
         name: str = self.df.iloc[index]["image_name"]
         
+        """ Look up decoded image cache ( 'valid', 'test' ) """
+        cache_key: Union[None, str] = None
+        if self.decoded_cache is not None:
+            img = self.decoded_cache.get(index)
+            if (img is None) and (self.decoded_cache.disk_root is not None):
+                cache_key = self._get_cache_key(index)
+                img = self.decoded_cache.load(index, cache_key)
+            
+            if img is not None:
+                # 'valid', 'test' mode: `img_for_mse` is the same as `img`
+                cls_idx = torch.tensor(self.class2num_dict[self.df.iloc[index]["class"]])
+                return img, img, cls_idx, name
+        
         """ Read image """
-        path: Path = self.src_root.joinpath(self.df.iloc[index]["path"])
-        img: np.ndarray = cv2.imread(str(path))
+        img: np.ndarray = self._read_image(index)
         fish_class: str = self.df.iloc[index]["class"]
         
+        if self.batch_aug:
+            # rotate, random crop, augmentation, "too dark" detection and
+            # adjusting pixel value are applied after collation ( `BatchAugmenter` )
+            cls_idx = torch.tensor(self.class2num_dict[fish_class])
+            return torch.from_numpy(img), torch.empty(0), cls_idx, name
+        
         # >>> Apply different config settings to image <<<
         
         # rotate + random crop
@@ -141,7 +270,7 @@ class ImgDataset_v3(BaseObject, Dataset):
         
         
         # adjust pixel value
-        img_for_mse = deepcopy(img)
+        img_for_mse = img # 'valid', 'test': not modified, no need to copy
         if (self.mode == "train"):
             if (self.add_bg_class) and (state == "discard"):
                 # deprecated
@@ -151,8 +280,8 @@ class ImgDataset_v3(BaseObject, Dataset):
                 img = self._adjust_bright_pixel(img, 0, self.dataset_param["intensity"])
                 img_for_mse = self._adjust_bright_pixel(img_for_mse, 255, self.dataset_param["intensity"])
             else:
-                img = self._adjust_dark_pixel(img, 0, self.dataset_param["intensity"])
-                img_for_mse = self._adjust_dark_pixel(img_for_mse, 255, self.dataset_param["intensity"])
+                img, img_for_mse = \
+                    self._adjust_dark_pixel_pair(img, self.dataset_param["intensity"])
         
         # if self.mode != "train":
         #     assert np.array_equal(img, img_for_mse), "img != img_for_mse"
@@ -166,6 +295,10 @@ class ImgDataset_v3(BaseObject, Dataset):
         img = self._cvt_model_format(img)
         img_for_mse = self._cvt_model_format(img_for_mse)
         
+        if self.decoded_cache is not None:
+            self.decoded_cache.put(index, img)
+            if cache_key is not None: self.decoded_cache.save(cache_key, img)
+        
         # >>> Prepare label <<<
         cls_idx: int = self.class2num_dict[fish_class]
         cls_idx = torch.tensor(cls_idx) # To `Tensor` (64-bit int), e.g. [0]
@@ -174,7 +307,25 @@ class ImgDataset_v3(BaseObject, Dataset):
         # ---------------------------------------------------------------------/
 
     def _cvt_model_format(self, bgr_img:np.ndarray):
+        """ Same result as `_cvt_model_format_v1()`, but resize the `uint8`
+            image and normalize in `float32` ( no intermediate `float64` arrays )
         """
+        # choosing the color model, 'RGB' or 'HSV'
+        if self.use_hsv is True:
+            img = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2HSV_FULL) # BGR -> HSV
+        else:
+            img = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2RGB) # BGR -> RGB
+        
+        # convert format
+        img = cv2.resize(img, self.resize, interpolation=cv2.INTER_CUBIC)
+        img = torch.from_numpy(img).permute(2, 0, 1) # img_dims == 3: (H, W, C) -> (C, H, W)
+        img = img.float().div_(255.0) # To `Tensor` (32-bit float), normalize to 0~1
+        
+        return img
+        # ---------------------------------------------------------------------/
+    
+    def _cvt_model_format_v1(self, bgr_img:np.ndarray): # NOTE: deprecate
+        """ Reference implementation, for `benchmark_getitem_ops()` only
         """
         img = bgr_img[:,:,::-1] # BGR -> RGB
         
@@ -228,6 +379,77 @@ class ImgDataset_v3(BaseObject, Dataset):
         return bgr_img2
         # ---------------------------------------------------------------------/
 
+    def _get_adjust_buffers(self, img_shape:Tuple[int, ...]) -> Tuple[np.ndarray, ...]:
+        """ Preallocated buffers of `_adjust_dark_pixel_pair()`,
+            re-allocate only if the image shape is changed
+        """
+        if getattr(self, "_adjust_buffers_shape", None) != img_shape:
+            self._adjust_buffers_shape = img_shape
+            self._adjust_buffers = (np.empty(img_shape[:2], dtype=np.uint8), # V channel
+                                    np.empty(img_shape[:2], dtype=np.uint8), # mask
+                                    np.empty(img_shape, dtype=np.uint8), # filled with 0
+                                    np.empty(img_shape, dtype=np.uint8)) # filled with 255
+        
+        return self._adjust_buffers
+        # ---------------------------------------------------------------------/
+    
+    def _adjust_dark_pixel_pair(self, bgr_img:np.ndarray,
+                                threshold:int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Fused version of
+            >>> img = self._adjust_dark_pixel(bgr_img, 0, threshold)
+            >>> img_for_mse = self._adjust_dark_pixel(bgr_img, 255, threshold)
+            
+            - V channel of HSV is max(B, G, R), no HSV conversion
+            - the mask is computed once
+            - results are written into preallocated buffers, which are reused
+              by the next call ( `_cvt_model_format()` always creates new tensors )
+        """
+        v_ch, keep, img, img_for_mse = self._get_adjust_buffers(bgr_img.shape)
+        
+        np.maximum(bgr_img[:,:,0], bgr_img[:,:,1], out=v_ch)
+        np.maximum(v_ch, bgr_img[:,:,2], out=v_ch)
+        cv2.compare(v_ch, threshold, cv2.CMP_GT, dst=keep) # keep: 255, dark: 0
+        
+        img.fill(0)
+        cv2.copyTo(bgr_img, keep, img)
+        img_for_mse.fill(255)
+        cv2.copyTo(bgr_img, keep, img_for_mse)
+        
+        return img, img_for_mse
+        # ---------------------------------------------------------------------/
+    
+    def benchmark_getitem_ops(self, n_samples:int=100) -> Dict[str, float]:
+        """ Per-sample microseconds of 'adjust pixel' + 'convert format' in `__getitem__`,
+            before ( `_adjust_dark_pixel()` x2, `_cvt_model_format_v1()` x2 )
+            and after ( `_adjust_dark_pixel_pair()`, `_cvt_model_format()` x2 )
+        """
+        threshold: int = self.dataset_param["intensity"]
+        n_samples = min(n_samples, len(self))
+        imgs = [np.ascontiguousarray(self._read_image(i)) for i in range(n_samples)]
+        
+        before_st = time.perf_counter()
+        before: List[torch.Tensor] = []
+        for img in imgs:
+            img_for_mse = deepcopy(img)
+            before.append(self._cvt_model_format_v1(self._adjust_dark_pixel(img, 0, threshold)))
+            before.append(self._cvt_model_format_v1(self._adjust_dark_pixel(img_for_mse, 255, threshold)))
+        before_us = (time.perf_counter() - before_st) / n_samples * 1e6
+        
+        after_st = time.perf_counter()
+        after: List[torch.Tensor] = []
+        for img in imgs:
+            img, img_for_mse = self._adjust_dark_pixel_pair(img, threshold)
+            after.append(self._cvt_model_format(img))
+            after.append(self._cvt_model_format(img_for_mse))
+        after_us = (time.perf_counter() - after_st) / n_samples * 1e6
+        
+        return {"n_samples": n_samples,
+                "before_us": round(before_us, 1),
+                "after_us": round(after_us, 1),
+                "speedup": round(before_us/after_us, 2),
+                "identical": all(torch.equal(b, a) for b, a in zip(before, after))}
+        # ---------------------------------------------------------------------/
+    
     def _adjust_bright_pixel(self, bgr_img:np.ndarray, value:int,
                              threshold:int) -> np.ndarray:
         """ change all bright pixel (value > `threshold`) to another value
@@ -245,6 +467,8 @@ class ImgDataset_v3(BaseObject, Dataset):
 
 class SurfDGTImgDataset_v3(ImgDataset_v3):
 
+    support_batch_aug: bool = False
+    
     def __init__(self, mode:str, config:Union[dict, TOMLDocument],
                  df:pd.DataFrame, resize:int, intensity_thres: int, scaler:int,
                  transform:Union[None, iaa.Sequential], dst_root:Path,
@@ -296,8 +520,7 @@ class SurfDGTImgDataset_v3(ImgDataset_v3):
         name: str = self.df.iloc[index]["image_name"]
         
         """ Read image """
-        path: Path = self.src_root.joinpath(self.df.iloc[index]["path"])
-        img: np.ndarray = cv2.imread(str(path))
+        img: np.ndarray = self._read_image(index)
         area: str = self.df.iloc[index]["scaled_area"]
         
         # >>> Apply different config settings to image <<<
@@ -307,10 +530,9 @@ class SurfDGTImgDataset_v3(ImgDataset_v3):
             img = self.transform(image=img)
         
         # adjust pixel value
-        img_for_mse = deepcopy(img)
+        img_for_mse = img # 'valid', 'test': not modified, no need to copy
         if (self.mode == "train"):
-            img = self._adjust_dark_pixel(img, 0, self.intensity_thres)
-            img_for_mse = self._adjust_dark_pixel(img_for_mse, 255, self.intensity_thres)
+            img, img_for_mse = self._adjust_dark_pixel_pair(img, self.intensity_thres)
         
         # >>> Prepare images <<<
         img = self._cvt_model_format(img)
@@ -326,6 +548,8 @@ class SurfDGTImgDataset_v3(ImgDataset_v3):
 
 class NoCropImgDataset_v3(ImgDataset_v3):
 
+    support_batch_aug: bool = False
+    
     def __init__(self, mode:str, config:Union[dict, TOMLDocument],
                  df:pd.DataFrame, class2num_dict:Dict[str, int], resize:int, intensity_thres: int,
                  transform:Union[None, iaa.Sequential], dst_root:Path,
@@ -375,8 +599,7 @@ class NoCropImgDataset_v3(ImgDataset_v3):
         name: str = self.df.iloc[index]["image_name"]
         
         """ Read image """
-        path: Path = self.src_root.joinpath(self.df.iloc[index]["path"])
-        img: np.ndarray = cv2.imread(str(path))
+        img: np.ndarray = self._read_image(index)
         fish_class: str = self.df.iloc[index]["class"]
         
         # >>> Apply different config settings to image <<<
@@ -386,10 +609,9 @@ class NoCropImgDataset_v3(ImgDataset_v3):
             img = self.transform(image=img)
         
         # adjust pixel value
-        img_for_mse = deepcopy(img)
+        img_for_mse = img # 'valid', 'test': not modified, no need to copy
         if (self.mode == "train"):
-            img = self._adjust_dark_pixel(img, 0, self.intensity_thres)
-            img_for_mse = self._adjust_dark_pixel(img_for_mse, 255, self.intensity_thres)
+            img, img_for_mse = self._adjust_dark_pixel_pair(img, self.intensity_thres)
         
         # >>> Prepare images <<<
         img = self._cvt_model_format(img)
@@ -406,6 +628,8 @@ class NoCropImgDataset_v3(ImgDataset_v3):
 
 class NormBFImgDataset_v3(ImgDataset_v3):
 
+    support_batch_aug: bool = False
+    
     def __init__(self, mode:str, config:Union[dict, TOMLDocument],
                  df:pd.DataFrame, class2num_dict:Dict[str, int],
                  resize:int, processed_di: ProcessedDataInstance,
@@ -0,0 +1,109 @@
+import time
+from typing import Iterator, List
+
+import torch
+from torch.utils.data import DataLoader, default_collate
+# -----------------------------------------------------------------------------/
+
+
+def collate_crop_batch(batch:List[tuple]) -> tuple:
+    """ Collate `(img, img_for_mse, label, name)` samples,
+        only tensors go through `default_collate` ( stacked in shared memory
+        when using workers ), `name` is kept as a tuple of strings.
+    """
+    imgs, imgs_for_mse, labels, names = zip(*batch)
+    
+    return (default_collate(imgs), default_collate(imgs_for_mse),
+            default_collate(labels), names)
+    # -------------------------------------------------------------------------/
+
+
+
+class PrefetchLoader():
+
+    def __init__(self, dataloader:DataLoader, device:torch.device,
+                 prefetch_to_device:bool) -> None:
+        """ Wrap a `DataLoader`, move tensors of each batch to `device`
+            with non-blocking copies and record the data-wait time of an epoch.
+            
+            If `prefetch_to_device` ( 'cuda' only ), the next batch is copied
+            on a side stream while the current batch is computing
+            ( double buffering, requires `pin_memory` = true ).
+        
+        Args:
+            dataloader (DataLoader): a `DataLoader`
+            device (torch.device): target device
+            prefetch_to_device (bool): copy the next batch in advance
+        """
+        self.dataloader: DataLoader = dataloader
+        self.device: torch.device = device
+        self.prefetch_to_device: bool = prefetch_to_device and (device.type == "cuda")
+        self.data_wait: float = 0.0 # seconds waiting for batches in last epoch
+        # ---------------------------------------------------------------------/
+
+
+    def __len__(self) -> int:
+        """
+        """
+        return len(self.dataloader)
+        # ---------------------------------------------------------------------/
+
+
+    def _next_batch(self, iterator:Iterator) -> tuple:
+        """ Get a batch from `DataLoader` and accumulate the waiting time
+        """
+        wait_st = time.perf_counter()
+        try:
+            return next(iterator)
+        finally:
+            self.data_wait += time.perf_counter() - wait_st
+        # ---------------------------------------------------------------------/
+
+
+    def _to_device(self, batch:tuple) -> tuple:
+        """
+        """
+        return tuple(item.to(self.device, non_blocking=True)
+                     if isinstance(item, torch.Tensor) else item for item in batch)
+        # ---------------------------------------------------------------------/
+
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        """
+        self.data_wait = 0.0
+        iterator = iter(self.dataloader)
+        
+        if not self.prefetch_to_device:
+            while True:
+                try:
+                    batch = self._next_batch(iterator)
+                except StopIteration:
+                    return
+                yield self._to_device(batch)
+        
+        stream = torch.cuda.Stream(device=self.device)
+        
+        try:
+            next_batch = self._next_batch(iterator)
+        except StopIteration:
+            return
+        with torch.cuda.stream(stream):
+            next_batch = self._to_device(next_batch)
+        
+        while next_batch is not None:
+            torch.cuda.current_stream(self.device).wait_stream(stream)
+            batch = next_batch
+            for item in batch: # memory is used by the current stream now
+                if isinstance(item, torch.Tensor):
+                    item.record_stream(torch.cuda.current_stream(self.device))
+            
+            try:
+                next_batch = self._next_batch(iterator)
+                with torch.cuda.stream(stream):
+                    next_batch = self._to_device(next_batch)
+            except StopIteration:
+                next_batch = None
+            
+            yield batch
+        # ---------------------------------------------------------------------/
\ No newline at end of file
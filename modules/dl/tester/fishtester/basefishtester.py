@@ -2,23 +2,26 @@ import json
 import os
 import re
 import sys
-from collections import Counter
+import time
 from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
 import cv2
 import numpy as np
 import torch
+from colorama import Back, Fore, Style
 from pytorch_grad_cam import (AblationCAM, DeepFeatureFactorization, EigenCAM,
                               FullGrad, GradCAM, GradCAMPlusPlus, HiResCAM,
                               ScoreCAM, XGradCAM)
 from tqdm.auto import tqdm
 
-from ....shared.utils import (create_new_dir, formatter_padr0,
-                              get_target_str_idx_in_list)
-from ...utils import calculate_metrics
+from ....shared.utils import formatter_padr0, get_target_str_idx_in_list
+from ...utils import calculate_metrics, get_autocast, get_peak_memory
 from ..imagetester.baseimagetester import BaseImageTester
+from ..predictioncache import (FISH_AGG_RULES, PredictionCache,
+                               get_pred_cache_name)
 from ..utils import rename_history_dir
+from .camresultwriter import CamResultWriter
 # -----------------------------------------------------------------------------/
 
 
@@ -48,9 +51,14 @@ class BaseFishTester(BaseImageTester):
         
         """ Initial CAM generator and directory """
         if self.do_cam:
-            self._cli_out.write(f"※　: Do CAM, colormap using '{self.colormap}'")
+            self._check_cam_opts()
+            self._cli_out.write(f"※　: Do CAM, colormap using '{self.colormap}', "
+                                f"storage: '{self.cam_storage}'")
+            self._cli_out.write(f"※　: CAM mode: '{self.cam_mode}', subset: '{self.cam_subset}'")
             self._set_cam_result_root()
             self._set_cam_generator() # abstract function
+            if self.cam_mode == "gradient_free":
+                self._set_gradient_free_cam_generator()
         # ---------------------------------------------------------------------/
 
 
@@ -62,6 +70,50 @@ class BaseFishTester(BaseImageTester):
         """ [cam] """
         self.do_cam: bool = self.config["cam"]["enable"]
         self.colormap: str = self.config["cam"]["colormap"]
+        self.cam_writer_threads: int = self.config["cam"]["writer_threads"]
+        self.cam_storage: str = self.config["cam"]["storage"]
+        self.cam_mode: str = self.config["cam"]["mode"]
+        self.cam_subset: str = self.config["cam"]["subset"]
+        self.cam_sample_ratio: float = self.config["cam"]["sample_ratio"]
+        
+        if self.do_cam: # hooks of CAM generator don't work on a compiled model
+            self.compile_model = False
+        
+        """ [test_opts.fish_aggregation] """
+        self.fish_agg_rule: str = self.config["test_opts"]["fish_aggregation"]["rule"]
+        self.fish_agg_top_k: int = self.config["test_opts"]["fish_aggregation"]["top_k"]
+        
+        if self.fish_agg_rule not in FISH_AGG_RULES:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} `test_opts.fish_aggregation.rule` accepts "
+                             f"'majority_vote', 'mean_prob' or 'top_k' only, "
+                             f"got '{self.fish_agg_rule}' {Style.RESET_ALL}\n")
+        # ---------------------------------------------------------------------/
+
+
+    def _set_pred_cache(self): # extend
+        """ CAM needs the model, cached predictions are not reused if `cam.enable` = true
+        """
+        if self.do_cam:
+            self.pred_cache_path: Path = \
+                self.history_dir.joinpath(get_pred_cache_name(self.model_state))
+            self.pred_cache = None
+        else:
+            super()._set_pred_cache()
+        # ---------------------------------------------------------------------/
+
+
+    def _check_cam_opts(self):
+        """
+        """
+        if self.cam_mode not in ["aug_eigen", "eigen", "none", "gradient_free"]:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} `cam.mode` accepts "
+                             f"'aug_eigen', 'eigen', 'none' or 'gradient_free' only, "
+                             f"got '{self.cam_mode}' {Style.RESET_ALL}\n")
+        
+        if self.cam_subset not in ["all", "misclassified", "sampled"]:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} `cam.subset` accepts "
+                             f"'all', 'misclassified' or 'sampled' only, "
+                             f"got '{self.cam_subset}' {Style.RESET_ALL}\n")
         # ---------------------------------------------------------------------/
 
 
@@ -87,6 +139,22 @@ class BaseFishTester(BaseImageTester):
         # ---------------------------------------------------------------------/
 
 
+    def _set_gradient_free_cam_generator(self):
+        """ Replace `self.cam_generator` with an `EigenCAM` on the same target layers,
+            it projects the activations on their first principal component,
+            so the CAM comes from the forward pass of prediction ( no backward ).
+        """
+        target_layers = self.cam_generator.target_layers
+        reshape_transform = self.cam_generator.reshape_transform
+        self.cam_generator.activations_and_grads.release() # remove hooks
+        
+        self.cam_generator: EigenCAM = \
+            EigenCAM(model=self.model, target_layers=target_layers,
+                     use_cuda=(self.device.type == "cuda"),
+                     reshape_transform=reshape_transform)
+        # ---------------------------------------------------------------------/
+
+
     # def _set_dff(self): # abstract function
     #     """
     #     """
@@ -110,12 +178,22 @@ class BaseFishTester(BaseImageTester):
         """ Testing """
         self._set_testing_attrs()
         self._cli_out.divide()
-        self.pbar_n_test = tqdm(total=len(self.test_dataloader),
-                                desc="Test (PredByFish) ")
         
-        self._one_epoch_testing()
+        if self.pred_cache is None:
+            if self.do_cam: self._set_cam_writer()
+            self.pbar_n_test = tqdm(total=len(self.test_dataloader),
+                                    desc="Test (PredByFish) ")
+            test_st: float = time.time()
+            self._one_epoch_testing() # --> self.pred_cache
+            if self.do_cam: self.cam_writer.close() # wait for pending CAM results
+            self._calc_results_from_pred_cache()
+            self._update_throughput_log(time.time() - test_st)
+            if self.do_cam: self._update_cam_log()
+            self.pbar_n_test.close()
+            if self.use_pred_cache: self.pred_cache.save(self.pred_cache_path) # save file
+        else:
+            self._calc_results_from_pred_cache()
         
-        self.pbar_n_test.close()
         self._cli_out.new_line()
         
         """ Save files """
@@ -145,41 +223,62 @@ class BaseFishTester(BaseImageTester):
         """
         super()._set_testing_attrs()
         
-        self.fish_pred_dict: Dict[str, Counter] = {}
-        self.fish_gt_dict: Dict[str, Counter] = {}
+        self.fish_pred_dict: Dict[str, str] = {}
+        self.fish_gt_dict: Dict[str, str] = {}
         self.image_predict_ans_dict: dict = {}
+        
+        """ CAM """
+        self.cam_rng = np.random.default_rng(self.rand_seed) # (config) `cam.subset` = 'sampled'
+        self.cam_time: float = 0.0
+        self.cam_count: int = 0
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
         # ---------------------------------------------------------------------/
 
 
     def _one_epoch_testing(self): # overwrite
+        """ Run the model over `test_set` ( and generate CAM ), set below attributes
+            >>> self.pred_cache: PredictionCache
         """
-        """
+        name_list: list = []
+        logits_list: List[torch.Tensor] = []
+        gt_list: list = []
         accum_loss: float = 0.0
         
         self.model.eval() # set to evaluation mode
         for batch, data in enumerate(self.test_dataloader):
             
             images, _, labels, crop_names = data
-            images, labels = images.to(self.device), labels.to(self.device) # move to GPU
+            images, labels = images.to(self.device, memory_format=self.memory_format), \
+                             labels.to(self.device) # move to GPU
             
-            preds = self.model(images)
-            loss_value = self.loss_fn(preds, labels)
+            # CAM generator needs gradients, only disable them for the prediction
+            with torch.inference_mode(), get_autocast(self.device, self.use_amp):
+                if self.do_cam and (self.cam_mode == "gradient_free"):
+                    # hooks of `EigenCAM` keep the activations of this forward pass
+                    preds = self.cam_generator.activations_and_grads(images).float()
+                else:
+                    preds = self.model(images).float()
+                loss_value = self.loss_fn(preds, labels)
             
             """ Accumulate current batch loss """
             accum_loss += loss_value.item() # tensor.item() -> get value of a Tensor
 
-            """ Extend `pred_list`, `gt_list` """
+            """ Extend `name_list`, `logits_list`, `gt_list` """
             preds_prob = torch.nn.functional.softmax(preds, dim=1)
             _, preds_hcls = torch.max(preds_prob, 1) # get the highest probability class
+            name_list.extend(crop_names)
+            logits_list.append(preds.cpu())
+            gt_list.extend(labels.cpu().numpy().tolist())
             
             """ Generate CAM for current batch """
             if self.do_cam:
-                """ If targets is `None`, returns the map for the highest scoring category.
-                    Otherwise, targets the requested category.
-                """
-                grayscale_cam_batch = \
-                    self.cam_generator(input_tensor=images, targets=None, 
-                                       aug_smooth=True, eigen_smooth=True)
+                cam_idxs = self._select_cam_idxs(preds_hcls, labels)
+                if len(cam_idxs) > 0:
+                    cam_st: float = time.perf_counter()
+                    grayscale_cam_batch = self._gen_cam_batch(images, cam_idxs)
+                    self.cam_time += time.perf_counter() - cam_st
+                    self.cam_count += len(cam_idxs)
             
             # # # Deep Feature Factorizations
             # from pytorch_grad_cam.utils.image import show_factorization_on_image
@@ -205,17 +304,10 @@ class BaseFishTester(BaseImageTester):
             #     Image.fromarray(result).save(self.history_dir.joinpath("dff.png"))
             # self.model.to(self.device)
             
-            """ Update 'predict_class' according to 'fish_dsname' """
-            preds_hcls_list: list = preds_hcls.cpu().numpy().tolist()
-            preds_prob_array: np.ndarray = preds_prob.cpu().detach().numpy()
-            for crop_name, pred_prob, pred_hcls, label in \
-                    zip(crop_names, preds_prob_array, preds_hcls_list, labels):
-                self._update_fish_pred_gt_dict(crop_name, pred_prob, pred_hcls, label)
-            
-            """ Save cam result ( both of grayscale, color ) """
-            if self.do_cam:
-                for crop_name, grayscale_cam in zip(crop_names, grayscale_cam_batch):
-                    self._save_cam_result(crop_name, grayscale_cam)
+            """ Save cam result ( both of grayscale, color ), on background threads """
+            if self.do_cam and (len(cam_idxs) > 0):
+                self.cam_writer.submit([crop_names[i] for i in cam_idxs.tolist()],
+                                       grayscale_cam_batch)
 
             """ Print number of matches in current batch """
             num_match = (preds_hcls.cpu() == labels.cpu()).sum().item()
@@ -228,50 +320,81 @@ class BaseFishTester(BaseImageTester):
             self.pbar_n_test.update(1)
             self.pbar_n_test.refresh()
 
-        for key, cnt in self.fish_pred_dict.items(): self.fish_pred_dict[key] = cnt.most_common(1)[0][0]
-        for key, cnt in self.fish_gt_dict.items(): self.fish_gt_dict[key] = cnt.most_common(1)[0][0]
+        self.pred_cache = PredictionCache(name_list, torch.cat(logits_list).numpy(),
+                                          np.array(gt_list), self.num2class_list,
+                                          (accum_loss/len(self.test_dataloader)))
+        # ---------------------------------------------------------------------/
+
+
+    def _calc_results_from_pred_cache(self): # overwrite
+        """ Aggregate the crops of each fish, (config) `test_opts.fish_aggregation`
+        """
+        self.fish_pred_dict, self.fish_gt_dict = \
+            self.pred_cache.get_fish_results(self.fish_agg_rule, self.fish_agg_top_k)
+        self.image_predict_ans_dict = self.pred_cache.get_predict_ans_dict() # for gallery
         self.pred_list_to_name = [ value for _, value in self.fish_pred_dict.items() ]
-        self.gt_list_to_name = [ value for _, value in self.fish_gt_dict.items() ]        
+        self.gt_list_to_name = [ value for _, value in self.fish_gt_dict.items() ]
         
-        calculate_metrics(self.test_log, (accum_loss/len(self.test_dataloader)),
+        calculate_metrics(self.test_log, self.pred_cache.average_loss,
                           self.pred_list_to_name, self.gt_list_to_name, self.class2num_dict)
+        self.test_log["fish_aggregation"] = self.fish_agg_rule
         # ---------------------------------------------------------------------/
 
 
-    def _update_fish_pred_gt_dict(self, crop_name:str, pred_prob: np.ndarray,
-                                        pred_hcls:int, label:int):
-        """
+    def _select_cam_idxs(self, preds_hcls:torch.Tensor,
+                               labels:torch.Tensor) -> torch.Tensor:
+        """ Indices of the crops in current batch to generate CAM, (config) `cam.subset`
         """
-        crop_name_split: List[str] = crop_name.split("_")
-        target_idx = get_target_str_idx_in_list(crop_name_split, "crop")
-        fish_dsname: str = "_".join(crop_name_split[:target_idx])
-        # Example : ['fish', '1', 'A', 'U', 'crop', '0']
-        # >>> list[:3] = 'fish_1_A'; list[:4] = 'fish_1_A_U'
-        
-        """ Update `self.fish_gt_dict` """
-        gt_class: str = self.num2class_list[label]
-        if fish_dsname not in self.fish_gt_dict:
-            self.fish_gt_dict[fish_dsname] = Counter() # init a Counter
-        self.fish_gt_dict[fish_dsname].update([gt_class])
+        if self.cam_subset == "misclassified":
+            mask = (preds_hcls != labels).cpu()
+        elif self.cam_subset == "sampled":
+            mask = torch.from_numpy(self.cam_rng.random(len(labels)) < self.cam_sample_ratio)
+        else:
+            mask = torch.ones(len(labels), dtype=torch.bool)
         
-        """ Update `self.fish_pred_dict` """
-        pred_class: str = self.num2class_list[pred_hcls]
-        if fish_dsname not in self.fish_pred_dict:
-            self.fish_pred_dict[fish_dsname] = Counter() # init a Counter
-        self.fish_pred_dict[fish_dsname].update([pred_class])
+        return torch.nonzero(mask).squeeze(1)
+        # ---------------------------------------------------------------------/
+
+
+    def _gen_cam_batch(self, images:torch.Tensor, idxs:torch.Tensor) -> np.ndarray:
+        """ Generate CAM of `images[idxs]`, (config) `cam.mode`
+            
+            If targets is `None`, returns the map for the highest scoring category.
+            Otherwise, targets the requested category.
+        """
+        if self.cam_mode == "gradient_free":
+            # activations are kept by the prediction ( `_one_epoch_testing` )
+            activations_and_grads = self.cam_generator.activations_and_grads
+            activations_and_grads.activations = \
+                [activation[idxs.to(activation.device)].float() # SVD on `float32`
+                    for activation in activations_and_grads.activations]
+            cam_per_layer = \
+                self.cam_generator.compute_cam_per_layer(images[idxs], None, False)
+            return self.cam_generator.aggregate_multi_layers(cam_per_layer)
         
-        """ Store result for each crop image in `self.image_predict_ans_dict` ( for gallery ) """
-        tmp_dict = {}
-        for k, v in self.class2num_dict.items():
-            tmp_dict[k] = round(float(pred_prob[v]), 5)
-        self.image_predict_ans_dict[crop_name] = { "gt": gt_class,
-                                                   "pred": pred_class,
-                                                   "pred_prob": tmp_dict}
+        return self.cam_generator(input_tensor=images[idxs], targets=None,
+                                  aug_smooth=(self.cam_mode == "aug_eigen"),
+                                  eigen_smooth=(self.cam_mode in ["aug_eigen", "eigen"]))
         # ---------------------------------------------------------------------/
 
 
-    def _save_cam_result(self, crop_name:str, grayscale_cam):
+    def _set_cam_writer(self):
+        """ Set below attributes
+            >>> self.cam_writer: CamResultWriter
         """
+        resize: Tuple[int, int] = \
+            (self.test_set.crop_size, self.test_set.crop_size)
+        
+        self.cam_writer = CamResultWriter(self._get_cam_save_paths, resize,
+                                          cv2.INTER_CUBIC, self.colormap,
+                                          storage=self.cam_storage,
+                                          num_threads=self.cam_writer_threads)
+        # ---------------------------------------------------------------------/
+
+
+    def _get_cam_save_paths(self, crop_name:str) -> Tuple[Path, Path]:
+        """ Return paths of ( grayscale map, color map ),
+            called by the threads of `self.cam_writer`
         """
         crop_name_split: List[str] = crop_name.split("_")
         target_idx = get_target_str_idx_in_list(crop_name_split, "crop")
@@ -279,27 +402,28 @@ class BaseFishTester(BaseImageTester):
         # Example : ['fish', '1', 'A', 'U', 'crop', '0']
         # >>> list[:3] = 'fish_1_A'; list[:4] = 'fish_1_A_U'
         
-        resize: Tuple[int, int] = \
-            (self.test_set.crop_size, self.test_set.crop_size)
-        
         """ Gray """
-        cam_result_dir = self.cam_result_root.joinpath(fish_dsname, "grayscale_map")
-        create_new_dir(cam_result_dir)
         crop_name_split[target_idx] = "graymap"
-        cam_save_path = cam_result_dir.joinpath(f"{'_'.join(crop_name_split)}.tiff")
-        grayscale_cam = np.uint8(255 * grayscale_cam)
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(grayscale_cam, resize, interpolation=cv2.INTER_CUBIC))
+        gray_path = self.cam_result_root.joinpath(fish_dsname, "grayscale_map",
+                                                  f"{'_'.join(crop_name_split)}.tiff")
         
         """ Color """
-        cam_result_dir = self.cam_result_root.joinpath(fish_dsname, "color_map")
-        create_new_dir(cam_result_dir)
         crop_name_split[target_idx] = "colormap"
-        cam_save_path = cam_result_dir.joinpath(f"{'_'.join(crop_name_split)}.tiff")
-        color_cam = cv2.applyColorMap(grayscale_cam,
-                                        getattr(cv2, self.colormap)) # BGR
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(color_cam, resize, interpolation=cv2.INTER_CUBIC))
+        color_path = self.cam_result_root.joinpath(fish_dsname, "color_map",
+                                                   f"{'_'.join(crop_name_split)}.tiff")
+        
+        return gray_path, color_path
+        # ---------------------------------------------------------------------/
+
+
+    def _update_cam_log(self):
+        """ Record the CAM mode, time and peak memory in `test_log`
+        """
+        self.test_log["cam_mode"] = self.cam_mode
+        self.test_log["cam_subset"] = self.cam_subset
+        self.test_log["cam_count"] = self.cam_count
+        self.test_log["cam_time_sec"] = round(self.cam_time, 2)
+        self.test_log.update(get_peak_memory(self.device))
         # ---------------------------------------------------------------------/
 
 
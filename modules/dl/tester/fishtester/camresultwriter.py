@@ -0,0 +1,162 @@
+import queue
+import threading
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
+
+import cv2
+import numpy as np
+from colorama import Back, Fore, Style
+
+from ....shared.utils import create_new_dir
+from ...cam.camarray import CAM_ARRAY_FILE, CamArrayWriter
+# -----------------------------------------------------------------------------/
+
+
+class CamResultWriter():
+
+    def __init__(self, get_save_paths:Callable[[str], Tuple[Path, Path]],
+                 resize:Tuple[int, int], interpolation:int, colormap:str,
+                 storage:str="tiff", num_threads:int=4, queue_size:int=8) -> None:
+        """ Save CAM results ( grayscale map and color map ) of a batch
+            on background threads, files are the same as saving crop by crop:
+            >>> gray = np.uint8(255 * grayscale_cam)
+            >>> cv2.imwrite(gray_path, cv2.resize(gray, resize, interpolation))
+            >>> color = cv2.applyColorMap(gray, colormap) # BGR
+            >>> cv2.imwrite(color_path, cv2.resize(color, resize, interpolation))
+            
+            If `storage` = 'array', only the resized grayscale maps are saved,
+            one `CAM_ARRAY_FILE` per fish ( the parent of 'grayscale_map/' ),
+            see `CamArrayWriter`.
+        
+        Args:
+            get_save_paths (Callable[[str], Tuple[Path, Path]]): `crop_name` -> ( `gray_path`, `color_path` )
+            resize (Tuple[int, int]): size of saved images, (W, H)
+            interpolation (int): interpolation of `cv2.resize()`
+            colormap (str): name of an OpenCV colormap, e.g. 'COLORMAP_JET'
+            storage (str, optional): 'tiff' or 'array'. Defaults to 'tiff'.
+            num_threads (int, optional): number of writer threads. Defaults to 4.
+            queue_size (int, optional): max number of pending batches. Defaults to 8.
+        """
+        if storage not in ["tiff", "array"]:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} `cam.storage` accepts 'tiff' or 'array' only, "
+                             f"got '{storage}' {Style.RESET_ALL}\n")
+        
+        self.get_save_paths: Callable[[str], Tuple[Path, Path]] = get_save_paths
+        self.resize: Tuple[int, int] = resize
+        self.interpolation: int = interpolation
+        self.colormap: str = colormap
+        self.storage: str = storage
+        
+        # `cv2.applyColorMap()` is a lookup table, apply it on a whole batch
+        self.lut: np.ndarray = \
+            cv2.applyColorMap(np.arange(256, dtype=np.uint8)[:, None],
+                              getattr(cv2, colormap)).reshape(256, 3) # BGR
+        
+        self._created_dirs: Set[Path] = set()
+        self._dirs_lock = threading.Lock()
+        self._archives: Dict[Path, CamArrayWriter] = {}
+        self._error: str = ""
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = \
+            [threading.Thread(target=self._worker, daemon=True,
+                              name=f"CamResultWriter_{i}") for i in range(num_threads)]
+        for thread in self._threads: thread.start()
+        # ---------------------------------------------------------------------/
+
+
+    def submit(self, crop_names:List[str], grayscale_cam_batch:np.ndarray):
+        """ Queue a batch of CAMs ( `float32`, 0 ~ 1, shape = (N, H, W) )
+        """
+        self._check_error()
+        self._queue.put((list(crop_names), grayscale_cam_batch))
+        # ---------------------------------------------------------------------/
+
+
+    def _worker(self):
+        """
+        """
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            
+            if self._error:
+                continue # drain the queue, error is raised by `submit()` / `close()`
+            
+            try:
+                self._write_batch(*task)
+            except Exception:
+                self._error = traceback.format_exc()
+        # ---------------------------------------------------------------------/
+
+
+    def _write_batch(self, crop_names:List[str], grayscale_cam_batch:np.ndarray):
+        """
+        """
+        gray_batch = np.uint8(255 * grayscale_cam_batch)
+        
+        if self.storage == "array":
+            for crop_name, gray in zip(crop_names, gray_batch):
+                gray_path, _ = self.get_save_paths(crop_name)
+                archive = self._get_archive(gray_path.parent.parent)
+                archive.write(gray_path.stem,
+                              cv2.resize(gray, self.resize, interpolation=self.interpolation))
+            return
+        
+        color_batch = self.lut[gray_batch] # (N, H, W) -> (N, H, W, 3)
+        
+        # NOTE: stacking images along the channel axis for one `cv2.resize()`
+        # is slower and NOT identical ( another code path for > 4 channels )
+        for crop_name, gray, color in zip(crop_names, gray_batch, color_batch):
+            gray_path, color_path = self.get_save_paths(crop_name)
+            self._create_dir(gray_path.parent)
+            self._create_dir(color_path.parent)
+            cv2.imwrite(str(gray_path),
+                        cv2.resize(gray, self.resize, interpolation=self.interpolation))
+            cv2.imwrite(str(color_path),
+                        cv2.resize(color, self.resize, interpolation=self.interpolation))
+        # ---------------------------------------------------------------------/
+
+
+    def _create_dir(self, dir:Path):
+        """ Create each directory only once
+        """
+        with self._dirs_lock:
+            if dir not in self._created_dirs:
+                create_new_dir(dir)
+                self._created_dirs.add(dir)
+        # ---------------------------------------------------------------------/
+
+
+    def _get_archive(self, dir:Path) -> CamArrayWriter:
+        """ Create the `CamArrayWriter` of a fish only once
+        """
+        with self._dirs_lock:
+            if dir not in self._archives:
+                create_new_dir(dir)
+                self._archives[dir] = \
+                    CamArrayWriter(dir.joinpath(CAM_ARRAY_FILE), self.colormap)
+            return self._archives[dir]
+        # ---------------------------------------------------------------------/
+
+
+    def _check_error(self):
+        """
+        """
+        if self._error:
+            raise RuntimeError(f"{Fore.RED}{Back.BLACK} Failed to save CAM results "
+                               f"{Style.RESET_ALL}\n{self._error}")
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """ Wait for all pending batches, then stop the threads
+        """
+        for _ in self._threads: self._queue.put(None)
+        for thread in self._threads: thread.join()
+        for archive in self._archives.values(): archive.close()
+        
+        self._check_error()
+        # ---------------------------------------------------------------------/
\ No newline at end of file
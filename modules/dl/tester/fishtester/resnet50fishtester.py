@@ -98,7 +98,8 @@ class ResNet50FishTester(BaseFishTester):
         #     target_layers.append(getattr(self.model.encoder.layers, f"encoder_layer_{i}").ln_1)
         
         self.cam_generator: GradCAM = \
-            GradCAM(model=self.model, target_layers=target_layers, use_cuda=True)
+            GradCAM(model=self.model, target_layers=target_layers,
+                    use_cuda=(self.device.type == "cuda"))
         
         # self.cam_generator: XGradCAM = \
         #     XGradCAM(model=self.model, target_layers=target_layers,
@@ -1,7 +1,8 @@
 from collections import Counter
+from pathlib import Path
+from typing import Tuple
 
 import cv2
-import numpy as np
 import pandas as pd
 import torch
 import torchvision
@@ -13,9 +14,10 @@ from pytorch_grad_cam.ablation_layer import AblationLayerVit
 from pytorch_grad_cam.utils.image import show_factorization_on_image
 from torch import nn
 
-from ....shared.utils import create_new_dir, get_target_str_idx_in_list
+from ....shared.utils import get_target_str_idx_in_list
 from ...dataset.imgdataset import NoCropImgDataset_v3
 from ...tester.utils import reshape_transform
+from .camresultwriter import CamResultWriter
 from .resnet50fishtester import ResNet50FishTester
 # -----------------------------------------------------------------------------/
 
@@ -66,24 +68,23 @@ class ResNet50NoCropFishTester(ResNet50FishTester):
         # ---------------------------------------------------------------------/
 
 
-    def _save_cam_result(self, crop_name:str, grayscale_cam): # overwrite
+    def _set_cam_writer(self): # overwrite
         """
         """
+        self.cam_writer = CamResultWriter(self._get_cam_save_paths, self.img_size,
+                                          cv2.INTER_CUBIC, self.colormap,
+                                          storage=self.cam_storage,
+                                          num_threads=self.cam_writer_threads)
+        # ---------------------------------------------------------------------/
+
+
+    def _get_cam_save_paths(self, crop_name:str) -> Tuple[Path, Path]: # overwrite
+        """
+        """
+        gray_path = self.cam_result_root.joinpath(crop_name, "grayscale_map",
+                                                  f"{crop_name+'_graymap'}.tiff")
+        color_path = self.cam_result_root.joinpath(crop_name, "color_map",
+                                                   f"{crop_name+'_colormap'}.tiff")
         
-        """ Gray """
-        cam_result_dir = self.cam_result_root.joinpath(crop_name, "grayscale_map")
-        create_new_dir(cam_result_dir)
-        cam_save_path = cam_result_dir.joinpath(f"{crop_name+'_graymap'}.tiff")
-        grayscale_cam = np.uint8(255 * grayscale_cam)
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(grayscale_cam, self.img_size, interpolation=cv2.INTER_CUBIC))
-        
-        """ Color """
-        cam_result_dir = self.cam_result_root.joinpath(crop_name, "color_map")
-        create_new_dir(cam_result_dir)
-        cam_save_path = cam_result_dir.joinpath(f"{crop_name+'_colormap'}.tiff")
-        color_cam = cv2.applyColorMap(grayscale_cam,
-                                        getattr(cv2, self.colormap)) # BGR
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(color_cam, self.img_size, interpolation=cv2.INTER_CUBIC))
+        return gray_path, color_path
         # ---------------------------------------------------------------------/
\ No newline at end of file
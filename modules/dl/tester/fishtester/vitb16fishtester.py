@@ -99,7 +99,7 @@ class VitB16FishTester(BaseFishTester):
         
         self.cam_generator: GradCAM = \
             GradCAM(model=self.model, target_layers=target_layers,
-                    use_cuda=True, reshape_transform=reshape_transform)
+                    use_cuda=(self.device.type == "cuda"), reshape_transform=reshape_transform)
         
         # self.cam_generator: XGradCAM = \
         #     XGradCAM(model=self.model, target_layers=target_layers,
@@ -1,7 +1,8 @@
 from collections import Counter
+from pathlib import Path
+from typing import Tuple
 
 import cv2
-import numpy as np
 import pandas as pd
 import torch
 import torchvision
@@ -14,10 +15,11 @@ from pytorch_grad_cam.utils.image import show_factorization_on_image
 from torch import nn
 
 from ....shared.config import dump_config
-from ....shared.utils import create_new_dir, get_target_str_idx_in_list
+from ....shared.utils import get_target_str_idx_in_list
 from ...dataset.imgdataset import NormBFImgDataset_v3
 from ...tester.utils import reshape_transform
 from .basenormbffishtester import BaseNormBFFishTester
+from .camresultwriter import CamResultWriter
 # -----------------------------------------------------------------------------/
 
 
@@ -106,7 +108,7 @@ class VitB16NormBFFishTester(BaseNormBFFishTester):
         
         self.cam_generator: GradCAM = \
             GradCAM(model=self.model, target_layers=target_layers,
-                    use_cuda=True, reshape_transform=reshape_transform)
+                    use_cuda=(self.device.type == "cuda"), reshape_transform=reshape_transform)
         
         # self.cam_generator: XGradCAM = \
         #     XGradCAM(model=self.model, target_layers=target_layers,
@@ -149,25 +151,25 @@ class VitB16NormBFFishTester(BaseNormBFFishTester):
         # ---------------------------------------------------------------------/
 
 
-    def _save_cam_result(self, crop_name:str, grayscale_cam):
+    def _set_cam_writer(self):
         """
         >>> # overwrite: BaseNormBFFishTester
         """
+        self.cam_writer = CamResultWriter(self._get_cam_save_paths, self.img_size,
+                                          cv2.INTER_LANCZOS4, self.colormap,
+                                          storage=self.cam_storage,
+                                          num_threads=self.cam_writer_threads)
+        # ---------------------------------------------------------------------/
+
+
+    def _get_cam_save_paths(self, crop_name:str) -> Tuple[Path, Path]:
+        """
+        >>> # overwrite: BaseNormBFFishTester
+        """
+        gray_path = self.cam_result_root.joinpath(crop_name, "grayscale_map",
+                                                  f"{crop_name}.graymap.tiff")
+        color_path = self.cam_result_root.joinpath(crop_name, "color_map",
+                                                   f"{crop_name}.colormap.tiff")
         
-        """ Gray """
-        cam_result_dir = self.cam_result_root.joinpath(crop_name, "grayscale_map")
-        create_new_dir(cam_result_dir)
-        cam_save_path = cam_result_dir.joinpath(f"{crop_name}.graymap.tiff")
-        grayscale_cam = np.uint8(255 * grayscale_cam)
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(grayscale_cam, self.img_size, interpolation=cv2.INTER_LANCZOS4))
-        
-        """ Color """
-        cam_result_dir = self.cam_result_root.joinpath(crop_name, "color_map")
-        create_new_dir(cam_result_dir)
-        cam_save_path = cam_result_dir.joinpath(f"{crop_name}.colormap.tiff")
-        color_cam = cv2.applyColorMap(grayscale_cam,
-                                        getattr(cv2, self.colormap)) # BGR
-        cv2.imwrite(str(cam_save_path), \
-                    cv2.resize(color_cam, self.img_size, interpolation=cv2.INTER_LANCZOS4))
+        return gray_path, color_path
         # ---------------------------------------------------------------------/
\ No newline at end of file
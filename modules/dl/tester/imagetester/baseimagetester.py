@@ -2,6 +2,7 @@ import os
 import random
 import re
 import sys
+import time
 from collections import Counter
 from copy import deepcopy
 from pathlib import Path
@@ -27,7 +28,9 @@ from ...dataset.imgdataset import ImgDataset_v3
 from ...tester.utils import get_history_dir
 from ...trainer.utils import calculate_class_weight
 from ...utils import (calculate_metrics, gen_class2num_dict,
-                      gen_class_counts_dict, set_gpu)
+                      gen_class_counts_dict, get_autocast,
+                      get_device_info, is_cpu_bf16_supported, set_device)
+from ..predictioncache import PredictionCache, get_pred_cache_name
 from ..utils import confusion_matrix_with_class, rename_history_dir
 
 new_rc_params = {'text.usetex': False, "svg.fonttype": 'none'}
@@ -61,20 +64,25 @@ class BaseImageTester(BaseObject):
         self._set_history_dir()
         self._set_training_config_attrs()
         
-        # GPU settings
-        self.device: torch.device = set_gpu(self.cuda_idx, self._cli_out)
+        # Device settings ( 'cuda' or CPU backend )
+        self.device: torch.device = set_device(self.device_type, self.cuda_idx,
+                                               self.num_threads, self._cli_out)
+        self._set_backend_attrs()
         self._set_testing_reproducibility()
         
         self._set_dataset_df()
         self._set_mapping_attrs()
         self._set_test_df()
         self._print_testset_informations()
-        
-        """ Preparing DL components """
-        self._set_test_set() # abstract function
-        self._set_test_dataloader()
-        self._set_model() # abstract function
-        self._set_loss_fn() # abstract function
+        self._set_pred_cache()
+        
+        """ Preparing DL components ( skipped if predictions are cached ) """
+        if self.pred_cache is None:
+            self._set_test_set() # abstract function
+            self._set_test_dataloader()
+            self._set_model() # abstract function
+            self._set_backend_model()
+            self._set_loss_fn() # abstract function
         # ---------------------------------------------------------------------/
 
 
@@ -87,6 +95,20 @@ class BaseImageTester(BaseObject):
         
         """ [test_opts] """
         self.batch_size: int = self.config["test_opts"]["batch_size"]
+        self.device_type: str = self.config["test_opts"]["device"]
+        
+        """ [test_opts.cpu] """
+        self.num_threads: int = self.config["test_opts"]["cpu"]["num_threads"]
+        self.use_bf16: bool = self.config["test_opts"]["cpu"]["use_bf16"]
+        self.compile_model: bool = self.config["test_opts"]["cpu"]["compile"]
+        
+        """ [test_opts.decoded_cache] """
+        self.use_decoded_cache: bool = self.config["test_opts"]["decoded_cache"]["enable"]
+        self.decoded_cache_mb: int = self.config["test_opts"]["decoded_cache"]["max_mb"]
+        self.decoded_cache_persist: bool = self.config["test_opts"]["decoded_cache"]["persist"]
+        
+        """ [test_opts.prediction_cache] """
+        self.use_pred_cache: bool = self.config["test_opts"]["prediction_cache"]["enable"]
         
         """ [test_opts.debug_mode] """
         self.debug_mode: bool = self.config["test_opts"]["debug_mode"]["enable"]
@@ -97,6 +119,23 @@ class BaseImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_backend_attrs(self):
+        """ CPU backend: channels-last memory format, `bfloat16` autocast
+            ( only if the CPU supports it ), and no pinned memory
+        """
+        if self.device.type == "cpu":
+            self.memory_format = torch.channels_last
+            self.use_amp: bool = self.use_bf16 and is_cpu_bf16_supported()
+            self._cli_out.write(f"※　: CPU backend, channels-last, "
+                                f"`bfloat16` autocast = {self.use_amp}")
+        else:
+            self.memory_format = torch.preserve_format
+            self.use_amp: bool = False
+        
+        self.pin_memory: bool = (self.device.type == "cuda")
+        # ---------------------------------------------------------------------/
+
+
     def _set_history_dir(self):
         """
         """
@@ -242,6 +281,34 @@ class BaseImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _get_test_names(self) -> List[str]:
+        """ Names returned by `test_set` ( `image_name` of crops )
+        """
+        return list(self.test_df["image_name"])
+        # ---------------------------------------------------------------------/
+
+
+    def _set_pred_cache(self):
+        """ Set below attributes
+            >>> self.pred_cache_path: Path
+            >>> self.pred_cache: Union[None, PredictionCache] # `None`: run the model
+        """
+        self.pred_cache_path: Path = \
+            self.history_dir.joinpath(get_pred_cache_name(self.model_state))
+        self.pred_cache: Union[None, PredictionCache] = None
+        
+        if self.use_pred_cache and self.pred_cache_path.exists():
+            pred_cache = PredictionCache.load(self.pred_cache_path)
+            if pred_cache.match(self._get_test_names(), self.num2class_list):
+                self.pred_cache = pred_cache
+                self._cli_out.write(f"※　: Reuse predictions in '{self.pred_cache_path.name}', "
+                                    f"skip the model")
+            else:
+                self._cli_out.write(f"{Fore.YELLOW}{Back.BLACK} '{self.pred_cache_path.name}' "
+                                    f"doesn't match the test set, predict again {Style.RESET_ALL}")
+        # ---------------------------------------------------------------------/
+
+
     def _set_test_set(self): # abstract function
         """
         """
@@ -255,9 +322,13 @@ class BaseImageTester(BaseObject):
     def _set_test_dataloader(self):
         """
         """
+        if self.use_decoded_cache:
+            self.test_set.set_decoded_cache(self.decoded_cache_mb,
+                                            self.decoded_cache_persist)
+        
         self.test_dataloader: DataLoader = \
             DataLoader(self.test_set, batch_size=self.batch_size, shuffle=False,
-                       pin_memory=True)
+                       pin_memory=self.pin_memory)
         
         self._cli_out.write(f"※　: total test batches: {len(self.test_dataloader)}")
         # ---------------------------------------------------------------------/
@@ -273,6 +344,24 @@ class BaseImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_backend_model(self):
+        """ CPU backend: channels-last memory format, optional `torch.compile()`
+        """
+        if self.device.type != "cpu":
+            return
+        
+        self.model.to(memory_format=self.memory_format)
+        
+        if self.compile_model:
+            if hasattr(torch, "compile"): # PyTorch >= 2.0
+                self.model = torch.compile(self.model)
+                self._cli_out.write("※　: model is compiled by `torch.compile()`")
+            else:
+                self._cli_out.write(f"{Fore.YELLOW}{Back.BLACK} `torch.compile()` requires "
+                                    f"PyTorch >= 2.0, skip compiling {Style.RESET_ALL}")
+        # ---------------------------------------------------------------------/
+
+
     def _set_loss_fn(self): # abstract function
         """
         """
@@ -296,12 +385,19 @@ class BaseImageTester(BaseObject):
         """ Testing """
         self._set_testing_attrs()
         self._cli_out.divide()
-        self.pbar_n_test = tqdm(total=len(self.test_dataloader),
-                                desc="Test (PredByImg) ")
         
-        self._one_epoch_testing()
+        if self.pred_cache is None:
+            self.pbar_n_test = tqdm(total=len(self.test_dataloader),
+                                    desc="Test (PredByImg) ")
+            test_st: float = time.time()
+            self._one_epoch_testing() # --> self.pred_cache
+            self._calc_results_from_pred_cache()
+            self._update_throughput_log(time.time() - test_st)
+            self.pbar_n_test.close()
+            if self.use_pred_cache: self.pred_cache.save(self.pred_cache_path) # save file
+        else:
+            self._calc_results_from_pred_cache()
         
-        self.pbar_n_test.close()
         self._cli_out.new_line()
         
         """ Save files """
@@ -341,29 +437,34 @@ class BaseImageTester(BaseObject):
 
 
     def _one_epoch_testing(self):
+        """ Run the model over `test_set`, set below attributes
+            >>> self.pred_cache: PredictionCache
         """
-        """
-        pred_list: list = []
+        name_list: list = []
+        logits_list: List[torch.Tensor] = []
         gt_list: list = []
         accum_loss: float = 0.0
         
         self.model.eval() # set to evaluation mode
-        with torch.no_grad():
+        with torch.inference_mode():
             for batch, data in enumerate(self.test_dataloader):
                 
                 images, _, labels, crop_names = data
-                images, labels = images.to(self.device), labels.to(self.device) # move to GPU
+                images, labels = images.to(self.device, memory_format=self.memory_format), \
+                                 labels.to(self.device) # move to GPU
                 
-                preds = self.model(images)
+                with get_autocast(self.device, self.use_amp):
+                    preds = self.model(images).float()
                 loss_value = self.loss_fn(preds, labels)
                 
                 """ Accumulate current batch loss """
                 accum_loss += loss_value.item() # tensor.item() -> get value of a Tensor
                 
-                """ Extend `pred_list`, `gt_list` """
+                """ Extend `name_list`, `logits_list`, `gt_list` """
                 preds_prob = torch.nn.functional.softmax(preds, dim=1)
                 _, preds_hcls = torch.max(preds_prob, 1) # get the highest probability class
-                pred_list.extend(preds_hcls.cpu().numpy().tolist()) # conversion flow: Tensor --> ndarray --> list
+                name_list.extend(crop_names)
+                logits_list.append(preds.cpu())
                 gt_list.extend(labels.cpu().numpy().tolist())
                 
                 """ Print number of matches in current batch """
@@ -377,14 +478,32 @@ class BaseImageTester(BaseObject):
                 self.pbar_n_test.update(1)
                 self.pbar_n_test.refresh()
         
-        self.pred_list_to_name = [ self.num2class_list[i] for i in pred_list ]
-        self.gt_list_to_name = [ self.num2class_list[i] for i in gt_list ]
+        self.pred_cache = PredictionCache(name_list, torch.cat(logits_list).numpy(),
+                                          np.array(gt_list), self.num2class_list,
+                                          (accum_loss/len(self.test_dataloader)))
+        # ---------------------------------------------------------------------/
+
+
+    def _calc_results_from_pred_cache(self):
+        """
+        """
+        self.pred_list_to_name, self.gt_list_to_name = \
+            self.pred_cache.get_image_results()
         
-        calculate_metrics(self.test_log, (accum_loss/len(self.test_dataloader)),
+        calculate_metrics(self.test_log, self.pred_cache.average_loss,
                           self.pred_list_to_name, self.gt_list_to_name, self.class2num_dict)
         # ---------------------------------------------------------------------/
 
 
+    def _update_throughput_log(self, elapsed:float):
+        """ Record the execution backend and achieved images/sec in `test_log`
+        """
+        self.test_log.update(get_device_info(self.device))
+        self.test_log["use_amp"] = self.use_amp
+        self.test_log["imgs_per_sec"] = round(len(self.test_set)/elapsed, 2)
+        # ---------------------------------------------------------------------/
+
+
     def _save_test_log(self, test_desc:str, score_key:str):
         """
         """
@@ -3,6 +3,7 @@ import os
 import random
 import re
 import sys
+import time
 from collections import Counter
 from copy import deepcopy
 from pathlib import Path
@@ -31,7 +32,8 @@ from ...dataset.imgdataset import SurfDGTImgDataset_v3
 from ...tester.utils import get_history_dir
 from ...trainer.utils import calculate_class_weight
 from ...utils import (calculate_metrics, calculate_r_squared,
-                      gen_class2num_dict, gen_class_counts_dict, set_gpu)
+                      gen_class2num_dict, gen_class_counts_dict, get_autocast,
+                      get_device_info, is_cpu_bf16_supported, set_device)
 from ..utils import confusion_matrix_with_class, rename_history_dir
 # -----------------------------------------------------------------------------/
 
@@ -68,8 +70,10 @@ class BaseSurfDGTImageTester(BaseObject):
         self._set_history_dir()
         self._set_training_config_attrs()
         
-        # GPU settings
-        self.device: torch.device = set_gpu(self.cuda_idx, self._cli_out)
+        # Device settings ( 'cuda' or CPU backend )
+        self.device: torch.device = set_device(self.device_type, self.cuda_idx,
+                                               self.num_threads, self._cli_out)
+        self._set_backend_attrs()
         self._set_testing_reproducibility()
         
         self._set_dataset_df()
@@ -82,6 +86,7 @@ class BaseSurfDGTImageTester(BaseObject):
         self._set_test_set() # abstract function
         self._set_test_dataloader()
         self._set_model() # abstract function
+        self._set_backend_model()
         self._set_loss_fn() # abstract function
         # ---------------------------------------------------------------------/
 
@@ -95,6 +100,12 @@ class BaseSurfDGTImageTester(BaseObject):
         
         """ [test_opts] """
         self.batch_size: int = self.config["test_opts"]["batch_size"]
+        self.device_type: str = self.config["test_opts"]["device"]
+        
+        """ [test_opts.cpu] """
+        self.num_threads: int = self.config["test_opts"]["cpu"]["num_threads"]
+        self.use_bf16: bool = self.config["test_opts"]["cpu"]["use_bf16"]
+        self.compile_model: bool = self.config["test_opts"]["cpu"]["compile"]
         
         """ [test_opts.debug_mode] """
         self.debug_mode: bool = self.config["test_opts"]["debug_mode"]["enable"]
@@ -105,6 +116,23 @@ class BaseSurfDGTImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_backend_attrs(self):
+        """ CPU backend: channels-last memory format, `bfloat16` autocast
+            ( only if the CPU supports it ), and no pinned memory
+        """
+        if self.device.type == "cpu":
+            self.memory_format = torch.channels_last
+            self.use_amp: bool = self.use_bf16 and is_cpu_bf16_supported()
+            self._cli_out.write(f"※　: CPU backend, channels-last, "
+                                f"`bfloat16` autocast = {self.use_amp}")
+        else:
+            self.memory_format = torch.preserve_format
+            self.use_amp: bool = False
+        
+        self.pin_memory: bool = (self.device.type == "cuda")
+        # ---------------------------------------------------------------------/
+
+
     def _set_history_dir(self):
         """
         """
@@ -285,7 +313,7 @@ class BaseSurfDGTImageTester(BaseObject):
         """
         self.test_dataloader: DataLoader = \
             DataLoader(self.test_set, batch_size=self.batch_size, shuffle=False,
-                       pin_memory=True)
+                       pin_memory=self.pin_memory)
         
         self._cli_out.write(f"※　: total test batches: {len(self.test_dataloader)}")
         # ---------------------------------------------------------------------/
@@ -301,6 +329,24 @@ class BaseSurfDGTImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_backend_model(self):
+        """ CPU backend: channels-last memory format, optional `torch.compile()`
+        """
+        if self.device.type != "cpu":
+            return
+        
+        self.model.to(memory_format=self.memory_format)
+        
+        if self.compile_model:
+            if hasattr(torch, "compile"): # PyTorch >= 2.0
+                self.model = torch.compile(self.model)
+                self._cli_out.write("※　: model is compiled by `torch.compile()`")
+            else:
+                self._cli_out.write(f"{Fore.YELLOW}{Back.BLACK} `torch.compile()` requires "
+                                    f"PyTorch >= 2.0, skip compiling {Style.RESET_ALL}")
+        # ---------------------------------------------------------------------/
+
+
     def _set_loss_fn(self): # abstract function
         """
         """
@@ -327,7 +373,9 @@ class BaseSurfDGTImageTester(BaseObject):
         self.pbar_n_test = tqdm(total=len(self.test_dataloader),
                                 desc="Test (PredByImg) ")
         
+        test_st: float = time.time()
         self._one_epoch_testing()
+        self._update_throughput_log(time.time() - test_st)
         
         self.pbar_n_test.close()
         self._cli_out.new_line()
@@ -377,14 +425,16 @@ class BaseSurfDGTImageTester(BaseObject):
         accum_loss: float = 0.0
         
         self.model.eval() # set to evaluation mode
-        with torch.no_grad():
+        with torch.inference_mode():
             for batch, data in enumerate(self.test_dataloader):
                 
                 images, _, areas, crop_names = data
                 areas = areas.unsqueeze(1)
-                images, areas = images.to(self.device), areas.to(self.device) # move to GPU
+                images, areas = images.to(self.device, memory_format=self.memory_format), \
+                                areas.to(self.device) # move to GPU
                 
-                preds = self.model(images)
+                with get_autocast(self.device, self.use_amp):
+                    preds = self.model(images).float()
                 loss_value = self.loss_fn(preds, areas)
                 
                 """ Accumulate current batch loss """
@@ -422,6 +472,15 @@ class BaseSurfDGTImageTester(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _update_throughput_log(self, elapsed:float):
+        """ Record the execution backend and achieved images/sec in `test_log`
+        """
+        self.test_log.update(get_device_info(self.device))
+        self.test_log["use_amp"] = self.use_amp
+        self.test_log["imgs_per_sec"] = round(len(self.test_set)/elapsed, 2)
+        # ---------------------------------------------------------------------/
+
+
     def _save_test_log(self, test_desc:str, score_key:str):
         """
         """
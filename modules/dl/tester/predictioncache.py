@@ -0,0 +1,156 @@
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+from colorama import Back, Fore, Style
+
+from ...shared.utils import get_target_str_idx_in_list
+# -----------------------------------------------------------------------------/
+
+
+FISH_AGG_RULES = ["majority_vote", "mean_prob", "top_k"]
+# -----------------------------------------------------------------------------/
+
+
+def get_pred_cache_name(model_state:str) -> str:
+    """ File name of the prediction cache of `{model_state}_model.pth`
+    """
+    return f"{{Logs}}_prediction_cache_{model_state}.npz"
+    # -------------------------------------------------------------------------/
+
+
+
+def get_fish_dsname(crop_name:str) -> str:
+    """ Example : 'fish_1_A_U_crop_0' -> 'fish_1_A_U',
+        a name without 'crop' ( NoCrop, NormBF ) is returned as it is.
+    """
+    crop_name_split: List[str] = crop_name.split("_")
+    target_idx = get_target_str_idx_in_list(crop_name_split, "crop")
+    
+    return "_".join(crop_name_split[:target_idx])
+    # -------------------------------------------------------------------------/
+
+
+
+class PredictionCache():
+
+    def __init__(self, names:List[str], logits:np.ndarray, labels:np.ndarray,
+                 num2class_list:List[str], average_loss:float) -> None:
+        """ Per-crop logits of one forward pass over the test set,
+            image-level and fish-level results are derived from it,
+            so re-scoring never runs the model again.
+        
+        Args:
+            names (List[str]): crop names, in the order of `test_dataloader`
+            logits (np.ndarray): `float32`, shape = (N, num_classes)
+            labels (np.ndarray): ground truth class indices, shape = (N, )
+            num2class_list (List[str]): class names of the indices
+            average_loss (float): average loss of the forward pass
+        """
+        self.names: List[str] = list(names)
+        self.logits: np.ndarray = np.asarray(logits, dtype=np.float32)
+        self.labels: np.ndarray = np.asarray(labels, dtype=np.int64)
+        self.num2class_list: List[str] = list(num2class_list)
+        self.average_loss: float = float(average_loss)
+        
+        # same as the testers: `torch.softmax()` -> `torch.max()`
+        self.probs: np.ndarray = \
+            torch.nn.functional.softmax(torch.from_numpy(self.logits), dim=1).numpy()
+        self.preds: np.ndarray = np.argmax(self.probs, axis=1)
+        # ---------------------------------------------------------------------/
+
+
+    @classmethod
+    def load(cls, path:Path) -> "PredictionCache":
+        """
+        """
+        with np.load(path, allow_pickle=False) as npz:
+            return cls(npz["names"].tolist(), npz["logits"], npz["labels"],
+                       npz["num2class_list"].tolist(), npz["average_loss"])
+        # ---------------------------------------------------------------------/
+
+
+    def save(self, path:Path):
+        """
+        """
+        np.savez(path, names=np.array(self.names), logits=self.logits,
+                 labels=self.labels, num2class_list=np.array(self.num2class_list),
+                 average_loss=np.array(self.average_loss))
+        # ---------------------------------------------------------------------/
+
+
+    def match(self, names:List[str], num2class_list:List[str]) -> bool:
+        """ Check if the cache is created from the same test set and classes
+        """
+        return (sorted(self.names) == sorted(names)) and \
+                    (self.num2class_list == list(num2class_list))
+        # ---------------------------------------------------------------------/
+
+
+    def get_image_results(self) -> Tuple[List[str], List[str]]:
+        """ Returns: ( `pred_list_to_name`, `gt_list_to_name` )
+        """
+        return [self.num2class_list[i] for i in self.preds], \
+                [self.num2class_list[i] for i in self.labels]
+        # ---------------------------------------------------------------------/
+
+
+    def get_fish_results(self, rule:str, top_k:int) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """ Aggregate crops of each fish ( same order as the crops first appear )
+        
+        Args:
+            rule (str): 'majority_vote', 'mean_prob' ( highest average probability )
+                or 'top_k' ( highest average probability of the `top_k` most confident crops )
+            top_k (int): number of crops for 'top_k'
+        
+        Returns:
+            Tuple[Dict[str, str], Dict[str, str]]: ( `fish_pred_dict`, `fish_gt_dict` )
+        """
+        if rule not in FISH_AGG_RULES:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} Fish aggregation accepts "
+                             f"'majority_vote', 'mean_prob' or 'top_k' only, "
+                             f"got '{rule}' {Style.RESET_ALL}\n")
+        
+        fish_idxs: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.names):
+            fish_idxs.setdefault(get_fish_dsname(name), []).append(i)
+        
+        fish_pred_dict: Dict[str, str] = {}
+        fish_gt_dict: Dict[str, str] = {}
+        for fish_dsname, idxs in fish_idxs.items():
+            
+            gt_cnt = Counter(self.num2class_list[i] for i in self.labels[idxs])
+            fish_gt_dict[fish_dsname] = gt_cnt.most_common(1)[0][0]
+            
+            if rule == "majority_vote":
+                pred_cnt = Counter(self.num2class_list[i] for i in self.preds[idxs])
+                fish_pred_dict[fish_dsname] = pred_cnt.most_common(1)[0][0]
+            else:
+                probs = self.probs[idxs]
+                if rule == "top_k":
+                    confidence_order = np.argsort(-probs.max(axis=1), kind="stable")
+                    probs = probs[confidence_order[:top_k]]
+                fish_pred_dict[fish_dsname] = \
+                    self.num2class_list[int(np.argmax(probs.mean(axis=0)))]
+        
+        return fish_pred_dict, fish_gt_dict
+        # ---------------------------------------------------------------------/
+
+
+    def get_predict_ans_dict(self) -> Dict[str, dict]:
+        """ Content of '{Logs}_PredByFish_predict_ans.log'
+        """
+        predict_ans_dict: Dict[str, dict] = {}
+        
+        for name, prob, pred, label in \
+                zip(self.names, self.probs, self.preds, self.labels):
+            pred_prob = {cls: round(float(prob[i]), 5)
+                            for i, cls in enumerate(self.num2class_list)}
+            predict_ans_dict[name] = { "gt": self.num2class_list[label],
+                                       "pred": self.num2class_list[pred],
+                                       "pred_prob": pred_prob }
+        
+        return predict_ans_dict
+        # ---------------------------------------------------------------------/
\ No newline at end of file
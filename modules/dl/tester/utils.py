@@ -1,10 +1,11 @@
 import os
 import re
 import sys
-from collections import Counter
 from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
+import numpy as np
+
 from ...assert_fn import *
 from ...assert_fn import assert_0_or_1_history_dir
 from ...shared.clioutput import CLIOutput
@@ -22,22 +23,17 @@ def confusion_matrix_with_class(prediction:List[str], ground_truth:List[str]):
     >>> {1} [ ] [ ] [ ]  ~~> gt : 1
     >>> {2} [ ] [ ] [ ]  ~~> gt : 2
     """
+    all_class, confusion_matrix = get_confusion_matrix(prediction, ground_truth)
+    
     """ Count all classes in `prediction`, `ground_truth` """
-    result_counter = Counter(ground_truth) + Counter(prediction)
-    max_count = result_counter.most_common(1)[0][1] # usage: Counter.most_common(1) -> [('HD', 282)] <class 'list'> (回傳最大的前 x 項)
-    all_class: list = sorted(list(result_counter.keys()))
+    max_count = int((confusion_matrix.sum(axis=0) + confusion_matrix.sum(axis=1)).max())
     
     """ Create `confusion_matrix_list` """
     confusion_matrix_list: list = [" "] # 補 (0, 0) 空格
     confusion_matrix_list.extend(all_class) # 加上 column name
-    for r_cls in all_class: # gt
+    for r_cls, row in zip(all_class, confusion_matrix.tolist()): # gt
         confusion_matrix_list.append(r_cls) # 加上 row name
-        for c_cls in all_class: # pred
-            match_cnt: int = 0
-            for i in range(len(ground_truth)):
-                if (prediction[i] == c_cls) and (ground_truth[i] == r_cls):
-                    match_cnt += 1
-            confusion_matrix_list.append(match_cnt)
+        confusion_matrix_list.extend(row) # pred
     
     assert len(confusion_matrix_list) == ((len(all_class)+1)**2), "Failed to create 'confusion matrix' "
     
@@ -53,6 +49,26 @@ def confusion_matrix_with_class(prediction:List[str], ground_truth:List[str]):
 
 
 
+def get_confusion_matrix(prediction:List[str], ground_truth:List[str]) -> Tuple[list, np.ndarray]:
+    """ Returns: ( `all_class`, `confusion_matrix` )
+        - all_class: sorted classes exist in `prediction` or `ground_truth`
+        - confusion_matrix: `int64`, shape = (len(all_class), len(all_class)),
+            rows are ground truth, columns are prediction
+    """
+    all_class: list = sorted(set(ground_truth) | set(prediction))
+    class2idx: Dict[str, int] = {cls: i for i, cls in enumerate(all_class)}
+    gt_idxs = np.fromiter(map(class2idx.__getitem__, ground_truth), dtype=np.int64)
+    pred_idxs = np.fromiter(map(class2idx.__getitem__, prediction), dtype=np.int64)
+    
+    num_classes = len(all_class)
+    confusion_matrix = np.bincount(gt_idxs*num_classes + pred_idxs,
+                                   minlength=num_classes**2).reshape(num_classes, num_classes)
+    
+    return all_class, confusion_matrix
+    # -------------------------------------------------------------------------/
+
+
+
 def rename_history_dir(orig_history_dir:Path, test_desc:str,
                        model_state:str, test_log:dict, score_key:str,
                        cli_out:CLIOutput=None):
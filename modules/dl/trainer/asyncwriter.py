@@ -0,0 +1,268 @@
+import json
+import queue
+import threading
+import traceback
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, List, Union
+
+import pandas as pd
+import torch
+from tqdm.auto import tqdm
+
+from .utils import plot_training_trend, save_checkpoint, save_training_logs
+# -----------------------------------------------------------------------------/
+
+
+class AsyncTrainingWriter():
+
+    def __init__(self, save_dir:Path, loss_key:str, score_key:str,
+                 queue_size:int=4) -> None:
+        """ Write training logs of each epoch on a background thread,
+            the training loop only blocks when `queue_size` epochs are pending.
+            
+            Files ( same as `save_training_logs()` + `plot_training_trend()` ):
+            >>> {Logs}_training_log.csv   # one row appended per epoch
+            >>> {Logs}_best_valid.log
+            >>> training_trend_{score_key}.png   # only the latest pending epoch is rendered
+            >>> checkpoint.pth   # see `submit_checkpoint()`
+        
+        Args:
+            save_dir (Path): directory to save files
+            loss_key (str): key of loss in logs
+            score_key (str): key of score in logs
+            queue_size (int, optional): max number of pending epochs. Defaults to 4.
+        """
+        self.save_dir: Path = save_dir
+        self.loss_key: str = loss_key
+        self.score_key: str = score_key
+        
+        # copies of logs, owned by the writer thread
+        self.train_logs: List[dict] = []
+        self.valid_logs: List[dict] = []
+        self.best_val_log: dict = {}
+        
+        self._csv_path: Path = save_dir.joinpath(r"{Logs}_training_log.csv")
+        self._csv_schema: Union[None, list] = None # (column, type) of written rows
+        self._plot_pending: bool = False
+        self._error: Union[None, str] = None
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._worker, daemon=True,
+                                        name="AsyncTrainingWriter")
+        self._thread.start()
+        # ---------------------------------------------------------------------/
+
+
+    def submit(self, train_log:dict, valid_log:dict, best_val_log:dict):
+        """ Queue the logs of an epoch ( deep copied, caller can keep updating them )
+        """
+        self._queue.put(("epoch", deepcopy(train_log), deepcopy(valid_log),
+                         deepcopy(best_val_log)))
+        # ---------------------------------------------------------------------/
+
+
+    def submit_checkpoint(self, checkpoint:dict):
+        """ Queue a full-state checkpoint, tensors must be copies on CPU
+            ( see `copy_state_to_cpu()` ), the thread only serializes it.
+        """
+        self._queue.put(("checkpoint", checkpoint))
+        # ---------------------------------------------------------------------/
+
+
+    def load_logs(self, train_logs:List[dict], valid_logs:List[dict],
+                  best_val_log:dict):
+        """ Restore logs of a resumed training, must be called before `submit()`,
+            the next epoch rewrites the whole CSV file once, then rows are appended again.
+        """
+        self.train_logs = deepcopy(train_logs)
+        self.valid_logs = deepcopy(valid_logs)
+        self.best_val_log = deepcopy(best_val_log)
+        self._csv_schema = None
+        # ---------------------------------------------------------------------/
+
+
+    def _worker(self):
+        """
+        """
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            
+            if task[0] == "checkpoint":
+                try:
+                    save_checkpoint(self.save_dir, task[1])
+                except Exception:
+                    tqdm.write(f"AsyncTrainingWriter failed to save checkpoint\n"
+                               f"{traceback.format_exc()}")
+                continue
+            
+            _, train_log, valid_log, best_val_log = task
+            self.train_logs.append(train_log)
+            self.valid_logs.append(valid_log)
+            self.best_val_log = best_val_log
+            
+            if self._error is not None:
+                continue # keep collecting logs, `close()` rewrites all files
+            
+            try:
+                self._append_csv_row(train_log, valid_log)
+                self._save_best_val_log()
+                self._plot_pending = True
+                if self._queue.empty(): self._plot() # skip if more epochs are pending
+            except Exception:
+                self._error = traceback.format_exc()
+        
+        if (self._error is None) and self._plot_pending:
+            try:
+                self._plot()
+            except Exception:
+                self._error = traceback.format_exc()
+        # ---------------------------------------------------------------------/
+
+
+    @staticmethod
+    def _get_csv_schema(train_log:dict, valid_log:dict) -> list:
+        """ (column, type) of a CSV row
+        """
+        return [(col, type(value)) for col, value in
+                [*train_log.items(), *valid_log.items()]]
+        # ---------------------------------------------------------------------/
+
+
+    def _append_csv_row(self, train_log:dict, valid_log:dict):
+        """ Append one row, rewrite the whole file if the columns ( or value types )
+            change, so the file is the same as `save_training_logs()`.
+        """
+        row_df = pd.concat([pd.DataFrame([train_log]).set_index("epoch"),
+                            pd.DataFrame([valid_log]).set_index("epoch")], axis=1)
+        schema = self._get_csv_schema(train_log, valid_log)
+        
+        if self._csv_schema is None:
+            if len(self.train_logs) == 1:
+                row_df.to_csv(self._csv_path, encoding='utf_8_sig')
+                self._csv_schema = schema
+            else: # first epoch after `load_logs()`, rewrite the restored rows once
+                save_training_logs(self.save_dir, self.train_logs,
+                                   self.valid_logs, self.best_val_log)
+                same_schema = all(self._get_csv_schema(*logs) == schema for logs
+                                  in zip(self.train_logs, self.valid_logs))
+                self._csv_schema = schema if same_schema else []
+        elif schema == self._csv_schema:
+            row_df.to_csv(self._csv_path, mode="a", header=False, encoding='utf_8')
+        else:
+            save_training_logs(self.save_dir, self.train_logs,
+                               self.valid_logs, self.best_val_log)
+            self._csv_schema = [] # rows are mixed, always rewrite from now on
+        # ---------------------------------------------------------------------/
+
+
+    def _save_best_val_log(self):
+        """
+        """
+        path = self.save_dir.joinpath(r"{Logs}_best_valid.log")
+        with open(path, mode="w") as f_writer:
+            json.dump(self.best_val_log, f_writer, indent=4)
+        # ---------------------------------------------------------------------/
+
+
+    def _plot(self):
+        """
+        """
+        plot_training_trend(self.save_dir, self.loss_key, self.score_key,
+                            self.train_logs, self.valid_logs)
+        self._plot_pending = False
+        # ---------------------------------------------------------------------/
+
+
+    def close(self):
+        """ Flush all pending epochs and stop the thread.
+            
+            If the thread failed, rewrite all files on the caller thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        
+        if self._error is not None:
+            tqdm.write(f"AsyncTrainingWriter failed, rewrite logs synchronously\n{self._error}")
+            if len(self.train_logs) > 0:
+                save_training_logs(self.save_dir, self.train_logs,
+                                   self.valid_logs, self.best_val_log)
+                self._plot()
+        # ---------------------------------------------------------------------/
+
+
+
+class PinnedStateSnapshot():
+
+    def __init__(self, pin_memory:bool) -> None:
+        """ Keep a copy of a `state_dict` in ( pinned ) CPU buffers,
+            buffers are allocated once and reused by the next `update()`,
+            so a snapshot never duplicates the GPU memory of the model.
+        
+        Args:
+            pin_memory (bool): use page-locked buffers ( 'cuda' only ),
+                the copies become asynchronous
+        """
+        self.pin_memory: bool = pin_memory and torch.cuda.is_available()
+        self.state_dict: Union[None, dict] = None
+        self._event: Union[None, torch.cuda.Event] = None
+        # ---------------------------------------------------------------------/
+
+
+    def _copy(self, src:Any, buf:Any) -> Any:
+        """ Recursively copy tensors into `buf` ( reuse it if the shape matches )
+        """
+        if isinstance(src, torch.Tensor):
+            if (not isinstance(buf, torch.Tensor)) or (buf.shape != src.shape) \
+                    or (buf.dtype != src.dtype):
+                buf = torch.empty(src.shape, dtype=src.dtype, device="cpu",
+                                  pin_memory=(self.pin_memory and src.is_cuda))
+            buf.copy_(src.detach(), non_blocking=buf.is_pinned())
+            return buf
+        
+        elif isinstance(src, dict):
+            buf = buf if isinstance(buf, dict) else {}
+            out = type(src)((k, self._copy(v, buf.get(k))) for k, v in src.items())
+            if hasattr(src, "_metadata"): # version info of `nn.Module.state_dict()`
+                out._metadata = deepcopy(src._metadata)
+            return out
+        
+        elif isinstance(src, (list, tuple)):
+            buf = buf if isinstance(buf, (list, tuple)) and (len(buf) == len(src)) \
+                    else [None]*len(src)
+            return type(src)(self._copy(v, b) for v, b in zip(src, buf))
+        
+        else:
+            return deepcopy(src)
+        # ---------------------------------------------------------------------/
+
+
+    def update(self, state_dict:dict):
+        """
+        """
+        self.state_dict = self._copy(state_dict, self.state_dict)
+        
+        if self.pin_memory:
+            self._event = torch.cuda.Event()
+            self._event.record()
+        # ---------------------------------------------------------------------/
+
+
+    def get(self) -> dict:
+        """ Wait for the asynchronous copies, then return the snapshot
+        """
+        if self._event is not None:
+            self._event.synchronize()
+        
+        return self.state_dict
+        # ---------------------------------------------------------------------/
+
+
+
+def copy_state_to_cpu(state:Any) -> Any:
+    """ Copy all tensors in a ( nested ) state to new CPU tensors
+    """
+    return PinnedStateSnapshot(pin_memory=False)._copy(state, None)
+    # -------------------------------------------------------------------------/
\ No newline at end of file
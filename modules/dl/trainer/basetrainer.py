@@ -1,8 +1,10 @@
+import json
 import os
 import random
 import re
 import shutil
 import sys
+import time
 import traceback
 from collections import Counter
 from copy import deepcopy
@@ -15,21 +17,30 @@ import numpy as np
 import pandas as pd
 import torch
 from colorama import Back, Fore, Style
-from torch.cuda.amp import GradScaler, autocast
+from imgaug import augmenters as iaa
+from torch.cuda.amp import GradScaler
 from torch.utils.data import DataLoader
 from tqdm.auto import tqdm
 
 from ...data.dataset.utils import parse_dataset_file_name
 from ...data.processeddatainstance import ProcessedDataInstance
 from ...shared.baseobject import BaseObject
-from ...shared.config import dump_config
+from ...shared.config import dump_config, load_config
 from ...shared.timer import Timer
 from ...shared.utils import create_new_dir, formatter_padr0
+from ..dataset.batchaugmentation import BatchAugmenter
 from ..dataset.imgdataset import ImgDataset_v3
-from ..utils import (calculate_metrics, gen_class2num_dict,
-                     gen_class_counts_dict, set_gpu)
-from .utils import (calculate_class_weight, plot_training_trend,
-                    rename_training_dir, save_model, save_training_logs)
+from ..dataset.prefetchloader import PrefetchLoader, collate_crop_batch
+from ..utils import (bincount_confusion_matrix,
+                     calculate_metrics_from_confusion_matrix, gen_class2num_dict,
+                     gen_class_counts_dict, get_autocast,
+                     get_device_info, is_cpu_bf16_supported, set_device)
+from .asyncwriter import (AsyncTrainingWriter, PinnedStateSnapshot,
+                          copy_state_to_cpu)
+from .utils import (calculate_class_weight, check_fused_forward,
+                    forward_hybrid, get_rng_states, has_batchnorm,
+                    load_checkpoint, rename_training_dir, save_model,
+                    set_rng_states)
 # -----------------------------------------------------------------------------/
 
 
@@ -63,8 +74,10 @@ class BaseTrainer(BaseObject):
         """
         super()._set_attrs(config)
         
-        # GPU settings
-        self.device: torch.device = set_gpu(self.cuda_idx, self._cli_out)
+        # Device settings ( 'cuda' or CPU backend )
+        self.device: torch.device = set_device(self.device_type, self.cuda_idx,
+                                               self.num_threads, self._cli_out)
+        self._set_backend_attrs()
         self._set_training_reproducibility()
         if self.use_amp: self._set_amp_scaler()
         
@@ -78,8 +91,11 @@ class BaseTrainer(BaseObject):
         """ Preparing DL components """
         self._set_train_set() # abstract function
         self._set_valid_set() # abstract function
+        self._set_batch_augmenter()
         self._set_dataloaders()
         self._set_model() # abstract function
+        self.model.to(memory_format=self.memory_format)
+        self._check_fused_forward_condition()
         self._set_loss_fn() # abstract function
         self._set_optimizer() # abstract function
         if self.use_lr_schedular: self._set_lr_scheduler() # abstract function
@@ -103,11 +119,22 @@ class BaseTrainer(BaseObject):
         
         """ [train_opts.cpu] """
         self.num_workers: int = self.config["train_opts"]["cpu"]["num_workers"]
+        self.num_threads: int = self.config["train_opts"]["cpu"]["num_threads"]
+        self.use_bf16: bool = self.config["train_opts"]["cpu"]["use_bf16"]
+        self.persistent_workers: bool = self.config["train_opts"]["cpu"]["persistent_workers"]
+        self.prefetch_factor: int = self.config["train_opts"]["cpu"]["prefetch_factor"]
+        self.start_method: str = self.config["train_opts"]["cpu"]["start_method"]
+        self.prefetch_to_device: bool = self.config["train_opts"]["cpu"]["prefetch_to_device"]
         
         """ [train_opts.cuda] """
         self.cuda_idx: int = self.config["train_opts"]["cuda"]["index"]
         self.use_amp: bool = self.config["train_opts"]["cuda"]["use_amp"]
         
+        """ [train_opts.decoded_cache] """
+        self.use_decoded_cache: bool = self.config["train_opts"]["decoded_cache"]["enable"]
+        self.decoded_cache_mb: int = self.config["train_opts"]["decoded_cache"]["max_mb"]
+        self.decoded_cache_persist: bool = self.config["train_opts"]["decoded_cache"]["persist"]
+        
         """ [train_opts.debug_mode] """
         self.debug_mode: bool = self.config["train_opts"]["debug_mode"]["enable"]
         self.debug_rand_select:int = self.config["train_opts"]["debug_mode"]["rand_select"]
@@ -119,10 +146,14 @@ class BaseTrainer(BaseObject):
         self.random_crop: bool = self.config["train_opts"]["data"]["random_crop"]
         self.add_bg_class: bool = self.config["train_opts"]["data"]["add_bg_class"]
         self.aug_on_fly: bool = self.config["train_opts"]["data"]["aug_on_fly"]
+        self.aug_backend: str = self.config["train_opts"]["data"]["aug_backend"]
         
         """ [train_opts] """
         self.epochs: int = self.config["train_opts"]["epochs"]
         self.batch_size: int = self.config["train_opts"]["batch_size"]
+        self.fused_forward: bool = self.config["train_opts"]["fused_forward"]
+        self.check_fused_forward: bool = self.config["train_opts"]["check_fused_forward"]
+        self.device_type: str = self.config["train_opts"]["device"]
         
         """ [train_opts.optimizer] """
         self.lr: float = self.config["train_opts"]["optimizer"]["learning_rate"]
@@ -137,6 +168,10 @@ class BaseTrainer(BaseObject):
         self.enable_earlystop: bool = self.config["train_opts"]["earlystop"]["enable"]
         self.max_no_improved: int = self.config["train_opts"]["earlystop"]["max_no_improved"]
         
+        """ [train_opts.checkpoint] """
+        self.checkpoint_every: int = self.config["train_opts"]["checkpoint"]["every_n_epochs"]
+        self.resume_from: str = self.config["train_opts"]["checkpoint"]["resume_from"]
+        
         # if (self.random_crop) and (not self.add_bg_class):
         #     raise AttributeError(f"Can't set `random_crop` = {self.random_crop} "
         #                          f"if `add_bg_class` = {self.add_bg_class}, "
@@ -188,10 +223,27 @@ class BaseTrainer(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_backend_attrs(self):
+        """ CPU backend: channels-last memory format, `bfloat16` autocast
+            ( only if the CPU supports it ), and no pinned memory
+        """
+        if self.device.type == "cpu":
+            self.memory_format = torch.channels_last
+            self.use_amp = self.use_bf16 and is_cpu_bf16_supported()
+            self._cli_out.write(f"※　: CPU backend, channels-last, "
+                                f"`bfloat16` autocast = {self.use_amp}")
+        else:
+            self.memory_format = torch.preserve_format
+        
+        self.pin_memory: bool = (self.device.type == "cuda")
+        # ---------------------------------------------------------------------/
+
+
     def _set_amp_scaler(self):
-        """ A scaler for 'Automatic Mixed Precision (AMP)'
+        """ A scaler for 'Automatic Mixed Precision (AMP)',
+            `bfloat16` ( CPU backend ) doesn't need loss scaling
         """
-        self.scaler = GradScaler()
+        self.scaler = GradScaler(enabled=(self.device.type == "cuda"))
         # ---------------------------------------------------------------------/
 
 
@@ -361,9 +413,22 @@ class BaseTrainer(BaseObject):
         """ Set below attributes
             >>> self.time_stamp: str
             >>> self.dst_root: Path
+            >>> self.resume_ckpt: Union[None, dict]
         """
         model_history: Path = \
             self._path_navigator.dbpp.get_one_of_dbpp_roots("model_history")
+        self.resume_ckpt: Union[None, dict] = None
+        
+        if self.resume_from:
+            # continue the previous training directory
+            self.dst_root: Path = model_history.joinpath(self.resume_from)
+            self.resume_ckpt = load_checkpoint(self.dst_root)
+            self.time_stamp: str = self.resume_ckpt["time_stamp"]
+            self._check_resume_config()
+            self._cli_out.write(f"※　: resume training from '{self.dst_root}', "
+                                f"completed epochs: {self.resume_ckpt['epoch']}")
+            return
+        
         self.time_stamp: str = datetime.now().strftime('%Y%m%d_%H_%M_%S')
 
         self.dst_root: Path = \
@@ -371,6 +436,24 @@ class BaseTrainer(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _check_resume_config(self):
+        """ Config must be the same as the resumed training,
+            except `[train_opts.checkpoint]`
+        """
+        prev_config: dict = load_config(self.dst_root.joinpath("training_config.toml"))
+        curr_config: dict = deepcopy(dict(self.config))
+        
+        for config in [prev_config, curr_config]:
+            config["train_opts"] = dict(config["train_opts"])
+            config["train_opts"].pop("checkpoint", None)
+        
+        if prev_config != curr_config:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} Config is different from "
+                             f"'{self.dst_root.joinpath('training_config.toml')}', "
+                             f"can't resume training {Style.RESET_ALL}\n")
+        # ---------------------------------------------------------------------/
+
+
     def _set_train_set(self): # abstract function
         """
         """
@@ -391,31 +474,79 @@ class BaseTrainer(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _set_batch_augmenter(self):
+        """ Set below attributes
+            >>> self.batch_augmenter: Union[None, BatchAugmenter]
+        """
+        if self.aug_backend == "imgaug":
+            self.batch_augmenter = None
+        elif self.aug_backend == "batch":
+            if not type(self.train_set).support_batch_aug:
+                raise ValueError(f"{Fore.RED}{Back.BLACK} `train_opts.data.aug_backend` = 'batch' "
+                                 f"is not supported by '{type(self.train_set).__name__}' "
+                                 f"( it returns augmented images ), set it to 'imgaug' {Style.RESET_ALL}\n")
+            img = self.train_set[0][0]
+            if (img.dtype != torch.uint8) or (img.ndim != 3) or (img.shape[-1] != 3):
+                raise ValueError(f"{Fore.RED}{Back.BLACK} `BatchAugmenter` expects raw `uint8` "
+                                 f"(H, W, C) images, '{type(self.train_set).__name__}' returns "
+                                 f"{img.dtype} {tuple(img.shape)} {Style.RESET_ALL}\n")
+            self.batch_augmenter = \
+                BatchAugmenter(self.train_set.crop_size, self.train_set.resize,
+                               self.train_set.dataset_param["intensity"],
+                               self.use_hsv, self.rand_seed, self.device)
+            self._cli_out.write(f"※　: augmentation on batch, device: '{self.device}'")
+        else:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} Unknown `train_opts.data.aug_backend`: "
+                             f"'{self.aug_backend}', expect 'imgaug' or 'batch' {Style.RESET_ALL}\n")
+        # ---------------------------------------------------------------------/
+
+
     def _set_dataloaders(self):
         """ Set below attributes
-            >>> self.train_dataloader: DataLoader
-            >>> self.valid_dataloader: DataLoader
+            >>> self.train_dataloader: PrefetchLoader
+            >>> self.valid_dataloader: PrefetchLoader
         """
+        if self.use_decoded_cache:
+            self.valid_set.set_decoded_cache(self.decoded_cache_mb,
+                                             self.decoded_cache_persist,
+                                             self.start_method)
+        
+        if (self.num_workers > 0) and self.persistent_workers and \
+                ((self.checkpoint_every > 0) or self.resume_from):
+            # random states inside persistent workers can't be saved in a checkpoint,
+            # new workers of each epoch are seeded from `self.g` ( restored when resuming )
+            self.persistent_workers = False
+            self._cli_out.write("※　: checkpoint / resume is enabled, set `persistent_workers` = false "
+                                "to get the same results as an uninterrupted run")
+        
+        loader_kwargs: dict = {"batch_size": self.batch_size,
+                               "pin_memory": self.pin_memory,
+                               "collate_fn": collate_crop_batch}
+        
         if self.num_workers > 0:
-            self.train_dataloader: DataLoader = \
-                DataLoader(self.train_set, batch_size=self.batch_size, shuffle=True,
-                           pin_memory=True, num_workers=self.num_workers,
-                           worker_init_fn=self._seed_worker, generator=self.g)
+            loader_kwargs.update({"num_workers": self.num_workers,
+                                  "persistent_workers": self.persistent_workers,
+                                  "prefetch_factor": self.prefetch_factor,
+                                  "multiprocessing_context": self.start_method})
             
-            self.valid_dataloader: DataLoader = \
-                DataLoader(self.valid_set, batch_size=self.batch_size, shuffle=False,
-                           pin_memory=True, num_workers=self.num_workers)
+            train_dataloader = DataLoader(self.train_set, shuffle=True, **loader_kwargs,
+                                          worker_init_fn=self._seed_worker, generator=self.g)
+            valid_dataloader = DataLoader(self.valid_set, shuffle=False, **loader_kwargs)
             
-            self._cli_out.write(f"※　: multiprocess loading, `num_workers` = {self.num_workers}")
+            self._cli_out.write(f"※　: multiprocess loading, `num_workers` = {self.num_workers}, "
+                                f"`persistent_workers` = {self.persistent_workers}, "
+                                f"`prefetch_factor` = {self.prefetch_factor}, "
+                                f"`start_method` = '{self.start_method}'")
 
         else:
-            self.train_dataloader: DataLoader = \
-                DataLoader(self.train_set, batch_size=self.batch_size, shuffle=True,
-                           pin_memory=True)
-            
-            self.valid_dataloader: DataLoader = \
-                DataLoader(self.valid_set, batch_size=self.batch_size, shuffle=False,
-                           pin_memory=True)
+            train_dataloader = DataLoader(self.train_set, shuffle=True, **loader_kwargs)
+            valid_dataloader = DataLoader(self.valid_set, shuffle=False, **loader_kwargs)
+        
+        # non-blocking copies to device, record data-wait time of each epoch
+        self.train_dataloader: PrefetchLoader = \
+            PrefetchLoader(train_dataloader, self.device, self.prefetch_to_device)
+        self.valid_dataloader: PrefetchLoader = \
+            PrefetchLoader(valid_dataloader, self.device, self.prefetch_to_device)
         
         self._cli_out.write(f"※　: total train batches: {len(self.train_dataloader)}")
         self._cli_out.write(f"※　: total valid batches: {len(self.valid_dataloader)}")
@@ -432,6 +563,20 @@ class BaseTrainer(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _check_fused_forward_condition(self):
+        """ Fused forward pass requires the model without `BatchNorm`
+        """
+        if self.fused_forward:
+            if has_batchnorm(self.model):
+                self.fused_forward = False
+                self._cli_out.write(f"※　: model contains `BatchNorm`, "
+                                    f"force `fused_forward` = {self.fused_forward}")
+            else:
+                self._cli_out.write("※　: fused forward pass, "
+                                    "concat `images` and `images2` into one batch")
+        # ---------------------------------------------------------------------/
+
+
     def _set_loss_fn(self): # abstract function
         """
         """
@@ -472,22 +617,30 @@ class BaseTrainer(BaseObject):
         super().run(config)
         
         create_new_dir(self.dst_root)
-        dump_config(self.dst_root.joinpath("training_config.toml"), self.config) # save file
+        if self.resume_ckpt is None: # resumed: keep the original config
+            dump_config(self.dst_root.joinpath("training_config.toml"), self.config) # save file
         self._save_training_amount_file() # save file
+        self._save_device_log() # save file
         
         """ Create Timer """
         timer = Timer()
         
         """ Training """
         self._set_training_attrs()
+        self.training_writer = AsyncTrainingWriter(self.dst_root, "average_loss",
+                                                   self.score_key)
+        if self.fused_forward and self.check_fused_forward:
+            self._check_fused_forward() # save file
+        self.start_epoch: int = 1
+        if self.resume_ckpt is not None: self._load_resume_checkpoint()
         self._cli_out.divide()
-        self.pbar_n_epoch = tqdm(total=self.epochs, desc=f"Epoch ")
+        self.pbar_n_epoch = tqdm(total=self.epochs, initial=(self.start_epoch-1), desc=f"Epoch ")
         self.pbar_n_train = tqdm(total=len(self.train_dataloader), desc="Train ")
         self.pbar_n_valid = tqdm(total=len(self.valid_dataloader), desc="Valid ")
         try:
             
             timer.start()
-            for epoch in range(1, self.epochs+1):
+            for epoch in range(self.start_epoch, self.epochs+1):
                 # Update progress bar description
                 self.pbar_n_epoch.desc = f"Epoch {epoch:{formatter_padr0(self.epochs)}} "
                 self.pbar_n_epoch.refresh()
@@ -495,19 +648,13 @@ class BaseTrainer(BaseObject):
                 self._one_epoch_training(epoch)
                 self._one_epoch_validating(epoch)
                 
-                """ Save logs (convert to Dataframe) """
-                save_training_logs(self.dst_root, self.train_logs, self.valid_logs,
-                                   self.best_val_log) # save file*2
+                """ Save logs and plot ( on `AsyncTrainingWriter` thread ) """
+                self.training_writer.submit(self.train_logs[-1], self.valid_logs[-1],
+                                            self.best_val_log) # save file*3
                 
-                """ Save plot """
-                plot_training_trend_kwargs = {
-                    "save_dir"   : self.dst_root,
-                    "loss_key"   : "average_loss",
-                    "score_key"  : self.score_key,
-                    "train_logs" : self.train_logs,
-                    "valid_logs" : self.valid_logs,
-                }
-                plot_training_trend(**plot_training_trend_kwargs) # save file
+                """ Save checkpoint ( on `AsyncTrainingWriter` thread ) """
+                if (self.checkpoint_every > 0) and (epoch % self.checkpoint_every == 0):
+                    self.training_writer.submit_checkpoint(self._gen_checkpoint(epoch)) # save file
                 
                 """ Print `output_string` """
                 self._cli_out.write(self.output_string)
@@ -543,6 +690,9 @@ class BaseTrainer(BaseObject):
             tqdm.write("Training Completed")
         
         finally:
+            """ Flush pending logs """
+            self.training_writer.close() # save file*3
+            
             """ Save training consume time """
             timer.stop()
             timer.calculate_consume_time()
@@ -556,7 +706,7 @@ class BaseTrainer(BaseObject):
                 """
                 
                 """ Save model """
-                save_model("best", self.dst_root, self.best_model_state_dict, self.best_optimizer_state_dict) # save file
+                save_model("best", self.dst_root, self.best_model_snapshot.get(), self.best_optimizer_snapshot.get()) # save file
                 save_model("final", self.dst_root, self.model.state_dict(), self.optimizer.state_dict()) # save file
 
                 """ Rename `dst_root` """
@@ -572,6 +722,9 @@ class BaseTrainer(BaseObject):
                 }
                 rename_training_dir(**rename_training_dir_kwargs)
                 
+            elif self.resume_from:
+                self._cli_out.write(f"No best model, keep resumed directory '{self.dst_root}' ")
+            
             else:
                 """ Delete folder if less than one epoch has been completed. """
                 self._cli_out.write(f"Less than One epoch has been completed, "
@@ -608,8 +761,11 @@ class BaseTrainer(BaseObject):
         """ best record variables """
         self.best_val_f1: float = 0.0
         self.best_val_log: dict = { "Best": self.time_stamp, "epoch": 0 }
-        self.best_model_state_dict: dict = deepcopy(self.model.state_dict())
-        self.best_optimizer_state_dict: dict = deepcopy(self.optimizer.state_dict())
+        # (pinned) CPU buffers, reused by every new best
+        self.best_model_snapshot = PinnedStateSnapshot(self.device.type == "cuda")
+        self.best_optimizer_snapshot = PinnedStateSnapshot(self.device.type == "cuda")
+        self.best_model_snapshot.update(self.model.state_dict())
+        self.best_optimizer_snapshot.update(self.optimizer.state_dict())
         
         """ early stop """
         self.best_val_avg_loss: float = np.inf
@@ -625,29 +781,150 @@ class BaseTrainer(BaseObject):
         # ---------------------------------------------------------------------/
 
 
+    def _get_train_augmenters(self) -> List[iaa.Augmenter]:
+        """ `imgaug` augmenters held by `train_set` ( each has its own random state )
+        """
+        return [value for value in vars(self.train_set).values()
+                if isinstance(value, iaa.Augmenter)]
+        # ---------------------------------------------------------------------/
+
+
+    def _gen_checkpoint(self, epoch:int) -> dict:
+        """ Full training state at the end of `epoch`, tensors are copied to CPU
+        """
+        checkpoint: dict = {
+            "epoch"                     : epoch,
+            "time_stamp"                : self.time_stamp,
+            "model_state_dict"          : copy_state_to_cpu(self.model.state_dict()),
+            "optimizer_state_dict"      : copy_state_to_cpu(self.optimizer.state_dict()),
+            "best_model_state_dict"     : copy_state_to_cpu(self.best_model_snapshot.get()),
+            "best_optimizer_state_dict" : copy_state_to_cpu(self.best_optimizer_snapshot.get()),
+            "train_logs"                : deepcopy(self.train_logs),
+            "valid_logs"                : deepcopy(self.valid_logs),
+            "best_val_log"              : deepcopy(self.best_val_log),
+            "best_val_f1"               : self.best_val_f1,
+            "best_val_avg_loss"         : self.best_val_avg_loss,
+            "accum_no_improved"         : self.accum_no_improved,
+            "rng_states"                : get_rng_states(self._get_train_augmenters()),
+            "dataloader_rng"            : self.g.get_state(),
+        }
+        
+        if self.use_lr_schedular:
+            checkpoint["lr_scheduler_state_dict"] = deepcopy(self.lr_scheduler.state_dict())
+        if self.use_amp:
+            checkpoint["scaler_state_dict"] = self.scaler.state_dict()
+        if self.batch_augmenter is not None:
+            checkpoint["batch_augmenter_rng"] = self.batch_augmenter.generator.get_state()
+        
+        return checkpoint
+        # ---------------------------------------------------------------------/
+
+
+    def _load_resume_checkpoint(self):
+        """ Restore the state saved by `_gen_checkpoint()`,
+            RNG states are restored last ( setting up the trainer consumes random numbers )
+        """
+        ckpt: dict = self.resume_ckpt
+        
+        self.model.load_state_dict(ckpt["model_state_dict"])
+        self.optimizer.load_state_dict(ckpt["optimizer_state_dict"])
+        self.best_model_snapshot.update(ckpt["best_model_state_dict"])
+        self.best_optimizer_snapshot.update(ckpt["best_optimizer_state_dict"])
+        if self.use_lr_schedular:
+            self.lr_scheduler.load_state_dict(ckpt["lr_scheduler_state_dict"])
+        if self.use_amp:
+            self.scaler.load_state_dict(ckpt["scaler_state_dict"])
+        
+        """ logs, best record, early stop """
+        self.train_logs = ckpt["train_logs"]
+        self.valid_logs = ckpt["valid_logs"]
+        self.best_val_log = ckpt["best_val_log"]
+        self.best_val_f1 = ckpt["best_val_f1"]
+        self.best_val_avg_loss = ckpt["best_val_avg_loss"]
+        self.accum_no_improved = ckpt["accum_no_improved"]
+        self.training_writer.load_logs(self.train_logs, self.valid_logs,
+                                       self.best_val_log)
+        
+        """ RNG states """
+        self.g.set_state(ckpt["dataloader_rng"])
+        if self.batch_augmenter is not None:
+            self.batch_augmenter.generator.set_state(ckpt["batch_augmenter_rng"])
+        set_rng_states(ckpt["rng_states"], self._get_train_augmenters())
+        
+        self.start_epoch = ckpt["epoch"] + 1
+        self.resume_ckpt = None # release memory
+        # ---------------------------------------------------------------------/
+
+
+    def _save_device_log(self):
+        """ Record the execution backend, throughput is recorded in
+            `train_logs` and `valid_logs` ( `imgs_per_sec` )
+        """
+        device_info: dict = get_device_info(self.device)
+        device_info["channels_last"] = (self.memory_format == torch.channels_last)
+        device_info["use_amp"] = self.use_amp
+        
+        path = self.dst_root.joinpath(r"{Logs}_device.log")
+        with open(path, mode="w") as f_writer:
+            json.dump(device_info, f_writer, indent=4)
+        # ---------------------------------------------------------------------/
+
+
+    def _check_fused_forward(self):
+        """ Check numerical equivalence and throughput of the fused forward pass
+            against the two-pass one, using the first batch of `valid_dataloader`
+        """
+        data = next(iter(self.valid_dataloader))
+        images, images2 = data[0].to(self.device, memory_format=self.memory_format), \
+                          data[1].to(self.device, memory_format=self.memory_format) # move to GPU
+        
+        result: dict = check_fused_forward(self.model, images, images2)
+        
+        path = self.dst_root.joinpath(r"{Logs}_fused_forward.log")
+        with open(path, mode="w") as f_writer:
+            json.dump(result, f_writer, indent=4)
+        
+        self._cli_out.write(f"※　: fused forward pass, max_abs_diff = {result['max_abs_diff']:.2e}, "
+                            f"{result['two_pass_imgs_per_sec']} -> {result['fused_imgs_per_sec']} images/sec "
+                            f"( x{result['speedup']} )")
+        
+        if not result["allclose"]:
+            self.fused_forward = False
+            self._cli_out.write(f"{Fore.YELLOW}{Back.BLACK} Fused forward pass is NOT equivalent "
+                                f"to two-pass, force `fused_forward` = {self.fused_forward} {Style.RESET_ALL}")
+        # ---------------------------------------------------------------------/
+
+
     def _one_epoch_training(self, epoch:int):
         """
         """
         log: dict = { "Train": "", "epoch": epoch }
-        pred_list: list = []
-        gt_list: list = []
-        accum_loss: float = 0.0
+        num_classes: int = len(self.class2num_dict)
+        confusion_matrix: torch.Tensor = \
+            torch.zeros((num_classes, num_classes), dtype=torch.int64, device=self.device)
+        accum_loss: torch.Tensor = torch.zeros((), dtype=torch.float64, device=self.device)
+        n_images: int = 0
+        epoch_st: float = time.time()
         self.output_string = f"Epoch: {epoch:{formatter_padr0(self.epochs)}}"
         self.pbar_n_train.n = 0
         self.pbar_n_train.refresh()
         
+        dataloader: PrefetchLoader = self.train_dataloader
         self.model.train() # set model to training mode
-        for data in self.train_dataloader:
+        for data in dataloader:
             
             images, images2, labels, crop_names = data
+            if self.batch_augmenter is not None: # raw images -> augmented images
+                images, images2, _ = self.batch_augmenter(images)
             images, images2, labels = \
-                images.to(self.device), images2.to(self.device), labels.to(self.device) # move to GPU
+                images.to(self.device, memory_format=self.memory_format), \
+                images2.to(self.device, memory_format=self.memory_format), labels.to(self.device) # move to GPU
             
             self.optimizer.zero_grad() # clean gradients before each backpropagation
             if self.use_amp:
-                with autocast():
-                    preds = self.model(images)
-                    preds2 = self.model(images2)
+                with get_autocast(self.device, self.use_amp):
+                    preds, preds2 = forward_hybrid(self.model, images, images2,
+                                                   self.fused_forward)
                     
                     # hybrid loss
                     loss_ce = self.ce_loss(preds, labels)
@@ -660,8 +937,8 @@ class BaseTrainer(BaseObject):
                 self.scaler.update() # 更新縮放因子
                 
             else:
-                preds = self.model(images)
-                preds2 = self.model(images2)
+                preds, preds2 = forward_hybrid(self.model, images, images2,
+                                               self.fused_forward)
                 
                 # hybrid loss
                 loss_ce = self.ce_loss(preds, labels)
@@ -673,13 +950,13 @@ class BaseTrainer(BaseObject):
                 self.optimizer.step()
             
             """ Accumulate current batch loss """
-            accum_loss += loss_value.item() # tensor.item() -> get value of a Tensor
+            accum_loss += loss_value.detach() # stay on device, read once per epoch
+            n_images += images.shape[0]
             
-            """ Extend `pred_list`, `gt_list` """
+            """ Update `confusion_matrix` ( on device ) """
             preds_prob = torch.nn.functional.softmax(preds, dim=1)
             _, preds_hcls = torch.max(preds_prob, 1) # get the highest probability class
-            pred_list.extend(preds_hcls.cpu().numpy().tolist()) # conversion flow: Tensor --> ndarray --> list
-            gt_list.extend(labels.cpu().numpy().tolist())
+            confusion_matrix += bincount_confusion_matrix(preds_hcls, labels, num_classes)
             
             """ Update `pbar_n_train` """
             self.pbar_n_train.update(1)
@@ -687,15 +964,20 @@ class BaseTrainer(BaseObject):
         
         if self.use_lr_schedular: self.lr_scheduler.step() # update 'lr' for each epoch
         
-        calculate_metrics(log, (accum_loss/len(self.train_dataloader)), 
-                          pred_list, gt_list, self.class2num_dict)
+        calculate_metrics_from_confusion_matrix(log, (accum_loss.item()/len(self.train_dataloader)),
+                                                confusion_matrix, self.class2num_dict)
+        epoch_time: float = time.time() - epoch_st
+        log["imgs_per_sec"] = round(n_images/epoch_time, 2) # throughput (image pairs)
+        log["data_wait_sec"] = round(dataloader.data_wait, 2) # waiting for `DataLoader`
+        log["compute_sec"] = round(epoch_time - dataloader.data_wait, 2)
         
         """ Update `self.train_logs` """
         self.train_logs.append(log)
         
         """ Update postfix of `pbar_n_train` """
         temp_str = f" {'{'} Loss: {log['average_loss']}, "
-        temp_str += f"{self.score_key}: {log[self.score_key]}"
+        temp_str += f"{self.score_key}: {log[self.score_key]}, "
+        temp_str += f"data_wait / compute: {log['data_wait_sec']}s / {log['compute_sec']}s"
         if self.use_lr_schedular is True:
             temp_str += f", lr: {self.lr_scheduler.get_last_lr()[0]:.0e} {'}'} "
         else:
@@ -709,22 +991,27 @@ class BaseTrainer(BaseObject):
         """
         """
         log: dict = { "Valid": "", "epoch": epoch }
-        pred_list: list = []
-        gt_list: list = []
-        accum_loss: float = 0.0
+        num_classes: int = len(self.class2num_dict)
+        confusion_matrix: torch.Tensor = \
+            torch.zeros((num_classes, num_classes), dtype=torch.int64, device=self.device)
+        accum_loss: torch.Tensor = torch.zeros((), dtype=torch.float64, device=self.device)
+        n_images: int = 0
+        epoch_st: float = time.time()
         self.pbar_n_valid.n = 0
         self.pbar_n_valid.refresh()
         
         self.model.eval() # set to evaluation mode
+        dataloader: PrefetchLoader = self.valid_dataloader
         with torch.no_grad():
-            for data in self.valid_dataloader:
+            for data in dataloader:
                 
                 images, images2, labels, crop_names = data
                 images, images2, labels = \
-                    images.to(self.device), images2.to(self.device), labels.to(self.device) # move to GPU
+                    images.to(self.device, memory_format=self.memory_format), \
+                    images2.to(self.device, memory_format=self.memory_format), labels.to(self.device) # move to GPU
                 
-                preds = self.model(images)
-                preds2 = self.model(images2)
+                preds, preds2 = forward_hybrid(self.model, images, images2,
+                                               self.fused_forward)
                 
                 # hybrid loss
                 loss_ce = self.ce_loss(preds, labels)
@@ -733,20 +1020,26 @@ class BaseTrainer(BaseObject):
                 # loss_value = loss_ce
                 
                 """ Accumulate current batch loss """
-                accum_loss += loss_value.item() # tensor.item() -> get value of a Tensor
+                accum_loss += loss_value.detach() # stay on device, read once per epoch
+                n_images += images.shape[0]
                 
-                """ Extend `pred_list`, `gt_list` """
+                """ Update `confusion_matrix` ( on device ) """
                 preds_prob = torch.nn.functional.softmax(preds, dim=1)
                 _, preds_hcls = torch.max(preds_prob, 1) # get the highest probability class
-                pred_list.extend(preds_hcls.cpu().numpy().tolist()) # conversion flow: Tensor --> ndarray --> list
-                gt_list.extend(labels.cpu().numpy().tolist())
+                confusion_matrix += bincount_confusion_matrix(preds_hcls, labels, num_classes)
                 
                 """ Update `pbar_n_valid` """
                 self.pbar_n_valid.update(1)
                 self.pbar_n_valid.refresh()
 
-        calculate_metrics(log, (accum_loss/len(self.valid_dataloader)),
-                          pred_list, gt_list, self.class2num_dict)
+        accum_loss: float = accum_loss.item()
+        confusion_matrix: np.ndarray = confusion_matrix.cpu().numpy()
+        calculate_metrics_from_confusion_matrix(log, (accum_loss/len(self.valid_dataloader)),
+                                                confusion_matrix, self.class2num_dict)
+        epoch_time: float = time.time() - epoch_st
+        log["imgs_per_sec"] = round(n_images/epoch_time, 2) # throughput (image pairs)
+        log["data_wait_sec"] = round(dataloader.data_wait, 2) # waiting for `DataLoader`
+        log["compute_sec"] = round(epoch_time - dataloader.data_wait, 2)
         
         """ Update `self.valid_logs` """
         self.valid_logs.append(log)
@@ -759,11 +1052,11 @@ class BaseTrainer(BaseObject):
             self.best_val_f1 = log[self.score_key]
                         
             """ Update `best_val_log` """
-            calculate_metrics(self.best_val_log, (accum_loss/len(self.valid_dataloader)),
-                              pred_list, gt_list, self.class2num_dict)
+            calculate_metrics_from_confusion_matrix(self.best_val_log, (accum_loss/len(self.valid_dataloader)),
+                                                    confusion_matrix, self.class2num_dict)
             
-            self.best_model_state_dict = deepcopy(self.model.state_dict())
-            self.best_optimizer_state_dict = deepcopy(self.optimizer.state_dict())
+            self.best_model_snapshot.update(self.model.state_dict())
+            self.best_optimizer_snapshot.update(self.optimizer.state_dict())
             self.best_val_log["epoch"] = epoch
             
             self.output_string += (f", ☆★☆ BEST_VALIDATION_SCORE ☆★☆"
@@ -1,11 +1,18 @@
 import json
 import os
+import random
+import time
 from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
-import matplotlib.pyplot as plt
+import imgaug as ia
+import numpy as np
 import pandas as pd
 import torch
+from colorama import Back, Fore, Style
+from imgaug import augmenters as iaa
+from matplotlib.figure import Figure
+from torch import nn
 # -----------------------------------------------------------------------------/
 
 
@@ -48,7 +55,9 @@ def plot_training_trend(save_dir:Path, loss_key:str, score_key:str,
     valid_logs = pd.DataFrame(valid_logs)
     
     """ Create figure set """
-    fig, axs = plt.subplots(1, 2, figsize=(14,6), dpi=100)
+    # not using `pyplot` ( global state ), can be called from `AsyncTrainingWriter` thread
+    fig = Figure(figsize=(14,6), dpi=100)
+    axs = fig.subplots(1, 2)
     fig.suptitle('Training')
     
     """ Loss figure """
@@ -67,7 +76,6 @@ def plot_training_trend(save_dir:Path, loss_key:str, score_key:str,
     """ Save figure """
     fig_path = save_dir.joinpath(f"training_trend_{score_key}.png")
     fig.savefig(fig_path)
-    plt.close(fig) # Close figure
     # -------------------------------------------------------------------------/
 
 
@@ -137,4 +145,144 @@ def rename_training_dir(orig_dir:Path, time_stamp:str, state:str,
     new_dir = os.sep.join(orig_dir_split)
     
     os.rename(orig_dir, new_dir)
+    # -------------------------------------------------------------------------/
+
+
+
+def forward_hybrid(model:nn.Module, images:torch.Tensor, images2:torch.Tensor,
+                   fused:bool) -> Tuple[torch.Tensor, torch.Tensor]:
+    """ Forward both views for the hybrid loss ( CE(preds) + MSE(preds, preds2) )
+    
+    Args:
+        model (nn.Module): the model
+        images (torch.Tensor): view 1, shape = (B, C, H, W)
+        images2 (torch.Tensor): view 2, same shape as `images`
+        fused (bool): if `True`, concat two views into one batch and run
+            a single forward pass, then split the logits.
+    
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: (`preds`, `preds2`)
+    """
+    if fused:
+        preds_cat = model(torch.cat([images, images2], dim=0))
+        preds, preds2 = torch.split(preds_cat, images.shape[0], dim=0)
+    else:
+        preds = model(images)
+        preds2 = model(images2)
+    
+    return preds, preds2
+    # -------------------------------------------------------------------------/
+
+
+
+def has_batchnorm(model:nn.Module) -> bool:
+    """ `BatchNorm` (train mode) normalizes with the statistics of the whole batch,
+        so fused forward pass is NOT equivalent to the two-pass one.
+    """
+    return any(isinstance(m, nn.modules.batchnorm._BatchNorm) for m in model.modules())
+    # -------------------------------------------------------------------------/
+
+
+
+def check_fused_forward(model:nn.Module, images:torch.Tensor,
+                        images2:torch.Tensor, n_repeat:int=3) -> dict:
+    """ Compare the fused forward pass with the two-pass one on the same batch
+        ( `eval` mode, no grad, FP32 ), return the difference and the timing.
+    
+    Returns:
+        dict: { "max_abs_diff", "allclose", "two_pass_sec", "fused_sec",
+                "two_pass_imgs_per_sec", "fused_imgs_per_sec", "speedup" }
+    """
+    def sync():
+        if images.is_cuda: torch.cuda.synchronize(images.device)
+    
+    def timing(fused:bool):
+        forward_hybrid(model, images, images2, fused) # warm up
+        sync(); st = time.perf_counter()
+        for _ in range(n_repeat):
+            forward_hybrid(model, images, images2, fused)
+        sync()
+        return (time.perf_counter() - st)/n_repeat
+    
+    is_training = model.training
+    model.eval()
+    with torch.no_grad():
+        ref = forward_hybrid(model, images, images2, fused=False)
+        out = forward_hybrid(model, images, images2, fused=True)
+        max_abs_diff = max((a - b).abs().max().item() for a, b in zip(ref, out))
+        allclose = all(torch.allclose(a, b, rtol=1e-3, atol=1e-4) for a, b in zip(ref, out))
+        two_pass_sec = timing(fused=False)
+        fused_sec = timing(fused=True)
+    model.train(is_training)
+    
+    n_imgs = 2*images.shape[0]
+    
+    return {"max_abs_diff": max_abs_diff,
+            "allclose": allclose,
+            "two_pass_sec": round(two_pass_sec, 5),
+            "fused_sec": round(fused_sec, 5),
+            "two_pass_imgs_per_sec": round(n_imgs/two_pass_sec, 2),
+            "fused_imgs_per_sec": round(n_imgs/fused_sec, 2),
+            "speedup": round(two_pass_sec/fused_sec, 3)}
+    # -------------------------------------------------------------------------/
+
+
+
+def get_rng_states(augmenters:List[iaa.Augmenter]) -> dict:
+    """ Collect states of all random generators used in training
+        ( `random`, `numpy`, `torch`, 'cuda', `imgaug` global and `augmenters` )
+    """
+    states: dict = {}
+    states["python"] = random.getstate()
+    states["numpy"] = np.random.get_state()
+    states["torch"] = torch.get_rng_state()
+    if torch.cuda.is_available():
+        states["cuda"] = torch.cuda.get_rng_state_all()
+    states["imgaug"] = ia.random.get_global_rng().state
+    states["augmenters"] = [[aug.random_state.state for aug in [augmenter, *augmenter.get_all_children(flat=True)]]
+                            for augmenter in augmenters]
+    
+    return states
+    # -------------------------------------------------------------------------/
+
+
+
+def set_rng_states(states:dict, augmenters:List[iaa.Augmenter]):
+    """ Restore states from `get_rng_states()`
+    """
+    random.setstate(states["python"])
+    np.random.set_state(states["numpy"])
+    torch.set_rng_state(states["torch"])
+    if ("cuda" in states) and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states["cuda"])
+    ia.random.get_global_rng().set_state_(states["imgaug"])
+    for augmenter, aug_states in zip(augmenters, states["augmenters"]):
+        for aug, state in zip([augmenter, *augmenter.get_all_children(flat=True)], aug_states):
+            aug.random_state.set_state_(state)
+    # -------------------------------------------------------------------------/
+
+
+
+def save_checkpoint(save_dir:Path, checkpoint:dict):
+    """ Save `checkpoint.pth`, write to a temp file first,
+        a crash during saving won't break the previous checkpoint.
+    """
+    path = save_dir.joinpath("checkpoint.pth")
+    tmp_path = save_dir.joinpath("checkpoint.pth.tmp")
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+    # -------------------------------------------------------------------------/
+
+
+
+def load_checkpoint(save_dir:Path) -> dict:
+    """ Load `checkpoint.pth` ( tensors on CPU )
+    """
+    path = save_dir.joinpath("checkpoint.pth")
+    if not path.exists():
+        raise FileNotFoundError(f"{Fore.RED}{Back.BLACK} Can't find checkpoint: '{path}' "
+                                f"{Style.RESET_ALL}\n")
+    
+    # contains RNG states ( python / numpy objects ), not only weights
+    return torch.load(path, map_location="cpu", weights_only=False)
     # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -1,14 +1,19 @@
+import os
+import platform
 from collections import Counter
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import torch
-from sklearn.metrics import f1_score, r2_score
+from colorama import Back, Fore, Style
+from sklearn.metrics import r2_score
 
 from ..assert_fn import *
 from ..shared.clioutput import CLIOutput
+from ..shared.utils import get_peak_rss_mb
 # -----------------------------------------------------------------------------/
 
 
@@ -32,6 +37,123 @@ def set_gpu(cuda_idx:int, cli_out:CLIOutput=None):
 
 
 
+def set_cpu(num_threads:int=0, cli_out:CLIOutput=None):
+    """ CPU backend, set the number of intra-op threads
+    
+    Args:
+        num_threads (int, optional): `0` means using all available cores. Defaults to 0.
+    """
+    if num_threads <= 0:
+        num_threads = get_cpu_count()
+    
+    torch.set_num_threads(num_threads)
+    device = torch.device("cpu")
+    
+    if cli_out: cli_out.write(f"Using '{device}', device_name = '{(platform.processor() or platform.machine())}', "
+                              f"threads = {num_threads}, "
+                              f"bfloat16 = {is_cpu_bf16_supported()}")
+    
+    return device
+    # -------------------------------------------------------------------------/
+
+
+
+def set_device(device_type:str, cuda_idx:int,
+               num_threads:int=0, cli_out:CLIOutput=None):
+    """
+    
+    Args:
+        device_type (str): 'auto', 'cuda' or 'cpu',
+            'auto' will use CPU backend if there is no GPU.
+        cuda_idx (int): for 'cuda' only
+        num_threads (int, optional): for 'cpu' only, see `set_cpu()`. Defaults to 0.
+    """
+    if device_type == "auto":
+        device_type = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    if device_type == "cuda":
+        return set_gpu(cuda_idx, cli_out)
+    elif device_type == "cpu":
+        return set_cpu(num_threads, cli_out)
+    else:
+        raise ValueError(f"{Fore.RED}{Back.BLACK} Unknown device type: '{device_type}', "
+                         f"expect 'auto', 'cuda' or 'cpu' {Style.RESET_ALL}\n")
+    # -------------------------------------------------------------------------/
+
+
+
+def get_cpu_count() -> int:
+    """ Number of cores available to current process
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # not Linux
+        return os.cpu_count()
+    # -------------------------------------------------------------------------/
+
+
+
+def is_cpu_bf16_supported() -> bool:
+    """ Check if the CPU has native `bfloat16` instructions ( e.g. AVX512-BF16, AMX )
+    """
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+    # -------------------------------------------------------------------------/
+
+
+
+def get_autocast(device:torch.device, enable:bool):
+    """ Autocast context of the backend,
+        - 'cuda': `float16` ( use with `GradScaler` when training )
+        - 'cpu': `bfloat16`, only if the CPU supports it
+    """
+    if enable:
+        if device.type == "cuda":
+            return torch.autocast("cuda", dtype=torch.float16)
+        elif (device.type == "cpu") and is_cpu_bf16_supported():
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+    
+    return nullcontext()
+    # -------------------------------------------------------------------------/
+
+
+
+def get_device_info(device:torch.device) -> dict:
+    """
+    """
+    if device.type == "cuda":
+        device_name = torch.cuda.get_device_name(device)
+    else:
+        device_name = platform.processor() or platform.machine()
+    
+    return {"device": str(device),
+            "device_name": device_name,
+            "threads": torch.get_num_threads()}
+    # -------------------------------------------------------------------------/
+
+
+
+def get_peak_memory(device:torch.device) -> dict:
+    """ Peak memory ( MB ) of current process, GPU: allocated by tensors,
+        CPU: resident set size ( not available on Windows )
+    """
+    peak_memory: dict = {}
+    
+    if device.type == "cuda":
+        peak_memory["gpu_peak_mb"] = \
+            round(torch.cuda.max_memory_allocated(device)/2**20, 2)
+    
+    cpu_peak_rss = get_peak_rss_mb()
+    if cpu_peak_rss is not None:
+        peak_memory["cpu_peak_rss_mb"] = cpu_peak_rss
+    
+    return peak_memory
+    # -------------------------------------------------------------------------/
+
+
+
 def gen_class2num_dict(num2class_list:List[str]):
     """
     """
@@ -76,39 +198,93 @@ def get_fish_class(image_name:str, df_dataset_xlsx:pd.DataFrame):
 
 
 
+def bincount_confusion_matrix(pred_idxs:Union[np.ndarray, torch.Tensor],
+                              gt_idxs:Union[np.ndarray, torch.Tensor],
+                              num_classes:int) -> Union[np.ndarray, torch.Tensor]:
+    """ Count ( ground truth, prediction ) pairs with one `bincount`,
+        a `torch.Tensor` stays on its device ( no synchronization ).
+    
+    >>>  *  {0} {1} {2}  ~~> prediction
+    >>> {0} [ ] [ ] [ ]  ~~> gt : 0
+    >>> {1} [ ] [ ] [ ]  ~~> gt : 1
+    >>> {2} [ ] [ ] [ ]  ~~> gt : 2
+    
+    Args:
+        pred_idxs (Union[np.ndarray, torch.Tensor]): predicted class indices, shape = (N, )
+        gt_idxs (Union[np.ndarray, torch.Tensor]): ground truth class indices, shape = (N, )
+        num_classes (int): number of classes
+    
+    Returns:
+        Union[np.ndarray, torch.Tensor]: `int64`, shape = (num_classes, num_classes)
+    """
+    if isinstance(pred_idxs, torch.Tensor):
+        flat_idxs = gt_idxs.long()*num_classes + pred_idxs.long()
+        return torch.bincount(flat_idxs, minlength=num_classes**2).reshape(num_classes, num_classes)
+    
+    flat_idxs = np.asarray(gt_idxs, dtype=np.int64)*num_classes + np.asarray(pred_idxs, dtype=np.int64)
+    return np.bincount(flat_idxs, minlength=num_classes**2).reshape(num_classes, num_classes)
+    # -------------------------------------------------------------------------/
+
+
+
 def calculate_metrics(log:Dict, average_loss:float,
                       predict_list:list, groundtruth_list:list,
                       class2num_dict:Dict[str, int]):
+    """ `predict_list`, `groundtruth_list` are class names or class indices
     """
+    if (len(predict_list) > 0) and isinstance(predict_list[0], str):
+        predict_list = [class2num_dict[label] for label in predict_list]
+        groundtruth_list = [class2num_dict[label] for label in groundtruth_list]
+    
+    confusion_matrix = bincount_confusion_matrix(predict_list, groundtruth_list,
+                                                 len(class2num_dict))
+    calculate_metrics_from_confusion_matrix(log, average_loss,
+                                            confusion_matrix, class2num_dict)
+    # -------------------------------------------------------------------------/
+
+
+
+def calculate_metrics_from_confusion_matrix(log:Dict, average_loss:float,
+                                            confusion_matrix:Union[np.ndarray, torch.Tensor],
+                                            class2num_dict:Dict[str, int]):
+    """ Same scores as `sklearn.metrics.f1_score()`, computed on the labels
+        exist in ground truth or prediction.
+    
+    Args:
+        confusion_matrix (Union[np.ndarray, torch.Tensor]): see `bincount_confusion_matrix()`,
+            indexed by the values of `class2num_dict`
     """
+    if isinstance(confusion_matrix, torch.Tensor):
+        confusion_matrix = confusion_matrix.cpu().numpy()
+    
     """ Calculate different f1-score """
-    class_f1 = f1_score(groundtruth_list, predict_list, average=None) # by class
-    micro_f1 = f1_score(groundtruth_list, predict_list, average='micro')
-    macro_f1 = f1_score(groundtruth_list, predict_list, average='macro')
-    weighted_f1 = f1_score(groundtruth_list, predict_list, average='weighted')
+    tp = np.diag(confusion_matrix).astype(np.float64)
+    support = confusion_matrix.sum(axis=1) # ground truth of each class
+    n_pred = confusion_matrix.sum(axis=0) # prediction of each class
+    exist = (support + n_pred) > 0 # ( 很可能會缺其中一種 label, 例如: 'BG' )
+    
+    class_f1 = np.zeros(len(tp), dtype=np.float64)
+    class_f1[exist] = 2*tp[exist] / (support[exist] + n_pred[exist]) # by class
+    micro_f1 = tp.sum() / confusion_matrix.sum()
+    macro_f1 = class_f1[exist].mean()
+    weighted_f1 = (class_f1 * support).sum() / support.sum()
     maweavg_f1 = (macro_f1 + weighted_f1)/2
     
     """ Update `average_loss` """
     if average_loss is not None: log["average_loss"] = round(average_loss, 5)
     else: log["average_loss"] = None
     
-    # deal with `class_f1` ( 很可能會缺其中一種 label, 例如: 'BG' )
-    exist_labels = np.unique(predict_list + groundtruth_list) # np.unique 自帶 sorting
-    if np.issubdtype(exist_labels.dtype, np.unicode_): # ndarray 是否為 Unicode string
-        tmp_dict = {class2num_dict[label]: f1 for label, f1 in zip(exist_labels, class_f1)}
-    else:
-        tmp_dict = {label: f1 for label, f1 in zip(exist_labels, class_f1)}
     for key, value in class2num_dict.items():
-        try:
-            log[f"{key}_f1"] = round(tmp_dict[value], 5)
-        except KeyError:
+        if exist[value]:
+            log[f"{key}_f1"] = round(float(class_f1[value]), 5)
+        else:
             log[f"{key}_f1"] = "---"
     
     """ Update other `f1-score` """
-    log["micro_f1"] = round(micro_f1, 5)
-    log["macro_f1"] = round(macro_f1, 5)
-    log["weighted_f1"] = round(weighted_f1, 5)
-    log["maweavg_f1"] = round(maweavg_f1, 5)
+    log["micro_f1"] = round(float(micro_f1), 5)
+    log["macro_f1"] = round(float(macro_f1), 5)
+    log["weighted_f1"] = round(float(weighted_f1), 5)
+    log["maweavg_f1"] = round(float(maweavg_f1), 5)
     # -------------------------------------------------------------------------/
 
 
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterator
+
+import cv2
+import matplotlib
+from threadpoolctl import threadpool_limits
+
+from ..dl.dataset.augmentation import crop_base_size
+from .calc_seg_feat import (count_area, count_average_size, count_element,
+                            get_patch_sizes, update_ana_toml_file,
+                            update_seg_analysis_dict)
+from .seg_generate import (render_seg_results, single_cellpose_prediction,
+                           single_slic_labeling)
+from .seg_storage import get_seg_file
+# -----------------------------------------------------------------------------/
+
+
+_SEG_BATCH_VERSION = 2 # increase it if the outputs of a job are changed
+# -----------------------------------------------------------------------------/
+
+
+def get_seg_config_hash(config: dict) -> str:
+    """ Hash of the config items that change the outputs of a segmentation job,
+        ( `debug_mode` only prints messages, it's not included )
+    """
+    seg_desc = config["seg_results"]["seg_desc"]
+    seg_params = {k: v for k, v in config[seg_desc].items() if k != "debug_mode"}
+    items = [_SEG_BATCH_VERSION,
+             config["data_processed"]["palmskin_result_name"],
+             config["seg_results"], seg_params]
+    
+    return hashlib.sha1(json.dumps(items, sort_keys=True,
+                                   default=str).encode("utf-8")).hexdigest()
+    # -------------------------------------------------------------------------/
+
+
+def create_seg_job(config: dict, src_path: Path, dname_dir: Path,
+                   seg_dirname: str) -> dict:
+    """ A job is a plain `dict`, it can be sent to a process and saved in a manifest
+    """
+    seg_desc = config["seg_results"]["seg_desc"]
+    # size: W512_H1024 (FixedROI)
+    target_path = dname_dir.joinpath(f"CenterCropped/{src_path.stem}.W512_H1024.tif")
+    
+    return {"name": dname_dir.parts[-1],
+            "src_path": str(src_path),
+            "target_path": str(target_path),
+            "seg_dir": str(dname_dir.joinpath(f"{seg_desc}/{seg_dirname}")),
+            "seg_dirname": seg_dirname,
+            "seg_desc": seg_desc,
+            "params": dict(config[seg_desc]), # e.g. `n_segments`, `dark`, `merge`
+            "render": config["batch"]["render"]} # False: data only ( `.seg.npz` )
+    # -------------------------------------------------------------------------/
+
+
+def get_seg_job_paths(job: dict) -> tuple[Path, Path]:
+    """ Returns: ( `.ana.toml`, `.seg.npz` ) of `job`
+    """
+    seg_dir = Path(job["seg_dir"])
+    ana_toml_file = seg_dir.joinpath(f"{job['seg_dirname']}.ana.toml")
+    
+    return ana_toml_file, get_seg_file(seg_dir)
+    # -------------------------------------------------------------------------/
+
+
+def get_seg_render_path(job: dict) -> Path:
+    """ Returns: '.seg2ol.png' of `job`, the last render saved by `save_seg_renders()`
+    """
+    seg_dir = Path(job["seg_dir"])
+    
+    return seg_dir.joinpath(f"{job['seg_dirname']}.seg2ol.png")
+    # -------------------------------------------------------------------------/
+
+
+def is_seg_job_done(job: dict, manifest: dict, config_hash: str) -> bool:
+    """ A job is done if its outputs exist and the last successful run
+        in `manifest` used the same config ( `config_hash` ),
+        renders are also required if `job["render"]` is True
+        ( and must not be older than the `.seg.npz` )
+    """
+    record = manifest.get("jobs", {}).get(job["name"], {})
+    if record.get("config_hash") != config_hash:
+        return False
+    
+    ana_toml_file, seg_file = get_seg_job_paths(job)
+    if not (ana_toml_file.exists() and seg_file.exists()):
+        return False
+    
+    if job["render"]:
+        render_path = get_seg_render_path(job)
+        if (not render_path.exists()) or \
+                (render_path.stat().st_mtime < seg_file.stat().st_mtime):
+            return False
+    
+    return True
+    # -------------------------------------------------------------------------/
+
+
+def load_seg_manifest(path: Path) -> dict:
+    """ An empty manifest is returned if `path` doesn't exist or is broken
+    """
+    try:
+        with open(path, mode="r", encoding="utf-8") as f_reader:
+            return json.load(f_reader)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"jobs": {}}
+    # -------------------------------------------------------------------------/
+
+
+def save_seg_manifest(path: Path, manifest: dict):
+    """ Write a temporary file then replace, an interrupted run never
+        leaves a broken manifest
+    """
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, mode="w", encoding="utf-8") as f_writer:
+        json.dump(manifest, f_writer, indent=2)
+    os.replace(tmp_path, path)
+    # -------------------------------------------------------------------------/
+
+
+def run_seg_job(job: dict, cp_model=None) -> dict:
+    """ Crop -> segmentation -> features ( `.ana.toml` ) of an image,
+        a failure is returned as a result instead of raised,
+        so the other jobs of a batch are not affected.
+    
+    Args:
+        job (dict): created by '1.get_cell_feature.py'
+        cp_model (optional): Cellpose model, required if `seg_desc` is 'Cellpose'.
+            Defaults to None.
+    
+    Returns:
+        dict: `{ "name", "status": 'done' or 'failed', "elapsed", "error" }`
+    """
+    st = time.perf_counter()
+    result = {"name": job["name"], "status": "done", "elapsed": None, "error": None}
+    
+    try:
+        # get image, size: W512_H1024 (FixedROI)
+        target_path = Path(job["target_path"])
+        if not target_path.exists():
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_img = crop_base_size(512, 1024)(image=cv2.imread(job["src_path"]))
+            cv2.imwrite(str(target_path), tmp_img)
+        
+        seg_dir = Path(job["seg_dir"])
+        seg_dir.mkdir(parents=True, exist_ok=True)
+        
+        # generate cell segmentation
+        params = job["params"]
+        if job["seg_desc"] == "SLIC":
+            cell_seg, patch_seg = single_slic_labeling(seg_dir, target_path,
+                                                       params["n_segments"], params["dark"],
+                                                       params["merge"], params["debug_mode"],
+                                                       render=job["render"])
+        elif job["seg_desc"] == "Cellpose":
+            cell_seg, patch_seg = single_cellpose_prediction(seg_dir, target_path,
+                                                             params["channels"], cp_model,
+                                                             params["merge"], params["debug_mode"],
+                                                             render=job["render"])
+        
+        # update
+        analysis_dict = {}
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *count_area(cell_seg))
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *count_element(cell_seg, "cell"))
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *count_element(patch_seg, "patch"))
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *count_average_size(analysis_dict, "cell"))
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *count_average_size(analysis_dict, "patch"))
+        analysis_dict = update_seg_analysis_dict(analysis_dict, *get_patch_sizes(patch_seg))
+        
+        # update info to toml file
+        ana_toml_file, _ = get_seg_job_paths(job)
+        update_ana_toml_file(ana_toml_file, analysis_dict)
+    
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc()
+    
+    result["elapsed"] = round(time.perf_counter() - st, 3)
+    
+    return result
+    # -------------------------------------------------------------------------/
+
+
+def run_render_job(job: dict) -> dict:
+    """ PNG renders of a job done with `render = False` ( `render_seg_results()` ),
+        a failure is returned as a result, same as `run_seg_job()`
+    """
+    st = time.perf_counter()
+    result = {"name": job["name"], "status": "done", "elapsed": None, "error": None}
+    
+    try:
+        render_seg_results(Path(job["seg_dir"]), Path(job["target_path"]))
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc()
+    
+    result["elapsed"] = round(time.perf_counter() - st, 3)
+    
+    return result
+    # -------------------------------------------------------------------------/
+
+
+def init_seg_worker():
+    """ `initializer` of the `ProcessPoolExecutor` in `run_seg_jobs()`,
+        one thread per process, `worker` processes already use all cores.
+    """
+    matplotlib.use("agg") # no GUI in workers
+    cv2.setNumThreads(1)
+    threadpool_limits(limits=1) # BLAS / OpenMP
+    # -------------------------------------------------------------------------/
+
+
+def run_seg_jobs(jobs: list[dict], worker: int, start_method: str,
+                 cp_model=None, task: Callable[..., dict]=run_seg_job) -> Iterator[dict]:
+    """ Run `task` ( `run_seg_job()` or `run_render_job()` ) of `jobs` on
+        `worker` processes, results are yielded as jobs complete.
+        
+        - `worker <= 1` or a Cellpose model ( `cp_model`, on GPU ) runs in
+            the current process one by one.
+        - A crashed process only fails its own job ( and the jobs of the broken pool ).
+    """
+    if (worker <= 1) or (cp_model is not None):
+        task_kwargs = {} if cp_model is None else {"cp_model": cp_model}
+        for job in jobs:
+            yield task(job, **task_kwargs)
+        return
+    
+    executor = ProcessPoolExecutor(max_workers=worker,
+                                   mp_context=multiprocessing.get_context(start_method),
+                                   initializer=init_seg_worker)
+    try:
+        futures = {executor.submit(task, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception: # e.g. `BrokenProcessPool`
+                yield {"name": futures[future]["name"], "status": "failed",
+                       "elapsed": None, "error": traceback.format_exc()}
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -4,7 +4,6 @@
 import os
 import pickle
 import sys
-from copy import deepcopy
 from pathlib import Path
 
 import cv2
@@ -17,7 +16,6 @@ from rich import print
 from rich.console import Console
 from rich.pretty import Pretty
 from rich.traceback import install
-from scipy.ndimage import binary_dilation as dila
 from skimage import measure
 from skimage.color import deltaE_ciede94, rgb2lab
 from skimage.segmentation import mark_boundaries, slic
@@ -26,6 +24,8 @@ from ..shared.config import load_config
 from ..shared.pathnavigator import PathNavigator
 from ..shared.utils import create_new_dir
 from .calc_seg_feat import count_element, update_seg_analysis_dict
+from .seg_region import SegRegions, UnionFind
+from .seg_storage import get_seg_file, load_seg_result, save_seg_labels
 from .utils import get_cellpose_param_name, get_seg_desc, get_slic_param_name
 
 install()
@@ -58,7 +58,7 @@ def simple_col_dis(color1, color2):
 
 
 def save_segment_result(save_path:Path, seg:np.ndarray):
-    """
+    """ (deprecated) pickled label array, replaced by `save_seg_labels()`
     """
     with open(save_path, mode="wb") as f_writer:
         pickle.dump(seg, f_writer)
@@ -122,21 +122,19 @@ def get_average_rgb_v2(mask: np.ndarray, rgb_img: np.ndarray,
     # -------------------------------------------------------------------------/
 
 
-def average_rgb_coloring(seg: np.ndarray, rgb_img: np.ndarray):
-    """ channel order of `img` is `RGB`
+def average_rgb_coloring(seg: np.ndarray, rgb_img: np.ndarray,
+                         regions: SegRegions=None):
+    """ channel order of `img` is `RGB`,
+        `regions` of (`seg`, `rgb_img`) can be passed to reuse its cached colors
     """
     assert rgb_img.dtype == np.uint8, "rgb_img.dtype != np.uint8"
     
-    # vars
-    avgcolor_img = np.zeros((*seg.shape, 3), dtype=rgb_img.dtype)
+    if regions is None:
+        regions = SegRegions(seg, rgb_img)
     
-    labels = np.unique(seg)
-    for label in labels:
-        if label == 0: continue # skip background
-        mask = (seg == label)
-        # _, avg_rgb = get_average_rgb(mask, rgb_img, avg_ratio=0.5)
-        _, avg_rgb = get_average_rgb_v2(mask, rgb_img, qL=0.5, qR=0.9)
-        avgcolor_img[mask] = np.uint8(avg_rgb)
+    # color of each label ( same as `get_average_rgb_v2(qL=0.5, qR=0.9)` ), background is black
+    lut = regions.get_color_lut(qL=0.5, qR=0.9, background=0)
+    avgcolor_img = lut[regions.idx_img]
     
     # check and return
     assert id(avgcolor_img) != id(rgb_img)
@@ -144,41 +142,87 @@ def average_rgb_coloring(seg: np.ndarray, rgb_img: np.ndarray):
     # -------------------------------------------------------------------------/
 
 
-def merge_similar_rgb(seg: np.ndarray, rgb_img: np.ndarray,
-                      merge: float, debug_mode: bool):
+def merge_background(seg: np.ndarray, rgb_img: np.ndarray, dark: float):
+    """ Labels with mean color close to black ( `simple_col_dis() <= dark` ) become
+        background (0), others are re-indexed from `max(seg) + 1` in ascending order.
+        
+        - One pass of `np.bincount()` per channel, mean of a label is the same as
+            `get_average_rgb(mask, rgb_img, avg_ratio=1.0)`
+            ( sums of `uint8` pixels are exact in `float64` ).
     """
+    assert rgb_img.dtype == np.uint8, "rgb_img.dtype != np.uint8"
+    
+    labels, idxs, counts = np.unique(seg.ravel(), return_inverse=True, return_counts=True)
+    
+    # mean color of each label
+    colors = np.empty((len(labels), 3), dtype=np.float64)
+    for ch in range(3):
+        colors[:, ch] = np.bincount(idxs, weights=rgb_img[..., ch].ravel(),
+                                    minlength=len(labels)) / counts
+    
+    # compare with 'background', same summation order as `simple_col_dis()`
+    color_dists = np.sqrt(colors[:, 0]**2 + colors[:, 1]**2 + colors[:, 2]**2)
+    is_bg = (color_dists <= dark)
+    
+    # background -> 0, others -> re-index (ascending)
+    new_labels = np.zeros(len(labels), dtype=seg.dtype)
+    new_labels[~is_bg] = np.max(labels) + 1 + np.arange(np.count_nonzero(~is_bg))
+    
+    # check and return
+    merge_seg = new_labels[idxs].reshape(seg.shape)
+    assert id(merge_seg) != id(seg)
+    return merge_seg
+    # -------------------------------------------------------------------------/
+
+
+def merge_similar_rgb(seg: np.ndarray, rgb_img: np.ndarray,
+                      merge: float, debug_mode: bool,
+                      regions: SegRegions=None):
+    """ Labels are visited in ascending order, a label absorbs its larger neighbors
+        ( `binary_dilation(mask, iterations=2)` ) with similar color ( `deltaE_ciede94` ).
+        
+        - A label absorbed before its turn is skipped.
+        - The region of a label is unchanged at its turn ( only larger labels are absorbed ),
+            so colors and neighbors come from `seg` and are computed once.
     """
     assert rgb_img.dtype == np.uint8, "rgb_img.dtype != np.uint8"
     
+    if regions is None:
+        regions = SegRegions(seg, rgb_img)
+    
     # vars
-    merge_seg = deepcopy(seg)
+    labels = regions.labels
+    adjacency = regions.get_adjacency(radius=2)
+    union_find = UnionFind(len(labels))
     relabeling: dict[int, int] = {}
     delta_e_dict: dict[str, float] = {} # for debugger
+    lab_cache: dict[int, np.ndarray] = {}
     
-    labels = np.unique(merge_seg)
-    for label in labels:
+    def get_lab(idx: int) -> np.ndarray:
+        if idx not in lab_cache:
+            color = regions.get_quantile_color(idx, qL=0.5, qR=0.9)
+            lab_cache[idx] = rgb2lab(color/255.0)
+        return lab_cache[idx]
+    
+    for idx, label in enumerate(labels):
         if label == 0: continue # skip background
-        mask = (merge_seg == label)
-        if np.sum(mask) > 0: # merge 後會跳號， mask 可能會沒東西
-            # color = get_average_rgb(mask, rgb_img, avg_ratio=0.5)[1] # get self color
-            color = get_average_rgb_v2(mask, rgb_img, qL=0.5, qR=0.9)[1] # get self color
-            mask_dila = dila(mask, iterations=2) # find neighbor
-            nlabels = np.unique(merge_seg[mask_dila]) # self + neighbor's labels
-            for nlabel in nlabels:
+        if union_find.find(idx) == idx:
+            for nidx in adjacency[idx]:
+                nlabel = labels[nidx]
                 if nlabel == 0: continue # skip background
                 elif nlabel > label: # avoid repeated merging
-                    nmask = (merge_seg == nlabel)
-                    # ncolor = get_average_rgb(nmask, rgb_img, avg_ratio=0.5)[1] # neighbor's color
-                    ncolor = get_average_rgb_v2(nmask, rgb_img, qL=0.5, qR=0.9)[1] # neighbor's color
-                    delta_e = deltaE_ciede94(rgb2lab(color/255.0), rgb2lab(ncolor/255.0))
+                    if union_find.find(nidx) != nidx: continue # merged into a smaller label
+                    delta_e = deltaE_ciede94(get_lab(idx), get_lab(nidx))
                     delta_e_dict[f"{label}_cmp_{nlabel}"] = delta_e # for debugger
                     if delta_e <= merge:
-                        merge_seg[nmask] = label
+                        union_find.union(idx, nidx)
                         relabeling[nlabel] = label
         else:
             if debug_mode:
                 print(f"'{label}' has been merged before dealing with")
     
+    merge_seg = labels[union_find.get_roots()][regions.idx_img].astype(seg.dtype)
+    
     # check and return
     assert id(merge_seg) != id(seg)
     return merge_seg, relabeling
@@ -234,12 +278,78 @@ def draw_label_on_image(seg: np.ndarray, rgb_img: np.ndarray,
     # -------------------------------------------------------------------------/
 
 
-def single_slic_labeling(dst_dir:Path, img_path:Path,
-                         n_segments:int, dark:int, merge:int,
-                         debug_mode:bool=False):
+def get_relabeling(seg1: np.ndarray, seg2: np.ndarray) -> dict[int, int]:
+    """ `relabeling` of `merge_similar_rgb()` from its input (`seg1`) and output (`seg2`),
+        a label of `seg1` is merged as a whole, e.g. `{ merged_label: label }`
     """
+    labels, first_idxs = np.unique(seg1.ravel(), return_index=True)
+    new_labels = seg2.ravel()[first_idxs]
+    
+    return {int(label): int(new_label) for label, new_label
+                in zip(labels, new_labels) if label != new_label}
+    # -------------------------------------------------------------------------/
+
+
+def save_seg_renders(dst_dir:Path, img:np.ndarray,
+                     seg1:np.ndarray, seg2:np.ndarray, seg0:np.ndarray=None,
+                     relabeling:dict[int, int]=None, regions:SegRegions=None):
+    """ Save PNG renders of the segmentations ( `mark_boundaries()`, labels ),
+        `relabeling` is computed from `seg1`, `seg2` if not given.
     """
     img_name = dst_dir.name
+    
+    if seg0 is not None:
+        # Mark `seg0` on `img`
+        seg0_on_img = np.uint8(mark_boundaries(img, seg0, color=(0, 1, 1))*255)
+        save_path = dst_dir.joinpath(f"{img_name}.seg0.png")
+        ski.io.imsave(save_path, seg0_on_img)
+    
+    # Generate average 'RGB' of `img` and mark `seg1` labels on it
+    avg_rgb = average_rgb_coloring(seg1, img, regions=regions)
+    for k, v in {"o": img, "a": avg_rgb}.items():
+        seg1_on_img = np.uint8(mark_boundaries(v, seg1, color=(0, 1, 1))*255)
+        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}.png")
+        ski.io.imsave(save_path, seg1_on_img)
+        seg1_on_img = draw_label_on_image(seg1, seg1_on_img)
+        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}l.png")
+        ski.io.imsave(save_path, seg1_on_img)
+    
+    # Mark `seg2` labels and merged regions on `img` and `avg_rgb`
+    if relabeling is None:
+        relabeling = get_relabeling(seg1, seg2)
+    for k, v in {"o": img, "a": avg_rgb}.items():
+        seg2_on_img = np.uint8(mark_boundaries(v, seg2, color=(0, 1, 1))*255)
+        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}.png")
+        ski.io.imsave(save_path, seg2_on_img)
+        seg2_on_img = draw_label_on_image(seg1, seg2_on_img, relabeling=relabeling)
+        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}l.png")
+        ski.io.imsave(save_path, seg2_on_img)
+    # -------------------------------------------------------------------------/
+
+
+def render_seg_results(dst_dir:Path, img_path:Path):
+    """ On-demand render stage, reads the segmentations saved by
+        `single_slic_labeling()` / `single_cellpose_prediction()` with `render=False`
+        ( 'seg0.png' is only for SLIC )
+    """
+    # read image
+    img = ski.io.imread(img_path)
+    
+    # '.seg.npz' or legacy '.pkl'
+    seg0 = load_seg_result(dst_dir, "seg0")
+    seg1 = load_seg_result(dst_dir, "seg1")
+    seg2 = load_seg_result(dst_dir, "seg2")
+    
+    save_seg_renders(dst_dir, img, seg1, seg2, seg0=seg0)
+    # -------------------------------------------------------------------------/
+
+
+def single_slic_labeling(dst_dir:Path, img_path:Path,
+                         n_segments:int, dark:int, merge:int,
+                         debug_mode:bool=False, render:bool=True):
+    """ `render = False`: data only, save the segmentations ( `.seg.npz` ) without PNG renders,
+        renders can be created later by `render_seg_results()`
+    """
     # read image
     img = ski.io.imread(img_path)
 
@@ -258,62 +368,23 @@ def single_slic_labeling(dst_dir:Path, img_path:Path,
                 start_label=0)
         # parameters can refer to https://scikit-image.org/docs/stable/api/skimage.segmentation.html#skimage.segmentation.slic
 
-    """ Save 'SLIC' result (seg0, without any merge) """
-    # save segmentation as pkl file
-    save_path = dst_dir.joinpath(f"{img_name}.seg0.pkl")
-    save_segment_result(save_path, seg0)
-    # Mark `seg0` on `img`
-    seg0_on_img = np.uint8(mark_boundaries(img, seg0, color=(0, 1, 1))*255)
-    save_path = dst_dir.joinpath(f"{img_name}.seg0.png")
-    ski.io.imsave(save_path, seg0_on_img)
-
     """ Merge background (seg1) """
-    seg1 = deepcopy(seg0)
-    labels = np.unique(seg0)
-    new_label = np.max(labels) + 1 # new (re-index) label start
-    for label in labels:
-        mask = (seg1 == label)
-        if np.sum(mask) > 0: # SLIC 生成的 labels 會跳號， mask 可能會沒東西
-            color = get_average_rgb(mask, img, avg_ratio=1.0)[1]
-            color_dist = simple_col_dis(color, (0, 0, 0)) # compare with 'background'
-            if color_dist <= dark:
-                seg1[mask] = 0 # background on `seg1` is set to 0
-            else:
-                seg1[mask] = new_label # re-index
-                new_label +=1
-        else:
-            print(f"'{label}' is missing")
-
-    """ Save 'Merge background' result (seg1) """
-    # save segmentation as pkl file
-    save_path = dst_dir.joinpath(f"{img_name}.seg1.pkl")
-    save_segment_result(save_path, seg1)
-    # Generate average 'RGB' of `img` and mark `seg1` labels on it
-    avg_rgb = average_rgb_coloring(seg1, img)
-    for k, v in {"o": img, "a": avg_rgb}.items():
-        seg1_on_img = np.uint8(mark_boundaries(v, seg1, color=(0, 1, 1))*255)
-        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}.png")
-        ski.io.imsave(save_path, seg1_on_img)
-        seg1_on_img = draw_label_on_image(seg1, seg1_on_img)
-        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}l.png")
-        ski.io.imsave(save_path, seg1_on_img)
+    seg1 = merge_background(seg0, img, dark)
 
     """ Merge similar RGB (seg2) """
+    seg1_regions = SegRegions(seg1, img) # shared with `average_rgb_coloring()`
     seg2, relabeling = merge_similar_rgb(seg1, img,
-                                         merge=merge, debug_mode=debug_mode)
+                                         merge=merge, debug_mode=debug_mode,
+                                         regions=seg1_regions)
 
-    """ Save 'Merge similar RGB' result (seg2) """
-    # save segmentation as pkl file
-    save_path = dst_dir.joinpath(f"{img_name}.seg2.pkl")
-    save_segment_result(save_path, seg2)
-    # Mark `seg2` labels and merged regions on `img` and `avg_rgb`
-    for k, v in {"o": img, "a": avg_rgb}.items():
-        seg2_on_img = np.uint8(mark_boundaries(v, seg2, color=(0, 1, 1))*255)
-        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}.png")
-        ski.io.imsave(save_path, seg2_on_img)
-        seg2_on_img = draw_label_on_image(seg1, seg2_on_img, relabeling=relabeling)
-        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}l.png")
-        ski.io.imsave(save_path, seg2_on_img)
+    """ Save 'SLIC' (seg0), 'Merge background' (seg1), 'Merge similar RGB' (seg2) """
+    # seg0 -> seg1 -> seg2 relabel maps in one '.seg.npz' file
+    save_seg_labels(get_seg_file(dst_dir), seg1, seg2, seg0=seg0)
+    
+    """ Render """
+    if render:
+        save_seg_renders(dst_dir, img, seg1, seg2, seg0=seg0,
+                         relabeling=relabeling, regions=seg1_regions)
     
     return seg1, seg2
     # -------------------------------------------------------------------------/
@@ -321,49 +392,34 @@ def single_slic_labeling(dst_dir:Path, img_path:Path,
 
 def single_cellpose_prediction(dst_dir: Path, img_path: Path,
                                channels: int, cp_model, merge: int,
-                               debug_mode: bool=False):
+                               debug_mode: bool=False, render: bool=True):
     """ Function name TBD
     Place holder for running Cellpose prediction
+    
+    `render = False`: data only, see `single_slic_labeling()`
     """
     from cellpose import io as cpio
     
-    img_name = dst_dir.name
     # read image
     img = cpio.imread(img_path)
     
     # predict segments
     seg1, flow, style = cp_model.eval(img, channels=channels)
     
-    """ Save 'Merge background' result (seg1) """
-    # save segmentation as pkl file
-    save_path = dst_dir.joinpath(f"{img_name}.seg1.pkl")
-    save_segment_result(save_path, seg1)
-    # Generate average 'RGB' of `img` and mark `seg1` labels on it
-    avg_rgb = average_rgb_coloring(seg1, img)
-    for k, v in {"o": img, "a": avg_rgb}.items():
-        seg1_on_img = np.uint8(mark_boundaries(v, seg1, color=(0, 1, 1))*255)
-        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}.png")
-        ski.io.imsave(save_path, seg1_on_img)
-        seg1_on_img = draw_label_on_image(seg1, seg1_on_img)
-        save_path = dst_dir.joinpath(f"{img_name}.seg1{k}l.png")
-        ski.io.imsave(save_path, seg1_on_img)
-
     """ Merge similar RGB (seg2) """
+    seg1_regions = SegRegions(seg1, img) # shared with `average_rgb_coloring()`
     seg2, relabeling = merge_similar_rgb(seg1, img,
-                                         merge=merge, debug_mode=debug_mode)
+                                         merge=merge, debug_mode=debug_mode,
+                                         regions=seg1_regions)
 
-    """ Save 'Merge similar RGB' result (seg2) """
-    # save segmentation as pkl file
-    save_path = dst_dir.joinpath(f"{img_name}.seg2.pkl")
-    save_segment_result(save_path, seg2)
-    # Mark `seg2` labels and merged regions on `img` and `avg_rgb`
-    for k, v in {"o": img, "a": avg_rgb}.items():
-        seg2_on_img = np.uint8(mark_boundaries(v, seg2, color=(0, 1, 1))*255)
-        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}.png")
-        ski.io.imsave(save_path, seg2_on_img)
-        seg2_on_img = draw_label_on_image(seg1, seg2_on_img, relabeling=relabeling)
-        save_path = dst_dir.joinpath(f"{img_name}.seg2{k}l.png")
-        ski.io.imsave(save_path, seg2_on_img)
+    """ Save 'Merge background' (seg1), 'Merge similar RGB' (seg2) """
+    # seg1 -> seg2 relabel map in one '.seg.npz' file
+    save_seg_labels(get_seg_file(dst_dir), seg1, seg2)
+    
+    """ Render """
+    if render:
+        save_seg_renders(dst_dir, img, seg1, seg2,
+                         relabeling=relabeling, regions=seg1_regions)
     
     return seg1, seg2
     # -------------------------------------------------------------------------/
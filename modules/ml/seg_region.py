@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+import numpy as np
+# -----------------------------------------------------------------------------/
+
+
+class SegRegions():
+
+    def __init__(self, seg: np.ndarray, rgb_img: np.ndarray):
+        """ Per-label pixels of a segmentation, computed once by one sort,
+            a region never scans the whole image again.
+        
+        Args:
+            seg (np.ndarray): label image, shape = (H, W)
+            rgb_img (np.ndarray): `uint8` image, shape = (H, W, 3)
+        """
+        assert rgb_img.dtype == np.uint8, "rgb_img.dtype != np.uint8"
+        assert seg.shape == rgb_img.shape[:2], "seg.shape != rgb_img.shape[:2]"
+        
+        # `self.labels[idx]` is the label of the compact index `idx`
+        self.labels, idxs, counts = \
+            np.unique(seg.ravel(), return_inverse=True, return_counts=True)
+        self.idx_img: np.ndarray = idxs.reshape(seg.shape)
+        self.counts: np.ndarray = counts
+        
+        # pixels of `idx` are `self._order[self._bounds[idx]:self._bounds[idx+1]]`
+        self._order: np.ndarray = np.argsort(idxs, kind="stable")
+        self._bounds: np.ndarray = np.concatenate(([0], np.cumsum(counts)))
+        self._rgb_pixels: np.ndarray = rgb_img.reshape(-1, 3)
+        
+        self._color_cache: dict[tuple, np.ndarray] = {}
+        # ---------------------------------------------------------------------/
+
+
+    def get_pixels(self, idx: int) -> np.ndarray:
+        """ RGB pixels of region `idx`, shape = (count, 3)
+        """
+        flat_idxs = self._order[self._bounds[idx]:self._bounds[idx+1]]
+        
+        return self._rgb_pixels[flat_idxs]
+        # ---------------------------------------------------------------------/
+
+
+    def get_quantile_color(self, idx: int, qL: float, qR: float) -> np.ndarray:
+        """ Same as `get_average_rgb_v2(mask, rgb_img, qL, qR)[1]`
+            of region `idx`, cached.
+        """
+        key = (idx, qL, qR)
+        if key not in self._color_cache:
+            pixels = self.get_pixels(idx)
+            color = np.empty(3, dtype=np.float64)
+            for ch in range(3):
+                # sums of `uint8` are exact, the order of pixels doesn't matter
+                ch_pixels = pixels[:, ch]
+                val_qL = np.quantile(ch_pixels, qL)
+                val_qR = np.quantile(ch_pixels, qR)
+                color[ch] = np.average(ch_pixels[(ch_pixels >= val_qL) &
+                                                 (ch_pixels <= val_qR)])
+            self._color_cache[key] = color
+        
+        return self._color_cache[key]
+        # ---------------------------------------------------------------------/
+
+
+    def get_adjacency(self, radius: int) -> list[np.ndarray]:
+        """ Region adjacency graph, two regions are neighbors if their pixels are
+            within `radius` steps of 4-connectivity ( city block distance ),
+            i.e. the same as `binary_dilation(mask, iterations=radius)`.
+        
+        Returns:
+            list[np.ndarray]: `adjacency[idx]`, sorted neighbor indices of `idx`
+        """
+        num = len(self.labels)
+        h, w = self.idx_img.shape
+        
+        # half of the offsets, the graph is symmetric
+        pairs: list[np.ndarray] = []
+        for dy in range(0, radius+1):
+            for dx in range(-(radius-dy), radius-dy+1):
+                if (dy == 0) and (dx <= 0): continue
+                if (dy >= h) or (abs(dx) >= w): continue
+                src = self.idx_img[:h-dy, max(0, -dx):w-max(0, dx)]
+                dst = self.idx_img[dy:, max(0, dx):w-max(0, -dx)]
+                diff = (src != dst)
+                pairs.append(np.int64(src[diff])*num + dst[diff])
+        
+        # unique undirected edges -> `adjacency`
+        edges = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, np.int64)
+        a, b = np.divmod(edges, num)
+        a, b = np.concatenate((a, b)), np.concatenate((b, a))
+        sort_idxs = np.lexsort((b, a))
+        a, b = a[sort_idxs], b[sort_idxs]
+        bounds = np.searchsorted(a, np.arange(num+1))
+        
+        return [b[bounds[idx]:bounds[idx+1]] for idx in range(num)]
+        # ---------------------------------------------------------------------/
+
+
+    def get_color_lut(self, qL: float, qR: float, background: int=0) -> np.ndarray:
+        """ `uint8` colors of all regions ( `background` is black ),
+            `lut[self.idx_img]` is the colored image.
+        """
+        lut = np.zeros((len(self.labels), 3), dtype=np.uint8)
+        for idx, label in enumerate(self.labels):
+            if label == background: continue
+            lut[idx] = np.uint8(self.get_quantile_color(idx, qL, qR))
+        
+        return lut
+        # ---------------------------------------------------------------------/
+
+
+
+class UnionFind():
+
+    def __init__(self, num: int):
+        """ Disjoint sets of `0 ~ num-1`, the root of a set is its smallest item
+        """
+        self.parent: np.ndarray = np.arange(num)
+        # ---------------------------------------------------------------------/
+
+
+    def find(self, idx: int) -> int:
+        """
+        """
+        root = idx
+        while self.parent[root] != root:
+            root = self.parent[root]
+        
+        # path compression
+        while self.parent[idx] != root:
+            self.parent[idx], idx = root, self.parent[idx]
+        
+        return int(root)
+        # ---------------------------------------------------------------------/
+
+
+    def union(self, idx1: int, idx2: int) -> int:
+        """ Returns the root of the merged set
+        """
+        root1, root2 = self.find(idx1), self.find(idx2)
+        root = min(root1, root2)
+        self.parent[max(root1, root2)] = root
+        
+        return root
+        # ---------------------------------------------------------------------/
+
+
+    def get_roots(self) -> np.ndarray:
+        """ `roots[idx]` is the root of `idx`
+        """
+        return np.array([self.find(idx) for idx in range(len(self.parent))],
+                        dtype=self.parent.dtype)
+        # ---------------------------------------------------------------------/
\ No newline at end of file
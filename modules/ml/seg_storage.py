@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+import pickle
+import zipfile
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+# -----------------------------------------------------------------------------/
+
+
+SEG_LEVELS = ("seg0", "seg1", "seg2")
+_SEG_FILE_VERSION = 1
+# -----------------------------------------------------------------------------/
+
+
+def get_seg_file(seg_dir: Path) -> Path:
+    """ Compact segmentation file of `seg_dir`, e.g. '{seg_dirname}.seg.npz'
+    """
+    return seg_dir.joinpath(f"{seg_dir.name}.seg.npz")
+    # -------------------------------------------------------------------------/
+
+
+def save_seg_labels(save_path: Path, seg1: np.ndarray, seg2: np.ndarray,
+                    seg0: np.ndarray=None, compress: bool=True):
+    """ Save seg0 ( SLIC only ) -> seg1 -> seg2 in one file.
+        
+        - `base_idx`: label index image of the first level, with the smallest `uint` dtype
+        - `{level}_labels`: label of each index ( relabel maps, original dtype ),
+            `seg = {level}_labels[base_idx]`
+        - `compress = False`: `base_idx` can be read with `mmap` ( see `SegLabelFile` )
+    
+    Args:
+        save_path (Path): '.npz' file, see `get_seg_file()`
+        seg1 (np.ndarray): merge background
+        seg2 (np.ndarray): merge similar RGB
+        seg0 (np.ndarray, optional): SLIC, without any merge. Defaults to None.
+        compress (bool, optional): zip deflate. Defaults to True.
+    """
+    segs = {"seg0": seg0, "seg1": seg1, "seg2": seg2}
+    segs = {level: seg for level, seg in segs.items() if seg is not None}
+    base = next(iter(segs.values()))
+    
+    labels, first_idxs, base_idx = \
+        np.unique(base.ravel(), return_index=True, return_inverse=True)
+    base_idx = base_idx.astype(np.min_scalar_type(max(len(labels)-1, 0)))
+    
+    arrays = {"version": np.array(_SEG_FILE_VERSION),
+              "base_idx": base_idx.reshape(base.shape)}
+    for level, seg in segs.items():
+        if seg.shape != base.shape:
+            raise ValueError(f"shape of `{level}` {seg.shape} != {base.shape}\n")
+        level_labels = seg.ravel()[first_idxs]
+        # a label of the first level should be merged as a whole
+        if not np.array_equal(level_labels[base_idx], seg.ravel()):
+            raise ValueError(f"`{level}` is not a merge of the first level, "
+                             f"can't be stored as a relabel map\n")
+        arrays[f"{level}_labels"] = level_labels
+    
+    with open(save_path, mode="wb") as f_writer:
+        if compress:
+            np.savez_compressed(f_writer, **arrays)
+        else:
+            np.savez(f_writer, **arrays)
+    # -------------------------------------------------------------------------/
+
+
+def _memmap_npz_member(path: Path, member: str) -> Union[np.memmap, None]:
+    """ `np.memmap` of an uncompressed member of a '.npz' file,
+        `None` if the member is compressed
+    """
+    with zipfile.ZipFile(path) as zip_file:
+        info = zip_file.getinfo(f"{member}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    
+    with open(path, mode="rb") as f_reader:
+        # local file header: 30 bytes + file name + extra field
+        f_reader.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f_reader.read(4), dtype="<u2")
+        f_reader.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+        # '.npy' header
+        version = np.lib.format.read_magic(f_reader)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f_reader)
+        else:
+            header = np.lib.format.read_array_header_2_0(f_reader)
+        shape, fortran_order, dtype = header
+        offset = f_reader.tell()
+    
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+    # -------------------------------------------------------------------------/
+
+
+
+class SegLabelFile():
+
+    def __init__(self, path: Path, mmap: bool=False):
+        """ Reader of `save_seg_labels()`
+        
+        Args:
+            path (Path): '.npz' file
+            mmap (bool, optional): memory-map `base_idx` if the file is not compressed,
+                e.g. `get("seg2", (slice(0, 256), slice(0, 256)))`
+                only reads a part of the file. Defaults to False.
+        """
+        self.path: Path = Path(path)
+        
+        with np.load(self.path, allow_pickle=False) as npz:
+            self.labels: dict[str, np.ndarray] = \
+                {level: npz[f"{level}_labels"] for level in SEG_LEVELS
+                    if f"{level}_labels" in npz.files} # all tiny
+            
+            self.base_idx: np.ndarray = None
+            if mmap:
+                self.base_idx = _memmap_npz_member(self.path, "base_idx")
+            if self.base_idx is None:
+                self.base_idx = npz["base_idx"]
+        # ---------------------------------------------------------------------/
+
+
+    @property
+    def levels(self) -> list[str]:
+        """
+        """
+        return list(self.labels)
+        # ---------------------------------------------------------------------/
+
+
+    def get(self, level: str, key=...) -> np.ndarray:
+        """ Label image of `level`, `key` selects a part of the image ( e.g. slices )
+        """
+        if level not in self.labels:
+            raise KeyError(f"'{level}' is not in '{self.path}', "
+                           f"accept {self.levels}")
+        
+        return self.labels[level][self.base_idx[key]]
+        # ---------------------------------------------------------------------/
+
+
+
+def has_seg_result(seg_dir: Path) -> bool:
+    """ '.seg.npz' or legacy '.seg2.pkl'
+    """
+    return get_seg_file(seg_dir).exists() or \
+            seg_dir.joinpath(f"{seg_dir.name}.seg2.pkl").exists()
+    # -------------------------------------------------------------------------/
+
+
+def load_seg_result(seg_dir: Path, level: str,
+                    mmap: bool=False) -> Union[np.ndarray, None]:
+    """ Read `level` ( 'seg0', 'seg1', 'seg2' ) of `seg_dir` from '.seg.npz',
+        or the legacy pickled array '{seg_dirname}.{level}.pkl'.
+        `None` if `level` doesn't exist ( e.g. 'seg0' of Cellpose ).
+    """
+    if level not in SEG_LEVELS:
+        raise ValueError(f"level: '{level}', accept {SEG_LEVELS} only\n")
+    
+    seg_file = get_seg_file(seg_dir)
+    if seg_file.exists():
+        seg_labels = SegLabelFile(seg_file, mmap=mmap)
+        return seg_labels.get(level) if level in seg_labels.levels else None
+    
+    pkl_file = seg_dir.joinpath(f"{seg_dir.name}.{level}.pkl")
+    if pkl_file.exists():
+        with open(pkl_file, mode="rb") as f_reader:
+            return pickle.load(f_reader)
+    
+    return None
+    # -------------------------------------------------------------------------/
\ No newline at end of file
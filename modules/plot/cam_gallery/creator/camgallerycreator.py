@@ -3,10 +3,9 @@ import os
 import re
 import shutil
 import sys
-from collections import Counter, OrderedDict
-from copy import deepcopy
+from collections import Counter
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, Optional, Tuple, Union
 
 import cv2
 import numpy as np
@@ -20,13 +19,15 @@ from tqdm.auto import tqdm
 
 from ....data.dataset.dsname import get_dsname_sortinfo
 from ....data.dataset.utils import parse_dataset_file_name
+from ....dl.cam.camarray import CAM_ARRAY_FILE, CamArrayReader
 from ....dl.tester.utils import get_history_dir
 from ....dl.utils import gen_class2num_dict
 from ....shared.baseobject import BaseObject
 from ....shared.config import load_config
-from ....shared.utils import create_new_dir
+from ....shared.utils import create_new_dir, get_peak_rss_mb
 from ...utils import (draw_drop_info_on_image, draw_predict_ans_on_image,
                       draw_x_on_image, get_font, plot_with_imglist_auto_row)
+from .fishimageview import FishImageView
 from .utils import get_gallery_column
 
 install()
@@ -71,6 +72,9 @@ class CamGalleryCreator(BaseObject):
         
         self._set_cam_gallery_dir()
         # self._set_rank_dict()
+        
+        # float buffers of `_draw_on_cam_image()`, reused by all crops
+        self._overlay_buffers: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = {}
         # ---------------------------------------------------------------------/
 
 
@@ -83,6 +87,7 @@ class CamGalleryCreator(BaseObject):
         
         """ [layout] """
         self.column: int = self.config["layout"]["column"]
+        self.compositor: str = self.config["layout"]["compositor"]
         
         """ [draw.drop_image.line] """
         self.line_color: list = self.config["draw"]["drop_image"]["line"]["color"]
@@ -157,6 +162,7 @@ class CamGalleryCreator(BaseObject):
         if not self.column:
             self.column = get_gallery_column(self.dataset_base_size,
                                                 self.dataset_file_name)
+        if not self.compositor: self.compositor = "matplotlib"
         
         """ [draw.drop_image.line] """
         if not self.line_color: self.line_color = (180, 160, 0)
@@ -326,6 +332,7 @@ class CamGalleryCreator(BaseObject):
         self._progressbar.close()
         # self._del_empty_rank_dirs()
         self._cli_out.new_line()
+        self._cli_out.write(f"※　: Peak RSS: {get_peak_rss_mb()} MB")
         # ---------------------------------------------------------------------/
 
 
@@ -344,9 +351,14 @@ class CamGalleryCreator(BaseObject):
         self.com_gt: str = ""
         self.com_pred: str = ""
         
-        self.tested_img_dict: dict[str, np.ndarray] = {}
+        # images are loaded on access ( read-only )
+        self.tested_view: Optional[FishImageView] = None
+        self.untest_view: Optional[FishImageView] = None
+        self.cam_result_view: Optional[FishImageView] = None
+        self.cam_array: Optional[CamArrayReader] = None
+        
+        # 'untest' images with drawing, shared by both galleries
         self.untest_img_dict: dict[str, np.ndarray] = {}
-        self.cam_result_img_dict: dict[str, np.ndarray] = {}
         
         self.correct_cnt: int = 0
         self.accuracy: float = 0.0
@@ -361,33 +373,35 @@ class CamGalleryCreator(BaseObject):
         self.com_gt = self._get_com_cls(fish_dsname, "gt")
         self.com_pred = self._get_com_cls(fish_dsname, "pred")
         
+        # CAM results saved with (config) `cam.storage` = 'array'
+        cam_array_path = self.cam_result_root.joinpath(fish_dsname, CAM_ARRAY_FILE)
+        if cam_array_path.exists():
+            self.cam_array = CamArrayReader(cam_array_path)
+        
         tested_paths, \
             untest_paths, \
                 cam_result_paths = self._get_path_lists(fish_dsname)
         
-        self._read_images_as_dict(tested_paths, # --> self.tested_img_dict
-                                  untest_paths,  # --> self.untest_img_dict
-                                  cam_result_paths)  # --> self.cam_result_img_dict
+        self._set_image_views(tested_paths, # --> self.tested_view
+                              untest_paths,  # --> self.untest_view
+                              cam_result_paths)  # --> self.cam_result_view
         
         # >>> draw on 'untest' images <<<
-        for untest_name, untest_img in self.untest_img_dict.items():
-            self._draw_on_drop_image(untest_name, untest_img)
-        
-        # >>> draw on `cam` images <<<
-        for (cam_name, cam_img), (tested_name, tested_img) \
-            in zip(self.cam_result_img_dict.items(), self.tested_img_dict.items()):
-                self._draw_on_cam_image(cam_name, cam_img,
-                                        tested_name, tested_img)
+        for untest_name, untest_img in self.untest_view.items():
+            self.untest_img_dict[untest_name] = \
+                self._draw_on_drop_image(untest_name, untest_img)
         
         # >>> preparing information which adds to the gallery <<<
-        self.accuracy = self.correct_cnt / len(self.cam_result_img_dict)
+        self.correct_cnt = self._count_correct_crops()
+        self.accuracy = self.correct_cnt / len(self.tested_view)
         self.content = self._gen_detail_info_content(fish_dsname)
         
-        # >>> orig: `tested_img_dict` + `untest_img_dict` <<<
+        # >>> orig: `tested_view` + `untest_img_dict` <<<
         self._gen_orig_gallery(fish_dsname)
         
-        # >>> overlay: `cam_result_img_dict` + `untest_img_dict` <<<
+        # >>> overlay: ( `cam_result_view` on `tested_view` ) + `untest_img_dict` <<<
         self._gen_overlay_gallery(fish_dsname)
+        if self.cam_array is not None: self.cam_array.close()
         
         # >>> update pbar <<<
         self._progressbar.update(1)
@@ -428,8 +442,14 @@ class CamGalleryCreator(BaseObject):
         """   
         # >>> cam result (tested) <<<
         
-        cam_result_paths: list[Path] = []
-        if self.replace_cam_color:
+        cam_result_paths: list[Union[Path, str]] = []
+        if self.cam_array is not None:
+            # names in `CAM_ARRAY_FILE` are the same as stems of grayscale maps
+            cam_result_paths = sorted([name if self.replace_cam_color else \
+                                            name.replace("graymap", "colormap")
+                                            for name in self.cam_array.names],
+                                      key=get_dsname_sortinfo)
+        elif self.replace_cam_color:
             cam_result_paths = sorted(self.cam_result_root.glob(f"{fish_dsname}/grayscale_map/*.tiff"),
                                           key=get_dsname_sortinfo)
         else:
@@ -447,10 +467,11 @@ class CamGalleryCreator(BaseObject):
         
         # >>> Seperate 'tested' / 'untest' (without CAM) <<<
         
-        # tested (predict)
+        # tested (predict), CAM may be generated for a subset ( config `cam.subset` of fish tester )
         tested_paths: list[Path] = []
-        for crop_sn in cam_dict.keys():
-            tested_paths.append(tmp_dict.pop(crop_sn))
+        for crop_sn in list(tmp_dict.keys()):
+            if (crop_sn in cam_dict) or (tmp_dict[crop_sn].stem in self.predict_ans_dict):
+                tested_paths.append(tmp_dict.pop(crop_sn))
         
         # untest (not predict)
         untest_paths: list[Path] = list(tmp_dict.values())
@@ -460,37 +481,47 @@ class CamGalleryCreator(BaseObject):
         # ---------------------------------------------------------------------/
 
 
-    def _read_images_as_dict(self, tested_paths:list,
-                                   untest_paths:list,
-                                   cam_result_paths:list):
+    def _set_image_views(self, tested_paths:list,
+                               untest_paths:list,
+                               cam_result_paths:list):
+        """ Images are read ( `ski.io.imread()` ) only when they are drawn,
+            instead of reading all images of a fish up front.
         """
-        """
-        # self.tested_img_dict: dict[str, np.ndarray] = \
-        #     { os.path.split(os.path.splitext(path)[0])[-1]: \
-        #         cv2.imread(str(path)) for path in tested_paths }
-        self.tested_img_dict: dict[str, np.ndarray] = \
-            { path.stem: ski.io.imread(path) for path in tested_paths }
-        
-        # self.untest_img_dict: dict[str, np.ndarray] = \
-        #     { os.path.split(os.path.splitext(path)[0])[-1]: \
-        #         cv2.imread(str(path)) for path in untest_paths }
-        self.untest_img_dict: dict[str, np.ndarray] = \
-            { path.stem: ski.io.imread(path) for path in untest_paths }
+        self.tested_view = FishImageView({ path.stem: path for path in tested_paths },
+                                         ski.io.imread)
         
-        # self.cam_result_img_dict: dict[str, np.ndarray] = \
-        #     { os.path.split(os.path.splitext(path)[0])[-1]: \
-        #         cv2.imread(str(path)) for path in cam_result_paths }
-        self.cam_result_img_dict: dict[str, np.ndarray] = \
-            { path.stem: ski.io.imread(path) for path in cam_result_paths }
+        self.untest_view = FishImageView({ path.stem: path for path in untest_paths },
+                                         ski.io.imread)
         
+        if self.cam_array is None:
+            self.cam_result_view = \
+                FishImageView({ path.stem: path for path in cam_result_paths },
+                              ski.io.imread)
+        else:
+            self.cam_result_view = \
+                FishImageView({ name: name for name in cam_result_paths },
+                              self._read_cam_array)
         
-        assert len(self.tested_img_dict) == len(self.cam_result_img_dict), \
-            "len(self.tested_img_dict) != len(self.cam_result_img_dict)"
+        assert len(self.tested_view) >= len(self.cam_result_view), \
+            "len(self.tested_view) < len(self.cam_result_view)"
         # ---------------------------------------------------------------------/
 
 
-    def _draw_on_drop_image(self, untest_name:str, untest_img:np.ndarray):
+    def _read_cam_array(self, cam_name:str) -> np.ndarray:
+        """ Read a CAM from `self.cam_array`, same as reading its '.tiff' file
+            ( the color map is applied on demand )
         """
+        gray_name = cam_name.replace("colormap", "graymap")
+        
+        if self.replace_cam_color:
+            return self.cam_array.read_grayscale(gray_name)
+        else:
+            return self.cam_array.read_colormap(gray_name) # RGB
+        # ---------------------------------------------------------------------/
+
+
+    def _draw_on_drop_image(self, untest_name:str, untest_img:np.ndarray) -> np.ndarray:
+        """ Return a new image, `untest_img` is not modified
         """
         assert untest_img.dtype == np.uint8, "untest_img.dtype != np.uint8"
         
@@ -498,9 +529,7 @@ class CamGalleryCreator(BaseObject):
         draw_x_on_image(rgb_img, self.line_color, self.line_width)
         self._add_dark_ratio_on_image(untest_name, rgb_img)
         
-        # >>> replace image <<<
-        assert id(untest_img) != id(rgb_img)
-        self.untest_img_dict[untest_name] = np.array(rgb_img)
+        return np.array(rgb_img)
         # ---------------------------------------------------------------------/
 
 
@@ -516,39 +545,58 @@ class CamGalleryCreator(BaseObject):
         # ---------------------------------------------------------------------/
 
 
-    def _draw_on_cam_image(self, cam_name:str, cam_img:np.ndarray,
-                                 tested_name:str, tested_img:np.ndarray):
+    def _get_overlay_buffers(self, shape:tuple) -> Tuple[np.ndarray, np.ndarray]:
+        """ Two `np.float64` buffers of `shape`, created once per image shape
         """
+        if shape not in self._overlay_buffers:
+            self._overlay_buffers[shape] = (np.empty(shape, dtype=np.float64),
+                                            np.empty(shape, dtype=np.float64))
+        
+        return self._overlay_buffers[shape]
+        # ---------------------------------------------------------------------/
+
+
+    def _draw_on_cam_image(self, cam_name:str, cam_img:Optional[np.ndarray],
+                                 tested_name:str, tested_img:np.ndarray) -> np.ndarray:
+        """ If `cam_img` is `None` ( tested crop without CAM ),
+            draw the predicted result on `tested_img` only.
+            
+            Return a new `np.uint8` image, the float steps are computed
+            in reused buffers ( same operations, same result ).
         """
         assert get_dsname_sortinfo(cam_name) == get_dsname_sortinfo(tested_name)
-        assert cam_img.dtype == np.uint8, "cam_img.dtype != np.uint8"
+        assert (cam_img is None) or (cam_img.dtype == np.uint8), "cam_img.dtype != np.uint8"
         assert tested_img.dtype == np.uint8, "tested_img.dtype != np.uint8"
         
-        # preparing `cam_rgb_img` (np.float64)
-        if self.replace_cam_color:
+        cam_overlay, tested_rgb_img = self._get_overlay_buffers(tested_img.shape)
+        
+        # preparing `cam_rgb_img` (np.float64), in `cam_overlay`
+        if cam_img is None:
+            np.divide(tested_img, 255.0, out=cam_overlay)
+        elif self.replace_cam_color:
             cam_bgr_img = cv2.applyColorMap(cam_img, self.replaced_colormap) # BGR
-            cam_rgb_img = cv2.cvtColor(cam_bgr_img, cv2.COLOR_BGR2RGB)/255.0
+            np.divide(cv2.cvtColor(cam_bgr_img, cv2.COLOR_BGR2RGB), 255.0, out=cam_overlay)
         else:
-            cam_rgb_img = cam_img/255.0
+            np.divide(cam_img, 255.0, out=cam_overlay)
         
         # preparing `tested_rgb_img` (np.float64)
-        tested_rgb_img = tested_img/255.0
+        np.divide(tested_img, 255.0, out=tested_rgb_img)
         
         # overlay `cam_img` on `tested_img`
-        cam_overlay = (cam_rgb_img*self.cam_weight + 
-                       tested_rgb_img*(1 - self.cam_weight))
+        np.multiply(cam_overlay, self.cam_weight, out=cam_overlay)
+        np.multiply(tested_rgb_img, (1 - self.cam_weight), out=tested_rgb_img)
+        np.add(cam_overlay, tested_rgb_img, out=cam_overlay)
         
         # get 'sub-crop' predicted results for `draw_predict_ans_on_image`
         gt_cls = self.predict_ans_dict[tested_name]['gt']
         pred_cls = self.predict_ans_dict[tested_name]['pred']
         
         if pred_cls != gt_cls:
-            # create a red mask
-            mask = np.zeros_like(cam_overlay, dtype=np.float64) # black mask
-            mask[:, :, 0] = 1.0 # modify to `red` mask
-            # fusion with red mask
-            mask_overlay = cam_overlay*0.7 + mask*0.3
-            mask_overlay = np.uint8(mask_overlay*255)
+            # fusion with red mask ( R: 1.0, G: 0.0, B: 0.0 ) : overlay*0.7 + mask*0.3
+            np.multiply(cam_overlay, 0.7, out=cam_overlay)
+            cam_overlay[:, :, 0] += 0.3
+            np.multiply(cam_overlay, 255, out=cam_overlay)
+            mask_overlay = cam_overlay.astype(np.uint8)
             # draw text
             rgb_img = Image.fromarray(mask_overlay) # convert to pillow image before drawing
             draw_predict_ans_on_image(rgb_img, pred_cls, gt_cls,
@@ -556,30 +604,40 @@ class CamGalleryCreator(BaseObject):
                                       self.text_correct_color,
                                       self.text_incorrect_color,
                                       self.text_shadow_color)
-            cam_overlay = np.array(rgb_img)
+            overlay_img = np.array(rgb_img)
         else:
-            self.correct_cnt += 1
-            cam_overlay = np.uint8(cam_overlay*255)
+            np.multiply(cam_overlay, 255, out=cam_overlay)
+            overlay_img = cam_overlay.astype(np.uint8)
             # for `add_bg_class` flag
             if self.com_gt != gt_cls:
-                rgb_img = Image.fromarray(cam_overlay) # convert to pillow image before drawing
+                rgb_img = Image.fromarray(overlay_img) # convert to pillow image before drawing
                 draw_predict_ans_on_image(rgb_img, pred_cls, gt_cls,
                                           self.text_font_style, self.text_font_size,
                                           self.text_correct_color,
                                           self.text_incorrect_color,
                                           self.text_shadow_color)
-                cam_overlay = np.array(rgb_img)
+                overlay_img = np.array(rgb_img)
         
-        # >>> replace image <<<
-        assert id(cam_img) != id(cam_overlay)
-        self.cam_result_img_dict[cam_name] = cam_overlay
+        return overlay_img
+        # ---------------------------------------------------------------------/
+
+
+    def _count_correct_crops(self) -> int:
+        """ Number of tested crops predicted as their ground truth
+        """
+        correct_cnt: int = 0
+        for tested_name in self.tested_view:
+            ans = self.predict_ans_dict[tested_name]
+            if ans["pred"] == ans["gt"]: correct_cnt += 1
+        
+        return correct_cnt
         # ---------------------------------------------------------------------/
 
 
     def _calculate_correct_rank(self): # deprecated
         """ (deprecated)
         """
-        self.matching_ratio_percent = int((self.correct_cnt / len(self.cam_result_img_dict))*100)
+        self.matching_ratio_percent = int((self.correct_cnt / len(self.tested_view))*100)
         for key, value in self.rank_dict.items():
             if self.matching_ratio_percent >= key: self.cls_matching_state = value
         # ---------------------------------------------------------------------/
@@ -602,7 +660,7 @@ class CamGalleryCreator(BaseObject):
         
         # accuracy
         content.extend(["➣ ", "accuracy     : "])
-        content.extend([f"{self.correct_cnt}/{len(self.cam_result_img_dict)} "])
+        content.extend([f"{self.correct_cnt}/{len(self.tested_view)} "])
         content.extend([f"({self.accuracy:.5f})", "\n"*1])
         
         # avg. predicted probability
@@ -649,8 +707,8 @@ class CamGalleryCreator(BaseObject):
                 pass
         
         for k, probs in avg_pred_prob.items():
-            assert len(probs) == len(self.cam_result_img_dict), \
-                "len(probs) != len(self.cam_result_img_dict)"
+            assert len(probs) == len(self.tested_view), \
+                "len(probs) != len(self.tested_view)"
             avg_pred_prob[k] = round(np.average(probs), 5)
         
         return avg_pred_prob
@@ -660,21 +718,22 @@ class CamGalleryCreator(BaseObject):
     def _gen_orig_gallery(self, fish_dsname:str):
         """
         """
-        img_dict: dict = deepcopy(self.tested_img_dict)
-        img_dict.update(self.untest_img_dict)
-        sorted_img_dict = OrderedDict(sorted(list(img_dict.items()), key=lambda x: get_dsname_sortinfo(x[0])))
+        crop_names = sorted([*self.tested_view, *self.untest_img_dict],
+                            key=get_dsname_sortinfo)
         
-        # add `dark_ratio` on images
-        for crop_name, img in sorted_img_dict.items():
-            rgb_img = Image.fromarray(img)
+        # add `dark_ratio` on images ( 'tested' images are loaded one by one )
+        img_list: list[np.ndarray] = []
+        for crop_name in crop_names:
+            if crop_name in self.untest_img_dict:
+                rgb_img = Image.fromarray(self.untest_img_dict[crop_name])
+            else:
+                rgb_img = Image.fromarray(self.tested_view[crop_name])
             self._add_dark_ratio_on_image(crop_name, rgb_img)
-            sorted_img_dict[crop_name] = np.array(rgb_img)
+            img_list.append(np.array(rgb_img))
 
         # >>> plot with 'Auto Row Calculation' <<<
         
-        img_list = [ img for _, img in sorted_img_dict.items() ]
-        
-        subtitle_list = [ " " for _ in sorted_img_dict.keys() ]
+        subtitle_list = [ " " for _ in crop_names ]
         
         rel_path = f"{self.com_gt}/{self.accuracy:0.5f}_{fish_dsname}_orig.png"
         save_path = self.cam_gallery_dir.joinpath(rel_path)
@@ -688,7 +747,8 @@ class CamGalleryCreator(BaseObject):
             "subtitle_list" : subtitle_list,
             "save_path"     : save_path,
             "use_rgb"       : True,
-            "show_fig"      : False
+            "show_fig"      : False,
+            "compositor"    : self.compositor
         }
         plot_with_imglist_auto_row(**kwargs_plot_with_imglist_auto_row)
         # ---------------------------------------------------------------------/
@@ -697,16 +757,28 @@ class CamGalleryCreator(BaseObject):
     def _gen_overlay_gallery(self, fish_dsname:str):
         """
         """
-        img_dict: dict = deepcopy(self.cam_result_img_dict)
-        img_dict.update(self.untest_img_dict)
-        sorted_img_dict = OrderedDict(sorted(list(img_dict.items()), key=lambda x: get_dsname_sortinfo(x[0])))
+        # >>> draw on `cam` images ( loaded one by one ) <<<
+        overlay_img_dict: dict[str, np.ndarray] = {}
+        cam_names: dict[tuple, str] = \
+            {get_dsname_sortinfo(cam_name): cam_name for cam_name in self.cam_result_view}
+        for tested_name, tested_img in self.tested_view.items():
+            # tested crop without CAM, (config) `cam.subset` of fish tester
+            cam_name = tested_name.replace("crop", "graymap" if self.replace_cam_color else "colormap")
+            cam_name = cam_names.get(get_dsname_sortinfo(tested_name), cam_name)
+            overlay_img_dict[cam_name] = \
+                self._draw_on_cam_image(cam_name, self.cam_result_view.get(cam_name),
+                                        tested_name, tested_img)
+        
+        img_names = sorted([*overlay_img_dict, *self.untest_img_dict],
+                           key=get_dsname_sortinfo)
         
         # >>> plot with 'Auto Row Calculation' <<<
         
-        img_list = [ img for _, img in sorted_img_dict.items() ]
+        img_list = [ overlay_img_dict[img_name] if img_name in overlay_img_dict \
+                        else self.untest_img_dict[img_name] for img_name in img_names ]
         
         subtitle_list = []
-        for img_name in sorted_img_dict.keys():
+        for img_name in img_names:
             tmp_str = ""
             if "crop" in img_name:
                 tmp_str = "N/A" # untest img
@@ -730,7 +802,8 @@ class CamGalleryCreator(BaseObject):
             "subtitle_list" : subtitle_list,
             "save_path"     : save_path,
             "use_rgb"       : True,
-            "show_fig"      : False
+            "show_fig"      : False,
+            "compositor"    : self.compositor
         }
         plot_with_imglist_auto_row(**kwargs_plot_with_imglist_auto_row)
         # ---------------------------------------------------------------------/
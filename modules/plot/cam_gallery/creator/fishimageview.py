@@ -0,0 +1,56 @@
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator
+
+import numpy as np
+
+from ....data.dataset.dsname import get_dsname_sortinfo
+# -----------------------------------------------------------------------------/
+
+
+class FishImageView(Mapping):
+
+    def __init__(self, sources:Dict[str, Any],
+                 loader:Callable[[Any], np.ndarray]) -> None:
+        """ A read-only `{ name: image }` view of the images of a fish,
+            an image is loaded only when it is accessed and not kept,
+            names are sorted by `get_dsname_sortinfo()`.
+        
+        Args:
+            sources (Dict[str, Any]): `{ name: source }`, e.g. path of an image
+            loader (Callable[[Any], np.ndarray]): `source` -> image
+        """
+        self._loader: Callable[[Any], np.ndarray] = loader
+        self._sources: Dict[str, Any] = \
+            {name: sources[name] for name in sorted(sources, key=get_dsname_sortinfo)}
+        # ---------------------------------------------------------------------/
+
+
+    def __getitem__(self, name:str) -> np.ndarray:
+        """ Load an image, it's read-only ( draw on a copy )
+        """
+        img = self._loader(self._sources[name])
+        img.setflags(write=False)
+        
+        return img
+        # ---------------------------------------------------------------------/
+
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        """
+        return iter(self._sources)
+        # ---------------------------------------------------------------------/
+
+
+    def __len__(self) -> int:
+        """
+        """
+        return len(self._sources)
+        # ---------------------------------------------------------------------/
+
+
+    def __contains__(self, name:object) -> bool:
+        """ Without loading the image
+        """
+        return name in self._sources
+        # ---------------------------------------------------------------------/
\ No newline at end of file
@@ -0,0 +1,102 @@
+import multiprocessing
+import re
+from pathlib import Path
+from typing import List, Optional, Union
+
+import matplotlib
+from colorama import Fore, Style
+from tqdm.auto import tqdm
+
+from .camgallerycreator import CamGalleryCreator
+# -----------------------------------------------------------------------------/
+
+
+class MpCamGalleryCreator(CamGalleryCreator):
+
+    def __init__(self, cam_gallery_dir:Path, display_on_CLI=True) -> None:
+        """ One creator per process of `MtCamGalleryExecutor` ( 'process' mode ),
+            galleries are saved under `cam_gallery_dir` given by the executor.
+        """
+        # ---------------------------------------------------------------------
+        # """ components """
+        
+        super(CamGalleryCreator, self).__init__(display_on_CLI)
+        
+        logger_name = multiprocessing.current_process().name
+        logger_name = re.sub(r"^\w*Process", "MpCamGalleryCreator", logger_name)
+        self._cli_out._set_logger(logger_name)
+        
+        # progress is reported by the executor ( parent process )
+        self._progressbar: tqdm = tqdm(disable=True)
+        
+        # ---------------------------------------------------------------------
+        # """ attributes """
+        
+        self._cam_gallery_dir: Path = Path(cam_gallery_dir)
+        
+        # ---------------------------------------------------------------------
+        # """ actions """
+        # TODO
+        # ---------------------------------------------------------------------/
+
+
+    def mp_init(self, config:Union[str, Path]):
+        """
+        
+        Args:
+            config (Union[str, Path]): a toml file.
+        """
+        self._set_attrs(config)
+        self._cli_out.write(f"{Fore.MAGENTA}{self._cli_out.logger_name} "
+                            f"{Fore.BLUE}{multiprocessing.current_process().pid} "
+                            f"{Fore.GREEN}initial{Style.RESET_ALL} completed")
+        # ---------------------------------------------------------------------/
+
+
+    def mp_run(self, sub_fish_dsnames:List[str]) -> List[str]:
+        """
+        
+        Args:
+            sub_fish_dsnames (List[str]):
+                a chunk of all test dsname, assign by `MtCamGalleryExecutor`
+        
+        Returns:
+            List[str]: `sub_fish_dsnames`, for the progress of the executor
+        """
+        for fish_dsname in sub_fish_dsnames:
+            self.gen_single_cam_gallery(fish_dsname)
+        
+        return sub_fish_dsnames
+        # ---------------------------------------------------------------------/
+
+
+    def _set_cam_gallery_dir(self):
+        """ 移除資料夾檢查，改從 `MtCamGalleryExecutor` 檢查
+        """
+        self.cam_gallery_dir = self._cam_gallery_dir
+        # ---------------------------------------------------------------------/
+
+
+
+_mp_creator: Optional[MpCamGalleryCreator] = None # one instance per process
+# -----------------------------------------------------------------------------/
+
+
+def init_mp_creator(config:Union[str, Path], cam_gallery_dir:Path,
+                    display_on_CLI:bool):
+    """ `initializer` of the `ProcessPoolExecutor` in `MtCamGalleryExecutor`
+    """
+    global _mp_creator
+    
+    matplotlib.use("agg") # matplotlib is not thread-safe, no GUI in workers
+    _mp_creator = MpCamGalleryCreator(cam_gallery_dir, display_on_CLI)
+    _mp_creator.mp_init(config)
+    # -------------------------------------------------------------------------/
+
+
+
+def mp_task(sub_fish_dsnames:List[str]) -> List[str]:
+    """ Generate galleries of a chunk with the creator of current process
+    """
+    return _mp_creator.mp_run(sub_fish_dsnames)
+    # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -4,7 +4,7 @@ import sys
 import threading
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from colorama import Fore, Style
 from tqdm.auto import tqdm
@@ -16,7 +16,8 @@ from .camgallerycreator import CamGalleryCreator
 class MtCamGalleryCreator(CamGalleryCreator):
 
     def __init__(self, max_str_len_dict:Dict[str, int], lock:Lock,
-                 progressbar:tqdm, display_on_CLI=True) -> None:
+                 progressbar:tqdm, display_on_CLI=True,
+                 cam_gallery_dir:Optional[Path]=None) -> None:
         """
         """
         # ---------------------------------------------------------------------
@@ -35,6 +36,7 @@ class MtCamGalleryCreator(CamGalleryCreator):
         # """ attributes """
         
         self.max_str_len_dict: Dict[str, int] = max_str_len_dict
+        self._cam_gallery_dir: Optional[Path] = cam_gallery_dir # given by `MtCamGalleryExecutor`
         
         # ---------------------------------------------------------------------
         # """ actions """
@@ -72,5 +74,8 @@ class MtCamGalleryCreator(CamGalleryCreator):
     def _set_cam_gallery_dir(self):
         """ 移除資料夾檢查，改從 `MtCamGalleryExecutor` 檢查
         """
-        self.cam_gallery_dir = self.history_dir.joinpath("+---CAM_Gallery")
+        if self._cam_gallery_dir is not None:
+            self.cam_gallery_dir = self._cam_gallery_dir
+        else:
+            self.cam_gallery_dir = self.history_dir.joinpath("+---CAM_Gallery")
         # ---------------------------------------------------------------------/
\ No newline at end of file
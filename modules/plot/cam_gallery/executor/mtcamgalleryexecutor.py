@@ -1,20 +1,23 @@
 import concurrent.futures
+import multiprocessing
 import os
 import re
 import sys
 import traceback
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from threading import Lock
 from typing import Dict, List, Tuple, Union
 
+from colorama import Back, Fore, Style
 from tqdm.auto import tqdm
 
 from ....data.dataset import dsname
 from ..creator.camgallerycreator import CamGalleryCreator
+from ..creator.mpcamgallerycreator import init_mp_creator, mp_task
 from ..creator.mtcamgallerycreator import MtCamGalleryCreator
-from .utils import divide_fish_dsname_in_group
+from .utils import divide_fish_dsname_in_chunk, divide_fish_dsname_in_group
 # -----------------------------------------------------------------------------/
 
 
@@ -65,6 +68,14 @@ class MtCamGalleryExecutor(CamGalleryCreator):
         
         """ [multiprocessing] """
         self.worker = self.config["multiprocessing"]["worker"]
+        self.mode: str = self.config["multiprocessing"]["mode"]
+        self.chunk_size: int = self.config["multiprocessing"]["chunk_size"]
+        self.start_method: str = self.config["multiprocessing"]["start_method"]
+        
+        if self.mode not in ["thread", "process"]:
+            raise ValueError(f"{Fore.RED}{Back.BLACK} `multiprocessing.mode` accepts "
+                             f"'thread' or 'process' only, "
+                             f"got '{self.mode}' {Style.RESET_ALL}\n")
         # ---------------------------------------------------------------------/
 
 
@@ -76,40 +87,26 @@ class MtCamGalleryExecutor(CamGalleryCreator):
         """
         super(CamGalleryCreator, self).run(config)
         
-        fish_dsnames_group = self.divide_fish_dsnames()
+        fish_dsnames = self.get_fish_dsnames()
         
         self._cli_out.divide()
-        progressbars = \
-            [ tqdm(total=len(fish_dsnames), desc=f"[ {self._cli_out.logger_name} ] ") \
-                for fish_dsnames in fish_dsnames_group ]
+        self._cli_out.write(f"※　: Mode: '{self.mode}', worker: {self.worker}")
         
-        lock = Lock()
-        with ThreadPoolExecutor(max_workers=self.worker) as t_pool:
-            futures = [ t_pool.submit(
-                            self.mt_task, *(fish_dsnames,
-                                            self.max_str_len_dict,
-                                            lock, progressbars[i],
-                                            self._cli_out._display_on_CLI)
-                        ) for i, fish_dsnames in enumerate(fish_dsnames_group) ]
-            
-            try:
-                for future in concurrent.futures.as_completed(futures):
-                    future.result()
-            
-            except Exception:
-                for progressbar in progressbars: progressbar.close()
-                self._cli_out.new_line()
-                self._cli_out.write(f"{traceback.format_exc()}") # 輸出異常訊息
-            
-            else:
-                for progressbar in progressbars: progressbar.close()
-                self._cli_out.new_line()
-                self._cli_out.write(f"Done: '{self.cam_gallery_dir}'")
-                self._cli_out.new_line()
+        try:
+            self.render(fish_dsnames)
+        
+        except Exception:
+            self._cli_out.new_line()
+            self._cli_out.write(f"{traceback.format_exc()}") # 輸出異常訊息
+        
+        else:
+            self._cli_out.new_line()
+            self._cli_out.write(f"Done: '{self.cam_gallery_dir}'")
+            self._cli_out.new_line()
         # ---------------------------------------------------------------------/
 
 
-    def divide_fish_dsnames(self) -> List[List[str]]:
+    def get_fish_dsnames(self) -> List[str]:
         """
         """
         fish_dsnames = sorted(Counter(self.test_df["parent (dsname)"]).keys(),
@@ -121,10 +118,90 @@ class MtCamGalleryExecutor(CamGalleryCreator):
             if len(fish_dsname) > self.max_str_len_dict["fish_dsname"]:
                 self.max_str_len_dict["fish_dsname"] = len(fish_dsname)
         
+        return fish_dsnames
+        # ---------------------------------------------------------------------/
+
+
+    def render(self, fish_dsnames:List[str]):
+        """ Generate the galleries of `fish_dsnames` under `self.cam_gallery_dir`,
+            (config) `multiprocessing.mode`:
+            
+            - 'thread': `fish_dsnames` is divided into `worker` groups,
+                one `MtCamGalleryCreator` per group.
+            - 'process': `fish_dsnames` is divided into chunks of `chunk_size`,
+                one `MpCamGalleryCreator` per process, chunks are fetched
+                by idle processes and the progress is reported here.
+            
+            Either way the path of a gallery only depends on the fish
+            ( '{com_gt}/{accuracy}_{fish_dsname}_*.png' ).
+        """
+        if self.mode == "process":
+            self._mp_render(fish_dsnames)
+        else:
+            self._mt_render(fish_dsnames)
+        # ---------------------------------------------------------------------/
+
+
+    def _mt_render(self, fish_dsnames:List[str]):
+        """
+        """
         fish_dsnames_group = \
-            divide_fish_dsname_in_group(fish_dsnames, self.worker)
+            divide_fish_dsname_in_group(list(fish_dsnames), self.worker)
+        
+        progressbars = \
+            [ tqdm(total=len(fish_dsnames), desc=f"[ {self._cli_out.logger_name} ] ") \
+                for fish_dsnames in fish_dsnames_group ]
+        
+        lock = Lock()
+        try:
+            with ThreadPoolExecutor(max_workers=self.worker) as t_pool:
+                futures = [ t_pool.submit(
+                                self.mt_task, *(fish_dsnames,
+                                                self.max_str_len_dict,
+                                                lock, progressbars[i],
+                                                self._cli_out._display_on_CLI)
+                            ) for i, fish_dsnames in enumerate(fish_dsnames_group) ]
+                
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+        finally:
+            for progressbar in progressbars: progressbar.close()
+        # ---------------------------------------------------------------------/
+
+
+    def _mp_render(self, fish_dsnames:List[str]):
+        """
+        """
+        chunks = divide_fish_dsname_in_chunk(list(fish_dsnames), self.chunk_size)
+        if len(chunks) == 0: return
+        
+        progressbar = tqdm(total=len(fish_dsnames),
+                           desc=f"[ {self._cli_out.logger_name} ] ")
+        
+        p_pool = ProcessPoolExecutor(max_workers=min(self.worker, len(chunks)),
+                                     mp_context=multiprocessing.get_context(self.start_method),
+                                     initializer=init_mp_creator,
+                                     initargs=(self.config, self.cam_gallery_dir,
+                                               self._cli_out._display_on_CLI))
+        try:
+            futures = [ p_pool.submit(mp_task, chunk) for chunk in chunks ]
+            
+            for future in concurrent.futures.as_completed(futures):
+                done_fish_dsnames: List[str] = future.result()
+                progressbar.desc = (f"Generated {Fore.YELLOW}'{done_fish_dsnames[-1]:{self.max_str_len_dict['fish_dsname']}}'{Style.RESET_ALL} "
+                                    f"( {Fore.MAGENTA}{self._cli_out.logger_name}{Style.RESET_ALL} ) ")
+                progressbar.update(len(done_fish_dsnames))
+                progressbar.refresh()
+        
+        except BaseException:
+            p_pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        
+        else:
+            p_pool.shutdown(wait=True)
         
-        return fish_dsnames_group
+        finally:
+            progressbar.close()
         # ---------------------------------------------------------------------/
 
 
@@ -135,7 +212,7 @@ class MtCamGalleryExecutor(CamGalleryCreator):
         with lock:
             mt_cam_gallery_creator = \
                 MtCamGalleryCreator(max_str_len_dict, lock, progressbar,
-                                    display_on_CLI)
+                                    display_on_CLI, self.cam_gallery_dir)
         
         mt_cam_gallery_creator.mt_run(sub_fish_dsnames, self.config)
         # ---------------------------------------------------------------------/
\ No newline at end of file
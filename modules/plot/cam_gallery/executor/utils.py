@@ -4,6 +4,9 @@ from typing import List, Dict, Tuple, Union
 
 def divide_fish_dsname_in_group(fish_dsname_list:List[str], worker:int) -> List[List[str]]:
     
+    if worker <= 1:
+        return [fish_dsname_list]
+    
     fish_dsname_list_group = []
     quotient  = int(len(fish_dsname_list)/(worker-1))
     for i in range((worker-1)):
@@ -11,4 +14,15 @@ def divide_fish_dsname_in_group(fish_dsname_list:List[str], worker:int) -> List[
     fish_dsname_list_group.append(fish_dsname_list)
 
     return fish_dsname_list_group
+    # -------------------------------------------------------------------------/
+
+
+
+def divide_fish_dsname_in_chunk(fish_dsname_list:List[str], chunk_size:int) -> List[List[str]]:
+    """ Split into consecutive chunks of `chunk_size` ( order is kept )
+    """
+    chunk_size = max(1, chunk_size)
+    
+    return [ fish_dsname_list[i:i+chunk_size] \
+                for i in range(0, len(fish_dsname_list), chunk_size) ]
     # -------------------------------------------------------------------------/
\ No newline at end of file
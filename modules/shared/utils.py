@@ -21,7 +21,7 @@ def create_new_dir(dir:Union[str, Path], msg_end:str="\n", cli_out:CLIOutput=Non
         cli_out (CLIOutput, optional): a `CLIOutput` object. Defaults to None.
     """
     if not os.path.exists(dir):
-        os.makedirs(dir)
+        os.makedirs(dir, exist_ok=True) # may be created by another thread / process
         """ CLI output """
         if cli_out: cli_out.write(f"Directory: '{dir}' is created!{msg_end}")
     # -------------------------------------------------------------------------/
@@ -197,4 +197,22 @@ def log(base, x):
     """
     """
     return np.log(x) / np.log(base)
+    # -------------------------------------------------------------------------/
+
+
+
+def get_peak_rss_mb() -> Union[float, None]:
+    """ Peak resident set size ( MB ) of current process,
+        return `None` if the platform doesn't support it ( Windows )
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return round(peak_rss/2**20, 2) # bytes
+    else:
+        return round(peak_rss/2**10, 2) # KB
     # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -1,7 +1,5 @@
 import os
-import pickle
 import sys
-from copy import deepcopy
 from pathlib import Path
 
 import numpy as np
@@ -24,6 +22,8 @@ from modules.ml.calc_seg_feat import (count_area, count_average_size,
                                       count_element, get_patch_sizes,
                                       update_ana_toml_file,
                                       update_seg_analysis_dict)
+from modules.ml.seg_storage import (SEG_LEVELS, get_seg_file,
+                                    load_seg_result, save_seg_labels)
 from modules.ml.utils import (get_cellpose_param_name, get_seg_desc,
                               get_slic_param_name, parse_base_size)
 from modules.shared.clioutput import CLIOutput
@@ -117,29 +117,18 @@ if __name__ == '__main__':
                 save_path = ds_seg_dir.joinpath(f"{d_path.name}")
                 ski.io.imsave(save_path, png)
             
-            # crop `pkl` files
-            cell_seg: np.ndarray = None
-            patch_seg: np.ndarray = None
-            for d_path in d_seg_dir.glob("*.pkl"):
-                
-                # load `pkl`
-                with open(d_path, mode="rb") as f_reader:
-                    seg = pickle.load(f_reader)
-                assert isinstance(seg, np.ndarray), \
-                    f"Warning '{d_path.stem}' might be replaced by others"
-                
-                # cropping
-                seg = base_size_cropper(image=seg)
-                
-                # dump `pkl`
-                save_path = ds_seg_dir.joinpath(f"{d_path.name}")
-                with open(save_path, mode="wb") as f_writer:
-                    pickle.dump(seg, f_writer)
-                
-                if d_path.stem.endswith("seg1"):
-                    cell_seg = deepcopy(seg)
-                if d_path.stem.endswith("seg2"):
-                    patch_seg = deepcopy(seg)
+            # crop segmentations ( '.seg.npz' or legacy '.pkl' )
+            segs: dict[str, np.ndarray] = {}
+            for level in SEG_LEVELS:
+                seg = load_seg_result(d_seg_dir, level)
+                if seg is not None: # 'seg0' is only for SLIC
+                    segs[level] = base_size_cropper(image=seg)
+            
+            # save as '.seg.npz'
+            save_seg_labels(get_seg_file(ds_seg_dir), segs["seg1"], segs["seg2"],
+                            seg0=segs.get("seg0"))
+            cell_seg: np.ndarray = segs["seg1"]
+            patch_seg: np.ndarray = segs["seg2"]
             
             assert isinstance(cell_seg, np.ndarray)
             assert isinstance(patch_seg, np.ndarray)
@@ -160,7 +149,7 @@ if __name__ == '__main__':
             
             # update pbar
             pbar.advance(task)
-
+    
     cli_out.new_line()
     print("[green]Done! \n")
     # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -1,5 +1,4 @@
 import os
-import pickle as pkl
 import random
 import re
 import sys
@@ -21,6 +20,7 @@ if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
 from modules.data.processeddatainstance import ProcessedDataInstance
 from modules.dl.fakepalmskin.utils import (gen_singlecolor_palmskin,
                                            gen_unique_random_color_pool)
+from modules.ml.seg_storage import load_seg_result
 from modules.ml.utils import (get_cellpose_param_name, get_seg_desc,
                               get_slic_param_name)
 from modules.shared.clioutput import CLIOutput
@@ -83,10 +83,8 @@ if __name__ == '__main__':
             src_dir = dname_dir.joinpath(seg_desc, seg_dirname)
 
             """Random color #2: load `cell_seg` (seg1, without clonal information)"""
-            seg1_pkl = src_dir.joinpath(f"{seg_dirname}.seg1.pkl")
-            print(f"[ {dname_dir.parts[-1]} : '{seg1_pkl}' ]")
-            with open(seg1_pkl, mode="rb") as f_reader:
-                seg1 = pkl.load(f_reader)
+            print(f"[ {dname_dir.parts[-1]} : '{src_dir}' ]")
+            seg1 = load_seg_result(src_dir, "seg1") # '.seg.npz' or legacy '.pkl'
             # 創建與 seg1 相同大小的 RGB image
             colored_seg1 = np.zeros((*seg1.shape, 3), dtype=np.float64) # 3 表示 RGB 三個通道
             # 確認所有唯一的 label
@@ -110,10 +108,7 @@ if __name__ == '__main__':
                 mark_boundaries(colored_seg1, seg1, color=(1.0, 1.0, 1.0))
             
             """Random color #1: load `clone_seg` (seg2, with clonal information)"""
-            seg2_pkl = src_dir.joinpath(f"{seg_dirname}.seg2.pkl")
-            print(f"[ {dname_dir.parts[-1]} : '{seg2_pkl}' ]")
-            with open(seg2_pkl, mode="rb") as f_reader:
-                seg2 = pkl.load(f_reader)
+            seg2 = load_seg_result(src_dir, "seg2") # '.seg.npz' or legacy '.pkl'
             # 創建與 seg2 相同大小的 RGB image
             colored_seg2 = np.zeros((*seg2.shape, 3), dtype=np.float64) # 3 表示 RGB 三個通道
             # 確認所有唯一的 label
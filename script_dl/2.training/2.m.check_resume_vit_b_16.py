@@ -0,0 +1,121 @@
+import shutil
+import sys
+import time
+from copy import deepcopy
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+pkg_dir = Path(__file__).parents[2] # `dir_depth` to `repo_root`
+if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
+    sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
+
+from modules.dl.trainer import VitB16Trainer
+from modules.shared.config import load_config
+from modules.shared.utils import get_repo_root
+
+import matplotlib; matplotlib.use("agg")
+# -----------------------------------------------------------------------------/
+
+
+TIME_KEYS = ["imgs_per_sec", "data_wait_sec", "compute_sec"] # differ between runs
+# -----------------------------------------------------------------------------/
+
+
+class InterruptibleVitB16Trainer(VitB16Trainer):
+
+    def __init__(self, display_on_CLI=True) -> None:
+        """ Stop the training ( as `KeyboardInterrupt` ) after `stop_after` epochs
+        """
+        super().__init__(display_on_CLI=display_on_CLI)
+        self.stop_after: int = 0 # 0: no interruption
+        # ---------------------------------------------------------------------/
+
+
+    def _one_epoch_training(self, epoch:int):
+        """
+        """
+        if (self.stop_after > 0) and (epoch > self.stop_after):
+            raise KeyboardInterrupt
+        
+        super()._one_epoch_training(epoch)
+        # ---------------------------------------------------------------------/
+
+
+
+def drop_time_keys(logs:list) -> list:
+    """
+    """
+    return [{k: v for k, v in log.items() if k not in TIME_KEYS} for log in logs]
+    # -------------------------------------------------------------------------/
+
+
+
+def run_training(trainer:InterruptibleVitB16Trainer, config:dict,
+                 stop_after:int, resume_from:str) -> str:
+    """ Returns: `time_stamp` of the training directory
+    """
+    config = deepcopy(config)
+    config["train_opts"]["checkpoint"]["resume_from"] = resume_from
+    trainer.stop_after = stop_after
+    trainer.run(config)
+    time.sleep(1) # next training gets a different `time_stamp`
+    
+    return trainer.time_stamp
+    # -------------------------------------------------------------------------/
+
+
+
+if __name__ == '__main__':
+
+    """ Detect Repository """
+    print(f"Repository: '{get_repo_root()}'")
+    
+    """ Check settings """
+    epochs = 4 # uninterrupted: `epochs`, interrupted: `epochs//2` + resume + `epochs//2`
+    keep_dirs = False # keep the training directories under 'model_history'
+    
+    config = dict(load_config("2.training.toml"))
+    config["train_opts"]["epochs"] = epochs
+    config["train_opts"]["checkpoint"]["every_n_epochs"] = epochs//2
+    
+    console = Console()
+    trainer = InterruptibleVitB16Trainer()
+    model_history: Path = trainer._path_navigator.dbpp.get_one_of_dbpp_roots("model_history")
+    time_stamps = []
+    try:
+        """ Uninterrupted """
+        time_stamps.append(run_training(trainer, config, 0, ""))
+        straight_logs = (drop_time_keys(trainer.train_logs),
+                         drop_time_keys(trainer.valid_logs))
+        
+        """ Interrupted after `epochs//2`, then resume """
+        time_stamps.append(run_training(trainer, config, epochs//2, ""))
+        interrupted_dir = list(model_history.glob(f"{time_stamps[-1]}_*"))[0]
+        run_training(trainer, config, 0, interrupted_dir.name)
+        resumed_logs = (drop_time_keys(trainer.train_logs),
+                        drop_time_keys(trainer.valid_logs))
+    finally:
+        if not keep_dirs:
+            for time_stamp in time_stamps:
+                for path in model_history.glob(f"{time_stamp}_*"):
+                    shutil.rmtree(path, ignore_errors=True)
+    
+    table = Table(title=f"Resume check, {epochs} epochs vs "
+                        f"{epochs//2} epochs + resume + {epochs - epochs//2} epochs "
+                        f"( without {TIME_KEYS} )")
+    for column in ["epoch", "train log identical", "valid log identical"]:
+        table.add_column(column, justify="right")
+    
+    for i in range(max(len(straight_logs[0]), len(resumed_logs[0]))):
+        row = [str(i+1)]
+        for straight, resumed in zip(straight_logs, resumed_logs):
+            same = (i < len(straight)) and (i < len(resumed)) and (straight[i] == resumed[i])
+            row.append(str(same))
+        table.add_row(*row)
+    
+    console.line()
+    console.print(table)
+    console.print(f"Identical: {straight_logs == resumed_logs}")
+    # -------------------------------------------------------------------------/
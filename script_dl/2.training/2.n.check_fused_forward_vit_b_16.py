@@ -0,0 +1,105 @@
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torchvision
+from rich.console import Console
+from rich.table import Table
+from torch import nn
+
+pkg_dir = Path(__file__).parents[2] # `dir_depth` to `repo_root`
+if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
+    sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
+
+from modules.dl.trainer.utils import forward_hybrid
+from modules.shared.utils import get_repo_root
+# -----------------------------------------------------------------------------/
+
+
+def one_step(model:nn.Module, images:torch.Tensor, images2:torch.Tensor,
+             labels:torch.Tensor, fused:bool, seed:int) -> dict:
+    """ One training step without `optimizer.step()`, same as `_one_epoch_training()`
+        ( FP32, hybrid loss = CE(preds) + MSE(preds, preds2) )
+    
+    Returns:
+        dict: { "logits", "loss", "grads" }
+    """
+    torch.manual_seed(seed) # same random state ( e.g. dropout ) for both passes
+    model.zero_grad(set_to_none=True)
+    
+    preds, preds2 = forward_hybrid(model, images, images2, fused)
+    loss_value = nn.CrossEntropyLoss()(preds, labels) + nn.MSELoss()(preds, preds2)
+    loss_value.backward()
+    
+    return {"logits": torch.cat([preds, preds2], dim=0).detach(),
+            "loss": loss_value.detach(),
+            "grads": {name: param.grad.detach().clone()
+                      for name, param in model.named_parameters() if param.grad is not None}}
+    # -------------------------------------------------------------------------/
+
+
+
+def compare(ref:torch.Tensor, out:torch.Tensor, rtol:float, atol:float) -> tuple:
+    """ Returns: (`max_abs_diff`, `allclose`)
+    """
+    return (ref - out).abs().max().item(), torch.allclose(ref, out, rtol=rtol, atol=atol)
+    # -------------------------------------------------------------------------/
+
+
+
+if __name__ == '__main__':
+
+    """ Detect Repository """
+    print(f"Repository: '{get_repo_root()}'")
+    
+    """ Check settings """
+    seed = 2022
+    batch_size = 4 # images per view, the fused pass runs `2*batch_size` images
+    num_classes = 4
+    rtol, atol = 1e-3, 1e-4 # same as `check_fused_forward()`
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    
+    console = Console()
+    torch.manual_seed(seed)
+    model: nn.Module = torchvision.models.vit_b_16(weights=None) # random weights, no download
+    model.heads.head = nn.Linear(in_features=768, out_features=num_classes, bias=True)
+    model.to(device)
+    model.train() # same mode as training
+    
+    images = torch.rand(batch_size, 3, 224, 224, device=device)
+    images2 = torch.rand(batch_size, 3, 224, 224, device=device)
+    labels = torch.randint(0, num_classes, (batch_size,), device=device)
+    
+    results: dict = {}
+    for fused in [False, True]:
+        st = time.perf_counter()
+        results[fused] = one_step(model, images, images2, labels, fused, seed)
+        results[fused]["time"] = time.perf_counter() - st
+    ref, out = results[False], results[True]
+    
+    table = Table(title=f"Fused forward pass vs two-pass, vit_b_16 ( train mode ), "
+                        f"batch_size = {batch_size}, seed = {seed}, device = '{device}'")
+    for column in ["item", "max_abs_diff", f"allclose (rtol={rtol}, atol={atol})"]:
+        table.add_column(column, justify="right")
+    
+    all_same = True
+    for key in ["logits", "loss"]:
+        max_abs_diff, allclose = compare(ref[key], out[key], rtol, atol)
+        table.add_row(key, f"{max_abs_diff:.2e}", str(allclose))
+        all_same &= allclose
+    
+    grad_diffs = {name: compare(ref["grads"][name], out["grads"][name], rtol, atol)
+                  for name in ref["grads"]}
+    worst = max(grad_diffs, key=lambda name: grad_diffs[name][0])
+    n_close = sum(allclose for _, allclose in grad_diffs.values())
+    table.add_row("grads", f"{grad_diffs[worst][0]:.2e}",
+                  f"{n_close}/{len(grad_diffs)}")
+    all_same &= (n_close == len(grad_diffs)) and (ref["grads"].keys() == out["grads"].keys())
+    
+    console.line()
+    console.print(table)
+    console.print(f"Largest grad difference: '{worst}'")
+    console.print(f"Time (s), two-pass: {ref['time']:.3f}, fused: {out['time']:.3f}")
+    console.print(f"Equivalent: {all_same}")
+    # -------------------------------------------------------------------------/
@@ -11,8 +11,11 @@ from modules.shared.utils import get_repo_root
 import matplotlib; matplotlib.use("agg")
 # -----------------------------------------------------------------------------/
 
-""" Detect Repository """
-print(f"Repository: '{get_repo_root()}'")
-
-mt_cam_gallery_executor = MtCamGalleryExecutor()
-mt_cam_gallery_executor.run("5.make_cam_gallery.toml")
\ No newline at end of file
+if __name__ == '__main__':
+    
+    """ Detect Repository """
+    print(f"Repository: '{get_repo_root()}'")
+    
+    # (config) `multiprocessing.mode` = 'process' re-imports this file in each process
+    mt_cam_gallery_executor = MtCamGalleryExecutor()
+    mt_cam_gallery_executor.run("5.make_cam_gallery.toml")
\ No newline at end of file
@@ -19,6 +19,7 @@ if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
     sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
 
 from modules.data.dataset.dsname import get_dsname_sortinfo
+from modules.dl.cam.camarray import CAM_ARRAY_FILE, CamArrayReader
 from modules.dl.tester.utils import get_history_dir
 from modules.plot.utils import add_detail_info, plt_to_pillow, pt_to_px
 from modules.shared.clioutput import CLIOutput
@@ -139,12 +140,17 @@ if __name__ == '__main__':
             
             # img: cam
             cam_path = cam_result_root.joinpath(f"{dsname}/color_map/{dsname}_colormap.tiff")
-            try:
-                cam_img = ski.io.imread(cam_path)
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                        f"Can't find CAM image '{dsname}_colormap.tiff' in `cam_result` dir, "
-                        f"run one of script in '4.test_by_fish/*.py' to create CAM.")
+            cam_array_path = cam_result_root.joinpath(dsname, CAM_ARRAY_FILE)
+            if cam_array_path.exists(): # (config) `cam.storage` = 'array'
+                with CamArrayReader(cam_array_path) as cam_array:
+                    cam_img = cam_array.read_colormap(f"{dsname}_graymap")
+            else:
+                try:
+                    cam_img = ski.io.imread(cam_path)
+                except FileNotFoundError:
+                    raise FileNotFoundError(
+                            f"Can't find CAM image '{dsname}_colormap.tiff' in `cam_result` dir, "
+                            f"run one of script in '4.test_by_fish/*.py' to create CAM.")
             
             # img: cam on original
             orig_img = (orig_img/255.0)
@@ -22,6 +22,7 @@ if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
 
 from modules.data.dname import get_dname_sortinfo
 from modules.data.processeddatainstance import ProcessedDataInstance
+from modules.dl.cam.camarray import CAM_ARRAY_FILE, CamArrayReader
 from modules.dl.tester.utils import get_history_dir
 from modules.shared.clioutput import CLIOutput
 from modules.shared.config import load_config
@@ -136,12 +137,17 @@ if __name__ == '__main__':
             
             # img: cam
             cam_path = cam_result_root.joinpath(f"{dname}/color_map/{dname}.colormap.tiff")
-            try:
-                cam_img = ski.io.imread(cam_path)
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                        f"Can't find CAM image '{dname}.colormap.tiff' in `cam_result` dir, "
-                        f"run one of script in '4.test_by_fish/*.py' to create CAM.")
+            cam_array_path = cam_result_root.joinpath(dname, CAM_ARRAY_FILE)
+            if cam_array_path.exists(): # (config) `cam.storage` = 'array'
+                with CamArrayReader(cam_array_path) as cam_array:
+                    cam_img = cam_array.read_colormap(f"{dname}.graymap")
+            else:
+                try:
+                    cam_img = ski.io.imread(cam_path)
+                except FileNotFoundError:
+                    raise FileNotFoundError(
+                            f"Can't find CAM image '{dname}.colormap.tiff' in `cam_result` dir, "
+                            f"run one of script in '4.test_by_fish/*.py' to create CAM.")
             
             # img: cam on original
             overlay_img = (orig_img/255)*cam_weight + (cam_img/255)*cam_weight
@@ -0,0 +1,81 @@
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+pkg_dir = Path(__file__).parents[2] # `dir_depth` to `repo_root`
+if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
+    sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
+
+from modules.plot.cam_gallery.executor.mtcamgalleryexecutor import MtCamGalleryExecutor
+from modules.shared.utils import get_repo_root
+
+import matplotlib; matplotlib.use("agg")
+# -----------------------------------------------------------------------------/
+
+
+class BenchmarkCamGalleryExecutor(MtCamGalleryExecutor):
+
+    def _set_cam_gallery_dir(self):
+        """ Save galleries in a temporary directory, '+---CAM_Gallery' is not touched
+        """
+        self.cam_gallery_dir = Path(tempfile.mkdtemp(prefix="cam_gallery_benchmark_"))
+        # ---------------------------------------------------------------------/
+
+
+
+if __name__ == '__main__':
+
+    """ Detect Repository """
+    print(f"Repository: '{get_repo_root()}'")
+    
+    """ Benchmark settings """
+    modes = ["thread", "process"]
+    workers = [1, 2, 4, 8]
+    num_fish = 16 # first `num_fish` fish ( sorted ), [] or 0: all fish
+    
+    console = Console()
+    executor = BenchmarkCamGalleryExecutor()
+    executor._set_attrs("5.make_cam_gallery.toml") # (config) `model_prediction`, `draw`, ...
+    fish_dsnames = executor.get_fish_dsnames()
+    if num_fish: fish_dsnames = fish_dsnames[:num_fish]
+    bench_root: Path = executor.cam_gallery_dir
+    
+    table = Table(title=f"CAM Gallery, {len(fish_dsnames)} fish, "
+                        f"chunk_size = {executor.chunk_size}, "
+                        f"start_method = '{executor.start_method}'")
+    for column in ["mode", "worker", "time (s)", "fish/s", "speedup", "same paths"]:
+        table.add_column(column, justify="right")
+    
+    base_time = None
+    base_paths = None
+    try:
+        for mode in modes:
+            for worker in workers:
+                executor.mode = mode
+                executor.worker = worker
+                executor.cam_gallery_dir = bench_root.joinpath(f"{mode}_{worker}")
+                
+                # time of process mode includes starting the processes
+                st = time.perf_counter()
+                executor.render(fish_dsnames)
+                elapsed = time.perf_counter() - st
+                
+                # galleries of all runs should have the same relative paths
+                paths = sorted(str(path.relative_to(executor.cam_gallery_dir))
+                                for path in executor.cam_gallery_dir.glob("**/*.png"))
+                if base_time is None: base_time, base_paths = elapsed, paths
+                table.add_row(mode, str(worker), f"{elapsed:.2f}",
+                              f"{len(fish_dsnames)/elapsed:.2f}",
+                              f"{base_time/elapsed:.2f}x", str(paths == base_paths))
+                shutil.rmtree(executor.cam_gallery_dir)
+    finally:
+        shutil.rmtree(bench_root, ignore_errors=True)
+    
+    console.line()
+    console.print(table)
+    # -------------------------------------------------------------------------/
\ No newline at end of file
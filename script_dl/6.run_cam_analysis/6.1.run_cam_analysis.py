@@ -19,6 +19,7 @@ if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
     sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
 
 from modules.data.dataset.utils import parse_dataset_file_name
+from modules.dl.cam.camarray import CAM_ARRAY_FILE, CamArrayReader
 from modules.dl.cam.analysis import calc_thresed_cam_area_on_cell
 from modules.dl.tester.utils import get_history_dir
 from modules.shared.clioutput import CLIOutput
@@ -42,6 +43,8 @@ if __name__ == '__main__':
     # maunal variables
     cam_threshold = 120
     img_dict: dict[str, np.ndarray] = {}
+    cam_arrays: dict[str, CamArrayReader] = {} # (config) `cam.storage` = 'array'
+    no_cam_crops: list[str] = []
     
     
     """ Load config """
@@ -102,15 +105,35 @@ if __name__ == '__main__':
             
             pbar.update(task, description=f"[yellow]{k} : ")
             
-            # read original image
-            orig_path = Path(list(dataset_df[(dataset_df["image_name"] == k)]["path"])[0])
-            img_dict["orig"] = ski.io.imread(src_root.joinpath(orig_path))
-            
             # read cam image
+            target_row = dataset_df[(dataset_df["image_name"] == k)]
             cam_name = k.replace("crop", "graymap")
-            cam_path_list = list(cam_result_root.glob(f"*/grayscale_map/{cam_name}.tiff"))
-            assert len(cam_path_list) == 1, f"CAM of {cam_name} is not unique."
-            img_dict["cam"] = ski.io.imread(cam_path_list[0])
+            fish_dsname = list(target_row["parent (dsname)"])[0]
+            cam_array_path = cam_result_root.joinpath(fish_dsname, CAM_ARRAY_FILE)
+            if cam_array_path.exists():
+                if fish_dsname not in cam_arrays:
+                    cam_arrays[fish_dsname] = CamArrayReader(cam_array_path)
+                if cam_name in cam_arrays[fish_dsname]:
+                    img_dict["cam"] = cam_arrays[fish_dsname].read_grayscale(cam_name)
+                else:
+                    img_dict["cam"] = None
+            else:
+                cam_path_list = list(cam_result_root.glob(f"*/grayscale_map/{cam_name}.tiff"))
+                assert len(cam_path_list) <= 1, f"CAM of {cam_name} is not unique."
+                if len(cam_path_list) == 1:
+                    img_dict["cam"] = ski.io.imread(cam_path_list[0])
+                else:
+                    img_dict["cam"] = None
+            
+            # skip the crops without CAM, (config) `cam.subset` of fish tester
+            if img_dict["cam"] is None:
+                no_cam_crops.append(k)
+                pbar.advance(task)
+                continue
+            
+            # read original image
+            orig_path = Path(list(target_row["path"])[0])
+            img_dict["orig"] = ski.io.imread(src_root.joinpath(orig_path))
             
             tmp_list = calc_thresed_cam_area_on_cell(img_dict["orig"], intensity,
                                                      img_dict["cam"], cam_threshold)
@@ -118,6 +141,10 @@ if __name__ == '__main__':
             
             # update pbar
             pbar.advance(task)
+    for cam_array in cam_arrays.values(): cam_array.close()
+    for k in no_cam_crops: pred_ans_dict.pop(k)
+    if len(no_cam_crops) > 0:
+        print(f"[yellow]Skip {len(no_cam_crops)} crops without CAM")
     cli_out.new_line()
     
     # write file: '{Logs}_thresed_cam_area_on_cell.log'
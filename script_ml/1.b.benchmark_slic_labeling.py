@@ -0,0 +1,116 @@
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import skimage as ski
+from rich.console import Console
+from rich.table import Table
+from rich.traceback import install
+from skimage.segmentation import slic
+
+pkg_dir = Path(__file__).parents[1] # `dir_depth` to `repo_root`
+if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
+    sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
+
+from modules.data.processeddatainstance import ProcessedDataInstance
+from modules.dl.dataset.augmentation import crop_base_size
+from modules.ml.seg_generate import (get_average_rgb, merge_background,
+                                     simple_col_dis)
+from modules.shared.config import load_config
+from modules.shared.utils import get_repo_root
+
+install()
+# -----------------------------------------------------------------------------/
+
+
+def legacy_merge_background(seg0: np.ndarray, img: np.ndarray, dark: int):
+    """ Loop version of 'Merge background (seg1)' in `single_slic_labeling()`,
+        the reference of `merge_background()`
+    """
+    seg1 = seg0.copy()
+    labels = np.unique(seg0)
+    new_label = np.max(labels) + 1 # new (re-index) label start
+    for label in labels:
+        mask = (seg1 == label)
+        if np.sum(mask) > 0:
+            color = get_average_rgb(mask, img, avg_ratio=1.0)[1]
+            color_dist = simple_col_dis(color, (0, 0, 0)) # compare with 'background'
+            if color_dist <= dark:
+                seg1[mask] = 0
+            else:
+                seg1[mask] = new_label
+                new_label +=1
+    
+    return seg1
+    # -------------------------------------------------------------------------/
+
+
+
+if __name__ == '__main__':
+
+    print(f"Repository: '{get_repo_root()}'")
+    
+    """ Benchmark settings """
+    n_segments_list = [1000, 2000, 4000]
+    repeat = 3 # best of `repeat` runs
+    
+    """ Load config """
+    config = load_config("ml_analysis.toml")
+    palmskin_result_name: str = config["data_processed"]["palmskin_result_name"]
+    dark: int = config["SLIC"]["dark"]
+    
+    """ Get a W512_H1024 palmskin image ( same as '1.get_cell_feature.py' ) """
+    if len(sys.argv) > 1:
+        img_path = Path(sys.argv[1]) # custom image
+        img = ski.io.imread(img_path)
+    else:
+        processed_di = ProcessedDataInstance()
+        processed_di.parse_config("ml_analysis.toml")
+        rel_path, sorted_results_dict = \
+            processed_di.get_sorted_results_dict("palmskin", palmskin_result_name)
+        img_path = list(sorted_results_dict.values())[0]
+        dname_dir = Path(str(img_path).replace(rel_path, ""))
+        target_path = dname_dir.joinpath(f"CenterCropped/{img_path.stem}.W512_H1024.tif")
+        if target_path.exists():
+            img_path = target_path
+            img = ski.io.imread(img_path)
+        else:
+            img = crop_base_size(512, 1024)(image=cv2.imread(str(img_path)))
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    console = Console()
+    table = Table(title=f"Merge background (seg1), '{img_path}', "
+                        f"shape = {img.shape}, dark = {dark}")
+    for column in ["n_segments", "labels", "loop (s)", "bincount (s)", "speedup", "identical"]:
+        table.add_column(column, justify="right")
+    
+    for n_segments in n_segments_list:
+        # same parameters as `single_slic_labeling()`
+        seg0 = slic(img, n_segments=n_segments, channel_axis=-1,
+                    convert2lab=True, enforce_connectivity=True,
+                    slic_zero=False, compactness=30, max_num_iter=100,
+                    sigma=[1.7,1.7], spacing=[1,1],
+                    min_size_factor=0.4, max_size_factor=3, start_label=0)
+        
+        times = {}
+        results = {}
+        for name, func in {"loop": legacy_merge_background,
+                           "bincount": merge_background}.items():
+            elapsed = []
+            for _ in range(repeat):
+                st = time.perf_counter()
+                results[name] = func(seg0, img, dark)
+                elapsed.append(time.perf_counter() - st)
+            times[name] = min(elapsed)
+        
+        identical = np.array_equal(results["loop"], results["bincount"]) and \
+                        (results["loop"].dtype == results["bincount"].dtype)
+        table.add_row(str(n_segments), str(len(np.unique(seg0))),
+                      f"{times['loop']:.3f}", f"{times['bincount']:.4f}",
+                      f"{times['loop']/times['bincount']:.1f}x", str(identical))
+    
+    console.line()
+    console.print(table)
+    # -------------------------------------------------------------------------/
\ No newline at end of file
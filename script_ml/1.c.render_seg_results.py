@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+from rich import print
+from rich.markup import escape
+from rich.pretty import Pretty
+from rich.progress import Progress
+from rich.traceback import install
+
+pkg_dir = Path(__file__).parents[1] # `dir_depth` to `repo_root`
+if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
+    sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
+
+from modules.data.processeddatainstance import ProcessedDataInstance
+from modules.ml.seg_batch import create_seg_job, run_render_job, run_seg_jobs
+from modules.ml.seg_storage import has_seg_result
+from modules.ml.utils import (get_cellpose_param_name, get_seg_desc,
+                              get_slic_param_name)
+from modules.shared.clioutput import CLIOutput
+from modules.shared.config import load_config
+from modules.shared.utils import get_repo_root
+
+install()
+# -----------------------------------------------------------------------------/
+
+
+if __name__ == '__main__':
+
+    print(f"Repository: '{get_repo_root()}'")
+    
+    """ Init components """
+    cli_out = CLIOutput()
+    cli_out.divide()
+    processed_di = ProcessedDataInstance()
+    processed_di.parse_config("ml_analysis.toml")
+    
+    """ Load config """
+    config = load_config("ml_analysis.toml")
+    # [data_processed]
+    palmskin_result_name: Path = Path(config["data_processed"]["palmskin_result_name"])
+    # [seg_results]
+    seg_desc = get_seg_desc(config)
+    # [batch]
+    worker: int        = config["batch"]["worker"]
+    start_method: str  = config["batch"]["start_method"]
+    # [render]
+    dnames: list       = config["render"]["dnames"]
+    print("", Pretty(config, expand_all=True))
+    cli_out.divide()
+    
+    # get `seg_dirname`
+    if seg_desc == "SLIC":
+        seg_param_name = get_slic_param_name(config)
+    elif seg_desc == "Cellpose":
+        seg_param_name = get_cellpose_param_name(config)
+    seg_dirname = f"{palmskin_result_name.stem}.{seg_param_name}"
+    
+    """ Colloct segmentation results ( created by '1.get_cell_feature.py' ) """
+    rel_path, sorted_results_dict = \
+        processed_di.get_sorted_results_dict("palmskin", str(palmskin_result_name))
+    jobs = []
+    for result_path in sorted_results_dict.values():
+        dname_dir = Path(str(result_path).replace(rel_path, ""))
+        job = create_seg_job(config, result_path, dname_dir, seg_dirname)
+        if dnames and (job["name"] not in dnames):
+            continue
+        if not has_seg_result(Path(job["seg_dir"])): # '.seg.npz' or legacy '.pkl'
+            cli_out.write(f"※　: '{job['name']}' is not segmented, skip")
+            continue
+        jobs.append(job)
+    print(f"Total files: {len(jobs)}")
+    
+    """ Render each segmentation """
+    cli_out.divide()
+    failed_names = []
+    with Progress() as pbar:
+        task = pbar.add_task("[cyan]Rendering...", total=len(jobs))
+        
+        for result in run_seg_jobs(jobs, worker, start_method, task=run_render_job):
+            
+            if result["status"] == "done":
+                print(f"[ {result['name']} ] done, {result['elapsed']} s")
+            else:
+                failed_names.append(result["name"])
+                print(f"[ {result['name']} ] [red]failed[/red]\n{escape(result['error'])}")
+            
+            # update pbar
+            pbar.advance(task)
+    
+    cli_out.new_line()
+    if failed_names:
+        print(f"[red]Failed: {len(failed_names)}[/red]", failed_names)
+    print("[green]Done! \n")
+    # -------------------------------------------------------------------------/
\ No newline at end of file
@@ -2,8 +2,8 @@ import os
 import sys
 from pathlib import Path
 
-import cv2
 from rich import print
+from rich.markup import escape
 from rich.pretty import Pretty
 from rich.progress import Progress
 from rich.traceback import install
@@ -13,19 +13,15 @@ if (pkg_dir.exists()) and (str(pkg_dir) not in sys.path):
     sys.path.insert(0, str(pkg_dir)) # add path to scan customized package
 
 from modules.data.processeddatainstance import ProcessedDataInstance
-from modules.dl.dataset.augmentation import crop_base_size
-from modules.ml.calc_seg_feat import (count_area, count_average_size,
-                                      count_element, get_patch_sizes,
-                                      update_ana_toml_file,
-                                      update_seg_analysis_dict)
-from modules.ml.seg_generate import (single_cellpose_prediction,
-                                     single_slic_labeling)
+from modules.ml.seg_batch import (create_seg_job, get_seg_config_hash,
+                                  is_seg_job_done, load_seg_manifest,
+                                  run_seg_jobs, save_seg_manifest)
 from modules.ml.utils import (get_cellpose_param_name, get_seg_desc,
                               get_slic_param_name)
 from modules.shared.clioutput import CLIOutput
 from modules.shared.config import load_config
 from modules.shared.pathnavigator import PathNavigator
-from modules.shared.utils import create_new_dir, get_repo_root
+from modules.shared.utils import get_repo_root
 
 install()
 # -----------------------------------------------------------------------------/
@@ -54,12 +50,13 @@ if __name__ == '__main__':
     # [Cellpose]
     cp_model_name: str = config["Cellpose"]["cp_model_name"]
     channels: list     = config["Cellpose"]["channels"]
+    # [batch]
+    worker: int        = config["batch"]["worker"]
+    start_method: str  = config["batch"]["start_method"]
     print("", Pretty(config, expand_all=True))
     cli_out.divide()
-
-    # 'W512_H1024' cropper
-    w512h1024_cropper = crop_base_size(512, 1024)
     
+    cp_model = None # load below if `seg_desc` is 'Cellpose'
     # get `seg_dirname`
     merge: int       = config[f"{seg_desc}"]["merge"]
     debug_mode: bool = config[f"{seg_desc}"]["debug_mode"]
@@ -90,54 +87,52 @@ if __name__ == '__main__':
     result_paths = list(sorted_results_dict.values())
     print(f"Total files: {len(result_paths)}")
 
-    """ Apply SLIC on each image """
+    """ Create jobs, skip images done with the same config """
+    config_hash = get_seg_config_hash(config)
+    manifest_path = processed_di.palmskin_processed_dir.joinpath(
+                        f"{{Logs}}_seg_manifest.{seg_dirname}.json")
+    prev_manifest = load_seg_manifest(manifest_path)
+    manifest = {"config_hash": config_hash, "jobs": {}}
+    todo_jobs = []
+    for result_path in result_paths:
+        dname_dir = Path(str(result_path).replace(rel_path, ""))
+        job = create_seg_job(config, result_path, dname_dir, seg_dirname)
+        if is_seg_job_done(job, prev_manifest, config_hash):
+            manifest["jobs"][job["name"]] = prev_manifest["jobs"][job["name"]]
+        else:
+            manifest["jobs"][job["name"]] = {**job, "status": "pending", "config_hash": None}
+            todo_jobs.append(job)
+    save_seg_manifest(manifest_path, manifest)
+    print(f"Manifest: '{manifest_path}'")
+    print(f"Skipped (done): {len(result_paths) - len(todo_jobs)}, Todo: {len(todo_jobs)}")
+    if (seg_desc == "Cellpose") and (worker > 1):
+        cli_out.write("※　: Cellpose model runs on GPU, `batch.worker` is ignored")
+    
+    """ Apply segmentation on each image """
     cli_out.divide()
+    failed_names = []
     with Progress() as pbar:
-        task = pbar.add_task("[cyan]Processing...", total=len(result_paths))
+        task = pbar.add_task("[cyan]Processing...", total=len(todo_jobs))
         
-        for result_path in result_paths:
-            
-            dname_dir = Path(str(result_path).replace(rel_path, ""))
-            print(f"[ {dname_dir.parts[-1]} ]")
-            
-            # get image, size: W512_H1024 (FixedROI)
-            target_path = dname_dir.joinpath(f"CenterCropped/{result_path.stem}.W512_H1024.tif")
-            if not target_path.exists():
-                create_new_dir(target_path.parent)
-                tmp_img = w512h1024_cropper(image=cv2.imread(str(result_path)))
-                cv2.imwrite(str(target_path), tmp_img)
-            
-            # dname_dir
-            d_seg_dir = dname_dir.joinpath(f"{seg_desc}/{seg_dirname}")
-            create_new_dir(d_seg_dir)
-            
-            # generate cell segmentation
-            if seg_desc == "SLIC":
-                cell_seg, patch_seg = single_slic_labeling(d_seg_dir, target_path,
-                                                           n_segments, dark, merge,
-                                                           debug_mode)
-            elif seg_desc == "Cellpose":
-                cell_seg, patch_seg = single_cellpose_prediction(d_seg_dir, target_path,
-                                                                 channels, cp_model, merge,
-                                                                 debug_mode)
-            
-            # update
-            analysis_dict = {}
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *count_area(cell_seg))
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *count_element(cell_seg, "cell"))
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *count_element(patch_seg, "patch"))
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *count_average_size(analysis_dict, "cell"))
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *count_average_size(analysis_dict, "patch"))
-            analysis_dict = update_seg_analysis_dict(analysis_dict, *get_patch_sizes(patch_seg))
-            cli_out.new_line()
+        for result in run_seg_jobs(todo_jobs, worker, start_method, cp_model):
             
-            # update info to toml file
-            ana_toml_file = d_seg_dir.joinpath(f"{seg_dirname}.ana.toml")
-            update_ana_toml_file(ana_toml_file, analysis_dict)
+            record = manifest["jobs"][result["name"]]
+            record.update(status=result["status"], elapsed=result["elapsed"],
+                          error=result["error"])
+            if result["status"] == "done":
+                record["config_hash"] = config_hash
+                print(f"[ {result['name']} ] done, {result['elapsed']} s")
+            else:
+                failed_names.append(result["name"])
+                print(f"[ {result['name']} ] [red]failed[/red]\n{escape(result['error'])}")
+            save_seg_manifest(manifest_path, manifest)
             
             # update pbar
             pbar.advance(task)
 
     cli_out.new_line()
+    if failed_names:
+        print(f"[red]Failed: {len(failed_names)}[/red], "
+              f"details in '{manifest_path}'", failed_names)
     print("[green]Done! \n")
     # -------------------------------------------------------------------------/
\ No newline at end of file